@@ -0,0 +1,269 @@
+from typing import Any, Coroutine
+
+import asyncio
+import logging
+import os
+import signal
+
+from prometheus_client import REGISTRY
+from rdflib import Graph
+
+from app.core import discovery, usecases
+from app.core.breaker import CircuitBreakerRegistry
+from app.core.cache import TTLCache, graph_size
+from app.core.hedging import HedgeBudget, RequestHedger
+from app.core.http_client import HttpPoolCollector, create_http_client
+from app.core.latency import AdaptiveTimeouts
+from app.core.offload import Offloader
+from app.core.peers import PeerTable
+from app.core.results import (
+    DistributedSearchResult,
+    ValidatedAnswer,
+    answer_size,
+    result_size,
+)
+from app.rest_api.response import CONTEXT
+from app.settings import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_SETTINGS = (
+    "discovery_type",
+    "pod_namespace",
+    "service_name",
+    "service_port",
+    "dns_cache_ttl",
+    "kube_api_url",
+    "kube_label_selector",
+    "kube_watch_timeout",
+    "dummy_search_service_urls",
+)
+
+
+def build_discovery_service(settings: Settings) -> discovery.IDiscoveryService:
+    """Create the discovery service selected by the settings"""
+
+    if settings.discovery_type == "dummy":
+        return discovery.DummyDiscoveryService(
+            search_service_urls=settings.dummy_search_service_urls,
+        )
+    if settings.discovery_type == "kube":
+        return discovery.KubeDiscoveryService(
+            namespace=settings.pod_namespace,
+            service_name=settings.service_name,
+            service_port=settings.service_port,
+            cache_ttl=settings.dns_cache_ttl,
+        )
+    if settings.discovery_type == "kube-watch":
+        return discovery.KubeWatchDiscoveryService(
+            http_client=discovery.create_kube_api_client(settings.kube_api_url),
+            namespace=settings.pod_namespace,
+            label_selector=settings.kube_label_selector,
+            service_port=settings.service_port,
+            watch_timeout=settings.kube_watch_timeout,
+        )
+    logger.error(f"Unsupported discovery type: {settings.discovery_type}")
+    raise ValueError(f"Unsupported discovery type: {settings.discovery_type}")
+
+
+class ServiceContainer:
+    """
+    Application-scoped services shared by all requests.
+
+    The container is built once in the application lifespan. Settings can be
+    reloaded at runtime on SIGHUP or when the settings file changes, in which
+    case the usecases are rebuilt, and the discovery service when its own
+    settings changed. The HTTP client, the peer table, the circuit breakers,
+    the adaptive timeouts, the offloading executor and the search and peer
+    caches are kept, so changing their settings requires a restart.
+    """
+
+    def __init__(self, settings: Settings) -> None:
+        self._settings_file = str(Settings.model_config.get("env_file", ".env"))
+        self._watch_task: asyncio.Task[None] | None = None
+        self._background_tasks: set[asyncio.Task[None]] = set()
+        self._sighup_installed = False
+
+        self.settings = settings
+        self.http_client = create_http_client(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+            timeout=settings.request_timeout,
+            connect_timeout=settings.http_connect_timeout,
+            read_timeout=settings.http_read_timeout,
+        )
+        self._pool_collector = HttpPoolCollector(
+            self.http_client, settings.http_max_connections
+        )
+        self.breakers = CircuitBreakerRegistry(
+            self.http_client,
+            failure_threshold=settings.breaker_failure_threshold,
+            reset_timeout=settings.breaker_reset_timeout,
+            probe_interval=settings.breaker_probe_interval,
+            probe_timeout=settings.request_timeout,
+        )
+        self.timeouts = AdaptiveTimeouts(
+            default_timeout=settings.request_timeout,
+            min_timeout=settings.adaptive_timeout_min,
+            max_timeout=settings.adaptive_timeout_max,
+            multiplier=settings.adaptive_timeout_multiplier,
+            min_samples=settings.adaptive_timeout_min_samples,
+            window_size=settings.latency_window_size,
+            enabled=settings.adaptive_timeouts,
+        )
+        self.hedge_budget = HedgeBudget(settings.hedge_budget_ratio)
+        self.offloader = Offloader(settings.offload_executor, settings.offload_workers)
+        self.local_search_cache: TTLCache[Graph] | None = None
+        if settings.local_search_cache_ttl > 0:
+            self.local_search_cache = TTLCache(
+                "local_search",
+                max_bytes=settings.local_search_cache_max_bytes,
+                ttl=settings.local_search_cache_ttl,
+                sizeof=graph_size,
+            )
+        self.distributed_search_cache: TTLCache[DistributedSearchResult] | None = None
+        if settings.distributed_search_cache_ttl > 0:
+            self.distributed_search_cache = TTLCache(
+                "distributed_search",
+                max_bytes=settings.distributed_search_cache_max_bytes,
+                ttl=settings.distributed_search_cache_ttl,
+                sizeof=result_size,
+                stale_ttl=settings.distributed_search_cache_stale,
+            )
+        self.peer_cache: TTLCache[ValidatedAnswer] | None = None
+        if settings.peer_cache_ttl > 0:
+            self.peer_cache = TTLCache(
+                "peer",
+                max_bytes=settings.peer_cache_max_bytes,
+                ttl=settings.peer_cache_ttl,
+                sizeof=answer_size,
+            )
+        self.discovery_service = build_discovery_service(settings)
+        self.peer_table = PeerTable(
+            self.discovery_service,
+            refresh_interval=settings.peer_refresh_interval,
+            on_leave=[self.breakers.forget, self.timeouts.forget, self._forget_peer],
+        )
+        self.usecases = self._build_usecases()
+
+    def _forget_peer(self, url: str) -> None:
+        # The usecases are rebuilt on reload, so the current ones are looked up
+        self.usecases.forget(url)
+
+    def _build_usecases(self) -> usecases.SearchUsecases:
+        hedger = None
+        if self.settings.hedging_enabled:
+            hedger = RequestHedger(
+                self.timeouts,
+                self.hedge_budget,
+                delay=self.settings.hedge_delay,
+                percentile=self.settings.hedge_percentile,
+            )
+        return usecases.SearchUsecases(
+            peer_table=self.peer_table,
+            http_client=self.http_client,
+            breakers=self.breakers,
+            timeouts=self.timeouts,
+            catalog_service_url=self.settings.catalog_service_url,
+            request_timeout=self.settings.request_timeout,
+            max_concurrent_requests=self.settings.max_concurrent_requests,
+            deadline_margin=self.settings.deadline_margin,
+            hedger=hedger,
+            max_response_size=self.settings.max_response_size,
+            passthrough_context=(
+                dict(CONTEXT) if self.settings.passthrough_merge else None
+            ),
+            offloader=self.offloader,
+            cache=self.local_search_cache,
+            results_cache=self.distributed_search_cache,
+            degraded_results_ttl=self.settings.distributed_search_cache_degraded_ttl,
+            peer_cache=self.peer_cache,
+        )
+
+    async def start(self) -> None:
+        REGISTRY.register(self._pool_collector)
+        await self.peer_table.start()
+        await self.breakers.start()
+
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.reload)
+            self._sighup_installed = True
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError) as e:
+            logger.warning(f"Settings reload on SIGHUP is not available: {e}")
+
+        if self.settings.settings_reload_interval > 0:
+            self._watch_task = asyncio.create_task(
+                self._watch_settings_file(self.settings.settings_reload_interval)
+            )
+
+    async def aclose(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+        await self.peer_table.aclose()
+        await self.breakers.aclose()
+        await self.discovery_service.aclose()
+        await self.usecases.aclose()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        if self._sighup_installed:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        REGISTRY.unregister(self._pool_collector)
+        await self.http_client.aclose()
+        self.offloader.shutdown()
+
+    def reload(self) -> None:
+        """
+        Re-read the settings and rebuild the services depending on them.
+        The discovery service is rebuilt only if its own settings changed.
+        """
+        try:
+            settings = get_settings()
+        except Exception as e:
+            logger.error(f"Failed to reload settings, keeping current ones: {e}")
+            return
+
+        if settings == self.settings:
+            logger.info("Settings unchanged, nothing to reload")
+            return
+
+        discovery_changed = any(
+            getattr(settings, name) != getattr(self.settings, name)
+            for name in DISCOVERY_SETTINGS
+        )
+        if discovery_changed:
+            try:
+                discovery_service = build_discovery_service(settings)
+            except Exception as e:
+                logger.error(f"Failed to reload settings, keeping current ones: {e}")
+                return
+            self._spawn(self.discovery_service.aclose())
+            self.discovery_service = discovery_service
+            self.peer_table.use_discovery_service(discovery_service)
+
+        self.settings = settings
+        self._spawn(self.usecases.aclose())
+        self.usecases = self._build_usecases()
+        logger.info("Settings reloaded")
+
+    def _spawn(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _settings_file_mtime(self) -> float | None:
+        try:
+            return os.stat(self._settings_file).st_mtime
+        except OSError:
+            return None
+
+    async def _watch_settings_file(self, interval: float) -> None:
+        last_mtime = self._settings_file_mtime()
+        while True:
+            await asyncio.sleep(interval)
+            mtime = self._settings_file_mtime()
+            if mtime != last_mtime:
+                last_mtime = mtime
+                logger.info(f"Settings file {self._settings_file} changed")
+                self.reload()
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from enum import Enum
+
+import httpx
+
+from .metrics import PEER_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+
+class BreakerState(str, Enum):
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+
+
+STATE_METRIC_VALUES = {
+    BreakerState.CLOSED: 0,
+    BreakerState.HALF_OPEN: 1,
+    BreakerState.OPEN: 2,
+}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of a single peer.
+
+    The breaker opens after ``failure_threshold`` consecutive errors or
+    timeouts. Once ``reset_timeout`` has passed it becomes half-open, which
+    lets one probe through: a successful probe closes the breaker again,
+    a failed one reopens it.
+    """
+
+    def __init__(self, url: str, failure_threshold: int, reset_timeout: float) -> None:
+        self._url = url
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._set_state(BreakerState.CLOSED)
+
+    @property
+    def state(self) -> BreakerState:
+        return self._state
+
+    def allow_request(self) -> bool:
+        return self._state == BreakerState.CLOSED
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        if self._state != BreakerState.CLOSED:
+            logger.info(f"Circuit closed for {self._url}")
+            self._set_state(BreakerState.CLOSED)
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self._state == BreakerState.HALF_OPEN or (
+            self._state == BreakerState.CLOSED
+            and self._consecutive_failures >= self._failure_threshold
+        ):
+            logger.warning(
+                f"Circuit opened for {self._url} after "
+                f"{self._consecutive_failures} consecutive failures"
+            )
+            self._opened_at = time.monotonic()
+            self._set_state(BreakerState.OPEN)
+
+    def try_half_open(self) -> bool:
+        """Move an open breaker whose reset timeout has passed to half-open"""
+        if (
+            self._state == BreakerState.OPEN
+            and time.monotonic() - self._opened_at >= self._reset_timeout
+        ):
+            self._set_state(BreakerState.HALF_OPEN)
+            return True
+        return False
+
+    def _set_state(self, state: BreakerState) -> None:
+        self._state = state
+        PEER_CIRCUIT_STATE.labels(peer=self._url).set(STATE_METRIC_VALUES[state])
+
+
+class CircuitBreakerRegistry:
+    """
+    Circuit breakers of all peers, keyed by URL.
+
+    Requests are never sent to a peer whose breaker is not closed. Instead a
+    background task probes the health check of the open peers once their
+    reset timeout has passed.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        probe_interval: float = 5.0,
+        probe_timeout: float = 5.0,
+        probe_path: str = "/health-check",
+    ) -> None:
+        self._http_client = http_client
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._probe_interval = probe_interval
+        self._probe_timeout = probe_timeout
+        self._probe_path = probe_path
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._probe_task: asyncio.Task[None] | None = None
+
+    def get(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = CircuitBreaker(url, self._failure_threshold, self._reset_timeout)
+            self._breakers[url] = breaker
+        return breaker
+
+    def allow_request(self, url: str) -> bool:
+        return self.get(url).allow_request()
+
+    def record_success(self, url: str) -> None:
+        self.get(url).record_success()
+
+    def record_failure(self, url: str) -> None:
+        self.get(url).record_failure()
+
+    def forget(self, url: str) -> None:
+        """Drop the breaker of a peer that left, and its metric"""
+        if self._breakers.pop(url, None) is not None:
+            PEER_CIRCUIT_STATE.remove(url)
+
+    async def probe(self) -> None:
+        """Probe the peers whose breaker is ready to leave the open state"""
+        urls = [
+            url for url, breaker in self._breakers.items() if breaker.try_half_open()
+        ]
+        await asyncio.gather(*(self._probe(url) for url in urls))
+
+    async def _probe(self, url: str) -> None:
+        try:
+            response = await self._http_client.get(
+                f"{url}{self._probe_path}", timeout=self._probe_timeout
+            )
+            response.raise_for_status()
+        except Exception as exc:
+            logger.info(f"Probe failed at {url}: {exc}")
+            self.record_failure(url)
+            return
+        self.record_success(url)
+
+    async def start(self) -> None:
+        self._probe_task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._probe_interval)
+            await self.probe()
@@ -0,0 +1,149 @@
+from typing import Callable, Generic, TypeVar
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+
+from rdflib import Graph
+
+from .metrics import (
+    CACHE_BYTES,
+    CACHE_EVICTIONS,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CACHE_STALE_HITS,
+)
+
+V = TypeVar("V")
+
+# Response header telling where a cached result comes from
+CACHE_STATUS_HEADER = "X-Search-Cache"
+
+
+class CacheMode(str, Enum):
+    """How a request uses a result cache"""
+
+    USE = "use"
+    # Query anew and store the result
+    REFRESH = "refresh"
+    # Neither read nor write the cache
+    BYPASS = "bypass"
+
+
+class CacheStatus(str, Enum):
+    """Where a result comes from"""
+
+    HIT = "hit"
+    STALE = "stale"
+    MISS = "miss"
+    REFRESH = "refresh"
+    BYPASS = "bypass"
+
+
+# Memory held by a triple in a graph besides the text of its terms: the
+# term objects and the entries of the store indexes, measured with rdflib 7
+TRIPLE_OVERHEAD = 1000
+
+
+def graph_size(graph: Graph) -> int:
+    """Approximate memory held by a graph, in bytes"""
+    return sum(
+        len(str(subject)) + len(str(predicate)) + len(str(obj)) + TRIPLE_OVERHEAD
+        for subject, predicate, obj in graph
+    )
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    size: int
+    fresh_until: float
+    expires_at: float
+
+
+class TTLCache(Generic[V]):
+    """
+    In-process LRU cache whose entries expire after their time to live.
+
+    The total size of the entries, as given by ``sizeof``, is kept under
+    ``max_bytes`` by evicting the least recently used ones. Entries larger
+    than the bound are not stored. Expired entries are kept as stale for
+    ``stale_ttl`` more seconds, for ``lookup`` to serve while they are being
+    refreshed. Hits, misses and evictions are counted under the ``name`` of
+    the cache. Cached values are shared, so callers must not modify them.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[V], int],
+        stale_ttl: float = 0.0,
+    ) -> None:
+        self._name = name
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._sizeof = sizeof
+        self._entries: OrderedDict[str, _Entry[V]] = OrderedDict()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def get(self, key: str) -> V | None:
+        """Fresh value of the key"""
+        found = self.lookup(key)
+        if found is None or not found[1]:
+            return None
+        return found[0]
+
+    def lookup(self, key: str) -> tuple[V, bool] | None:
+        """Value of the key, fresh or stale, and whether it is fresh"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key, "expired")
+            entry = None
+        if entry is None:
+            CACHE_MISSES.labels(self._name).inc()
+            return None
+        self._entries.move_to_end(key)
+        fresh = entry.fresh_until > now
+        (CACHE_HITS if fresh else CACHE_STALE_HITS).labels(self._name).inc()
+        return entry.value, fresh
+
+    def put(self, key: str, value: V, ttl: float | None = None) -> None:
+        """Store a value for ``ttl`` seconds, or the default time to live"""
+        ttl = self._ttl if ttl is None else ttl
+        if key in self._entries:
+            self._remove(key)
+        size = self._sizeof(value)
+        if ttl <= 0 or size > self._max_bytes:
+            return
+        fresh_until = time.monotonic() + ttl
+        self._entries[key] = _Entry(
+            value, size, fresh_until, fresh_until + self._stale_ttl
+        )
+        self._size += size
+        while self._size > self._max_bytes:
+            self._remove(next(iter(self._entries)), "size")
+        CACHE_BYTES.labels(self._name).set(self._size)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+        CACHE_BYTES.labels(self._name).set(0)
+
+    def _remove(self, key: str, reason: str | None = None) -> None:
+        entry = self._entries.pop(key)
+        self._size -= entry.size
+        CACHE_BYTES.labels(self._name).set(self._size)
+        if reason is not None:
+            CACHE_EVICTIONS.labels(self._name, reason).inc()
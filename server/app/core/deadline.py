@@ -0,0 +1,51 @@
+import math
+import time
+
+DEADLINE_HEADER = "X-Search-Deadline-Ms"
+
+
+class DeadlineExceeded(Exception):
+    """The request deadline passed before the work could be done"""
+
+
+class Deadline:
+    """
+    Point in time by which a search must be answered.
+
+    Deadlines travel between nodes as a relative budget in milliseconds,
+    so the federation does not depend on synchronised clocks.
+    """
+
+    def __init__(self, expires_at: float) -> None:
+        self._expires_at = expires_at
+
+    @classmethod
+    def from_budget(cls, budget: float) -> "Deadline":
+        """Create a deadline ``budget`` seconds from now"""
+        if not math.isfinite(budget):
+            raise ValueError(f"Deadline budget must be finite, not {budget}")
+        return cls(time.monotonic() + budget)
+
+    @classmethod
+    def from_budget_ms(cls, budget_ms: float) -> "Deadline":
+        return cls.from_budget(budget_ms / 1000)
+
+    @property
+    def expires_at(self) -> float:
+        """Monotonic clock time of the deadline"""
+        return self._expires_at
+
+    def remaining(self) -> float:
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def budget_ms(self, margin: float = 0.0) -> int:
+        """Budget to forward downstream, reduced by ``margin`` seconds"""
+        return max(int((self.remaining() - margin) * 1000), 0)
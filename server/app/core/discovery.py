@@ -1,37 +1,104 @@
-from typing import List
+from typing import Any, AsyncGenerator, Generator, List
 
+import asyncio
+import json
 import logging
+import os
 import socket
+import time
 from abc import ABC, abstractmethod
+from contextlib import aclosing
+from dataclasses import dataclass
+
+import httpx
+
+from .metrics import DNS_RESOLUTION_FAILURES, DNS_RESOLUTION_SECONDS
 
 logger = logging.getLogger(__name__)
 
+SERVICE_ACCOUNT_TOKEN_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+SERVICE_ACCOUNT_CA_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/ca.crt"
+
+
+@dataclass(frozen=True)
+class PeerEndpoint:
+    """A peer search service as reported by a discovery backend"""
+
+    url: str
+    node_id: str | None = None
+    ready: bool = True
+
 
 class IDiscoveryService(ABC):
     @abstractmethod
     async def discover(self) -> List[str]:
         ...
 
+    async def aclose(self) -> None:
+        """Release the resources held by the discovery service"""
+
+
+class IWatchDiscoveryService(IDiscoveryService):
+    """Discovery service that pushes membership changes as they happen"""
+
+    @abstractmethod
+    def watch(self) -> AsyncGenerator[List[PeerEndpoint], None]:
+        """Yield the full membership every time it changes"""
+        ...
+
 
 class KubeDiscoveryService(IDiscoveryService):
-    """Discover other search services pod using k8s DNS"""
+    """
+    Discover other search services pod using k8s DNS.
+
+    Resolution runs in the default executor so it never blocks the event
+    loop. Results are cached for ``cache_ttl`` seconds; once expired, the
+    stale peers are returned while a single background task refreshes them.
+    """
 
-    def __init__(self, namespace: str, service_name: str, service_port: int) -> None:
+    def __init__(
+        self,
+        namespace: str,
+        service_name: str,
+        service_port: int,
+        cache_ttl: float = 5.0,
+    ) -> None:
         self._namespace = namespace
         self._service_name = service_name
         self._service_port = service_port
+        self._cache_ttl = cache_ttl
+        self._peer_services: List[str] | None = None
+        self._expires_at = 0.0
+        self._refresh_task: asyncio.Task[List[str]] | None = None
 
     async def discover(self) -> List[str]:
+        if self._refresh_task is None and time.monotonic() >= self._expires_at:
+            self._refresh_task = asyncio.create_task(self._refresh())
+        if self._peer_services is None and self._refresh_task is not None:
+            return list(await asyncio.shield(self._refresh_task))
+        return list(self._peer_services or [])
+
+    async def _refresh(self) -> List[str]:
         try:
-            _, _, ips = socket.gethostbyname_ex(
-                f"{self._service_name}.{self._namespace}.svc.cluster.local"
-            )
-            peer_services = [f"http://{ip}:{self._service_port}" for ip in ips]
-            logger.info(f"Discovered peer services: {peer_services}")
-            return peer_services
+            self._peer_services = await self._resolve()
+            self._expires_at = time.monotonic() + self._cache_ttl
+            logger.info(f"Discovered peer services: {self._peer_services}")
         except Exception as e:
+            DNS_RESOLUTION_FAILURES.inc()
             logger.error(f"Error discovering peer services: {e}")
-            return []
+        finally:
+            self._refresh_task = None
+        return self._peer_services or []
+
+    async def _resolve(self) -> List[str]:
+        loop = asyncio.get_running_loop()
+        with DNS_RESOLUTION_SECONDS.time():
+            _, _, ips = await loop.run_in_executor(
+                None,
+                socket.gethostbyname_ex,
+                f"{self._service_name}.{self._namespace}.svc.cluster.local",
+            )
+        return [f"http://{ip}:{self._service_port}" for ip in ips]
 
 
 class DummyDiscoveryService(IDiscoveryService):
@@ -42,3 +109,176 @@ class DummyDiscoveryService(IDiscoveryService):
 
     async def discover(self) -> List[str]:
         return self._search_service_urls
+
+
+class ServiceAccountAuth(httpx.Auth):
+    """
+    Authenticate with the pod service account token. The token is read on
+    every request because the kubelet rotates it.
+    """
+
+    def __init__(self, token_file: str) -> None:
+        self._token_file = token_file
+
+    def auth_flow(
+        self, request: httpx.Request
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        with open(self._token_file) as f:
+            token = f.read().strip()
+        request.headers["Authorization"] = f"Bearer {token}"
+        yield request
+
+
+def create_kube_api_client(
+    api_url: str,
+    token_file: str = SERVICE_ACCOUNT_TOKEN_FILE,
+    ca_file: str = SERVICE_ACCOUNT_CA_FILE,
+) -> httpx.AsyncClient:
+    """Create an HTTP client for the k8s API using the pod service account"""
+    verify: str | bool = ca_file if os.path.exists(ca_file) else True
+    return httpx.AsyncClient(
+        base_url=api_url,
+        auth=ServiceAccountAuth(token_file),
+        verify=verify,
+    )
+
+
+class ResourceVersionExpired(Exception):
+    """The watched resource version is too old and the pods must be relisted"""
+
+
+class KubeWatchDiscoveryService(IWatchDiscoveryService):
+    """
+    Discover other search service pods by watching them through the k8s API.
+
+    Unlike DNS discovery, pod changes are seen as soon as the API server
+    publishes them, together with the pod readiness and the ``node-id``
+    label set by the DaemonSet init container.
+    """
+
+    def __init__(
+        self,
+        http_client: httpx.AsyncClient,
+        namespace: str,
+        label_selector: str,
+        service_port: int,
+        watch_timeout: float = 300.0,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 30.0,
+    ) -> None:
+        self._http_client = http_client
+        self._path = f"/api/v1/namespaces/{namespace}/pods"
+        self._label_selector = label_selector
+        self._service_port = service_port
+        self._watch_timeout = watch_timeout
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._pods: dict[str, PeerEndpoint] = {}
+        self._resource_version: str | None = None
+
+    async def discover(self) -> List[str]:
+        if self._resource_version is None:
+            try:
+                await self._list()
+            except Exception as e:
+                logger.error(f"Error listing peer service pods: {e}")
+                return []
+        return [endpoint.url for endpoint in self.endpoints() if endpoint.ready]
+
+    def endpoints(self) -> List[PeerEndpoint]:
+        return sorted(self._pods.values(), key=lambda endpoint: endpoint.url)
+
+    async def watch(self) -> AsyncGenerator[List[PeerEndpoint], None]:
+        delay = self._retry_delay
+        while True:
+            try:
+                if self._resource_version is None:
+                    await self._list()
+                    yield self.endpoints()
+                async with aclosing(self._watch()) as events:
+                    async for changed in events:
+                        delay = self._retry_delay
+                        if changed:
+                            yield self.endpoints()
+            except ResourceVersionExpired:
+                logger.info("Pod watch expired, relisting peer service pods")
+                self._resource_version = None
+            except Exception as e:
+                logger.error(f"Pod watch failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self._max_retry_delay)
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
+
+    async def _list(self) -> None:
+        response = await self._http_client.get(
+            self._path, params={"labelSelector": self._label_selector}
+        )
+        response.raise_for_status()
+        pod_list = response.json()
+        pods = {}
+        for pod in pod_list.get("items", []):
+            endpoint = self._pod_endpoint(pod)
+            if endpoint is not None:
+                pods[pod["metadata"]["name"]] = endpoint
+        self._pods = pods
+        self._resource_version = pod_list["metadata"]["resourceVersion"]
+        logger.info(f"Listed peer services: {self.endpoints()}")
+
+    async def _watch(self) -> AsyncGenerator[bool, None]:
+        """Stream the pod events, yielding whether each changed the membership"""
+        params = {
+            "labelSelector": self._label_selector,
+            "watch": "1",
+            "allowWatchBookmarks": "true",
+            "resourceVersion": self._resource_version or "",
+            "timeoutSeconds": str(int(self._watch_timeout)),
+        }
+        timeout = httpx.Timeout(10.0, read=self._watch_timeout + 10.0)
+        async with self._http_client.stream(
+            "GET", self._path, params=params, timeout=timeout
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.strip():
+                    yield self._apply_event(json.loads(line))
+
+    def _apply_event(self, event: dict[str, Any]) -> bool:
+        event_type = event.get("type")
+        obj = event.get("object", {})
+        if event_type == "ERROR":
+            if obj.get("code") == 410:
+                raise ResourceVersionExpired(obj.get("message"))
+            raise Exception(f"Watch error: {obj.get('message')}")
+
+        self._resource_version = obj["metadata"]["resourceVersion"]
+        if event_type == "BOOKMARK":
+            return False
+
+        name = obj["metadata"]["name"]
+        previous = self._pods.get(name)
+        endpoint = self._pod_endpoint(obj) if event_type != "DELETED" else None
+        if endpoint is None:
+            self._pods.pop(name, None)
+        else:
+            self._pods[name] = endpoint
+        if previous != endpoint:
+            logger.info(f"Peer service pod {name} {event_type}: {endpoint}")
+            return True
+        return False
+
+    def _pod_endpoint(self, pod: dict[str, Any]) -> PeerEndpoint | None:
+        status = pod.get("status", {})
+        ip = status.get("podIP")
+        if not ip:
+            return None
+        ready = "deletionTimestamp" not in pod["metadata"] and any(
+            condition.get("type") == "Ready" and condition.get("status") == "True"
+            for condition in status.get("conditions", [])
+        )
+        return PeerEndpoint(
+            url=f"http://{ip}:{self._service_port}",
+            node_id=pod["metadata"].get("labels", {}).get("node-id"),
+            ready=ready,
+        )
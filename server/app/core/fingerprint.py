@@ -0,0 +1,173 @@
+from typing import Any
+
+import hashlib
+import json
+import re
+
+from pyld import jsonld
+
+CONTEXT_KEY = "@context"
+ABSOLUTE_IRI = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:[^\s]*$")
+GEN_DELIMS = ":/?#[]@"
+
+
+def canonical_form(
+    document: dict[str, Any], default_context: dict[str, Any] | None = None
+) -> list[Any]:
+    """
+    Canonical form of a JSON-LD document, equal for documents with the same
+    meaning written with other prefixes, aliases or key orders.
+
+    The document is expanded against its context, and the arrays, which
+    are sets outside of ``@list``, are sorted. Documents in the default
+    context, made of prefixes and a vocabulary only, are expanded without
+    pyld as long as they keep to plain nodes and values. Documents that
+    cannot be expanded without losing values, such as those using
+    undefined terms or remote contexts, keep their own form with the keys
+    sorted.
+    """
+    context = document.get(CONTEXT_KEY)
+    body = {key: value for key, value in document.items() if key != CONTEXT_KEY}
+    expanded = None
+    if context is not None and context == default_context:
+        expanded = _PrefixExpander.expand(body, context)
+    if expanded is None and isinstance(context, (dict, list)):
+        try:
+            expanded = jsonld.expand(document, {"documentLoader": _refuse_remote})
+        except jsonld.JsonLdError:
+            pass
+    # Expansion drops the properties it cannot map to an IRI
+    if expanded is not None and _count_values(expanded) >= _count_values(body):
+        return ["expanded", _sort_sets(expanded)]
+    return ["document", document]
+
+
+def fingerprint(
+    document: dict[str, Any], default_context: dict[str, Any] | None = None
+) -> str:
+    """Stable hash of the canonical form of a JSON-LD document"""
+    canonical = json.dumps(
+        canonical_form(document, default_context),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _sort_sets(value: Any, ordered: bool = False) -> Any:
+    if isinstance(value, dict):
+        return {key: _sort_sets(item, key == "@list") for key, item in value.items()}
+    if isinstance(value, list):
+        items = [_sort_sets(item) for item in value]
+        if ordered:
+            return items
+        return sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+    return value
+
+
+def _count_values(value: Any) -> int:
+    """Number of scalar values, outside of contexts"""
+    if isinstance(value, dict):
+        return sum(
+            _count_values(item) for key, item in value.items() if key != CONTEXT_KEY
+        )
+    if isinstance(value, list):
+        return sum(_count_values(item) for item in value)
+    return int(value is not None)
+
+
+def _refuse_remote(url: str, options: dict[str, Any] | None = None) -> Any:
+    raise jsonld.JsonLdError(
+        f"Remote context {url} is not loaded", "jsonld.LoadDocumentError"
+    )
+
+
+class _Unsupported(Exception):
+    """Construct left to the expansion by pyld"""
+
+
+class _PrefixExpander:
+    """
+    JSON-LD expansion against a context made of a vocabulary and prefixes,
+    for documents of plain nodes and values, as pyld would expand them
+    """
+
+    def __init__(self, context: dict[str, Any]) -> None:
+        self._vocab = context.get("@vocab")
+        self._mappings: dict[str, str] = {
+            term: iri for term, iri in context.items() if not term.startswith("@")
+        }
+        if not isinstance(self._vocab, str) or any(
+            term.startswith("@") and term != "@vocab" for term in context
+        ):
+            raise _Unsupported("Context with more than a vocabulary")
+        if not all(isinstance(iri, str) for iri in self._mappings.values()):
+            raise _Unsupported("Context with term definitions")
+        self._prefixes = {
+            term: iri
+            for term, iri in self._mappings.items()
+            if iri and iri[-1] in GEN_DELIMS
+        }
+
+    @classmethod
+    def expand(cls, body: dict[str, Any], context: Any) -> list[Any] | None:
+        """Expanded form of the body, None if it is left to pyld"""
+        if not isinstance(context, dict):
+            return None
+        try:
+            node = cls(context)._node(body, top=True)
+        except _Unsupported:
+            return None
+        return [] if node is None else [node]
+
+    def _iri(self, value: Any, vocab: bool) -> str:
+        if not isinstance(value, str) or value.startswith("@"):
+            raise _Unsupported(f"Keyword or non-string IRI {value!r}")
+        if vocab and value in self._mappings:
+            return self._mappings[value]
+        if ":" in value:
+            prefix, suffix = value.split(":", 1)
+            if prefix == "_":
+                raise _Unsupported(f"Blank node identifier {value}")
+            if prefix in self._prefixes and not suffix.startswith("//"):
+                return self._prefixes[prefix] + suffix
+            if ABSOLUTE_IRI.match(value):
+                return value
+        if vocab:
+            return f"{self._vocab}{value}"
+        raise _Unsupported(f"Relative IRI {value}")
+
+    def _values(self, value: Any) -> list[Any]:
+        if isinstance(value, list):
+            values = []
+            for item in value:
+                values.extend(self._values(item))
+            return values
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            node = self._node(value)
+            return [] if node is None else [node]
+        if isinstance(value, (str, int, float, bool)):
+            return [{"@value": value}]
+        raise _Unsupported(f"Value {value!r}")
+
+    def _node(self, node: dict[str, Any], top: bool = False) -> dict[str, Any] | None:
+        expanded: dict[str, Any] = {}
+        for key, value in node.items():
+            if key == "@id":
+                expanded[key] = self._iri(value, vocab=False)
+            elif key == "@type":
+                types = value if isinstance(value, list) else [value]
+                if types:
+                    expanded[key] = [self._iri(item, vocab=True) for item in types]
+            elif key.startswith("@"):
+                raise _Unsupported(f"Keyword {key}")
+            elif value is not None:
+                values = self._values(value)
+                expanded.setdefault(self._iri(key, vocab=True), []).extend(values)
+        # Free-floating nodes are dropped from the top level
+        if top and (not expanded or list(expanded) == ["@id"]):
+            return None
+        return expanded
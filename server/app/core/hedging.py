@@ -0,0 +1,93 @@
+from typing import Awaitable, Callable, TypeVar
+
+import asyncio
+import logging
+
+from .latency import AdaptiveTimeouts
+from .metrics import HEDGES_SENT, HEDGES_WON
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class HedgeBudget:
+    """
+    Token bucket capping the share of requests that may be hedged.
+
+    Every request deposits ``ratio`` tokens and every hedge spends one, so
+    at most ``ratio`` hedges are sent per request on average. ``max_tokens``
+    bounds the burst of hedges after a quiet period.
+    """
+
+    def __init__(self, ratio: float, max_tokens: float = 10.0) -> None:
+        self._ratio = ratio
+        self._max_tokens = max_tokens
+        self._tokens = 0.0
+
+    def deposit(self) -> None:
+        self._tokens = min(self._tokens + self._ratio, self._max_tokens)
+
+    def try_spend(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+
+class RequestHedger:
+    """
+    Send a duplicate of a slow request and keep whichever answers first.
+
+    The duplicate goes out once the request has been running longer than
+    the target's observed ``percentile`` latency, or ``delay`` seconds
+    while there are not enough observations. The losing request is
+    cancelled.
+    """
+
+    def __init__(
+        self,
+        timeouts: AdaptiveTimeouts,
+        budget: HedgeBudget,
+        delay: float = 0.5,
+        percentile: float = 0.95,
+    ) -> None:
+        self._timeouts = timeouts
+        self._budget = budget
+        self._delay = delay
+        self._percentile = percentile
+
+    def delay_for(self, url: str) -> float:
+        delay = self._timeouts.percentile(url, self._percentile)
+        return self._delay if delay is None else delay
+
+    async def run(self, url: str, request: Callable[[], Awaitable[T]]) -> T:
+        self._budget.deposit()
+        primary = asyncio.ensure_future(request())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay_for(url))
+            if done:
+                return primary.result()
+
+            if self._budget.try_spend():
+                logger.info(f"Hedging slow request to {url}")
+                HEDGES_SENT.inc()
+                tasks.add(asyncio.ensure_future(request()))
+
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            HEDGES_WON.inc()
+                        return task.result()
+                    error = task.exception()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,71 @@
+from typing import Iterator
+
+import logging
+
+import httpx
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    timeout: float,
+    connect_timeout: float,
+    read_timeout: float,
+) -> httpx.AsyncClient:
+    """
+    Create the pooled HTTP client shared by the catalog and peer queries.
+    The client is meant to live as long as the application.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    timeouts = httpx.Timeout(timeout, connect=connect_timeout, read=read_timeout)
+    transport = httpx.AsyncHTTPTransport(limits=limits)
+    return httpx.AsyncClient(transport=transport, timeout=timeouts)
+
+
+class HttpPoolCollector(Collector):
+    """Export the connection pool occupancy of an HTTP client to Prometheus"""
+
+    def __init__(self, client: httpx.AsyncClient, max_connections: int) -> None:
+        self._client = client
+        self._max_connections = max_connections
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        connections = GaugeMetricFamily(
+            "ds_search_http_pool_connections",
+            "Connections held by the HTTP client pool",
+            labels=["state"],
+        )
+        active, idle = self._count_connections()
+        connections.add_metric(["active"], active)
+        connections.add_metric(["idle"], idle)
+        yield connections
+
+        yield GaugeMetricFamily(
+            "ds_search_http_pool_max_connections",
+            "Maximum number of connections allowed in the HTTP client pool",
+            value=self._max_connections,
+        )
+
+    def _count_connections(self) -> tuple[int, int]:
+        # httpx does not expose its pool, so read it from the transport
+        # and report an empty pool if the internals are not as expected.
+        pool = getattr(self._client._transport, "_pool", None)
+        if pool is None:
+            return 0, 0
+        idle = 0
+        active = 0
+        for connection in pool.connections:
+            if connection.is_idle():
+                idle += 1
+            elif not connection.is_closed():
+                active += 1
+        return active, idle
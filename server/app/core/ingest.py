@@ -0,0 +1,226 @@
+from typing import Any, AsyncIterator
+
+import codecs
+import json
+import re
+
+from rdflib import Graph
+from rdflib.plugins.parsers.jsonld import Parser, to_rdf
+from rdflib.plugins.shared.jsonld.context import Context
+
+from .offload import Offloader
+
+SPECIAL_CHARS = re.compile(r'[\[\]{}"\\]')
+GRAPH_KEY_SUFFIX = re.compile(r',?\s*"@graph"\s*:\s*$')
+OUTER_KEYS = {"@context", "@graph"}
+
+
+class BodyTooLarge(Exception):
+    """A response body is larger than allowed"""
+
+
+class JSONLDRecordSplitter:
+    """
+    Incremental splitter of a JSON-LD document into the records of its
+    top-level ``@graph`` array.
+
+    ``feed`` returns the text of every record as soon as it is complete, so
+    records can be parsed while the rest of the document is still on its
+    way. The rest of the document is kept with a null in place of each
+    record. Once the ``@graph`` array is reached, ``head`` holds the members
+    preceding it, the ``@context`` in particular.
+    """
+
+    def __init__(self) -> None:
+        self.has_graph = False
+        self.head: dict[str, Any] | None = None
+        self._outer: list[str] = []
+        self._record: list[str] = []
+        self._key: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._in_graph = False
+        self._in_record = False
+        self._graph_key = False
+
+    def feed(self, text: str) -> list[str]:
+        records = []
+        start = 0
+        pos = 0
+        key_start = 0
+        if self._escaped and text:
+            self._escaped = False
+            pos = 1
+        while True:
+            match = SPECIAL_CHARS.search(text, pos)
+            if match is None:
+                break
+            i = match.start()
+            char = text[i]
+            pos = i + 1
+            if self._in_string:
+                if char == "\\":
+                    if pos < len(text):
+                        pos += 1
+                    else:
+                        self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._key.append(text[key_start:pos])
+                        self._graph_key = json.loads("".join(self._key)) == "@graph"
+                        self._key = []
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    key_start = i
+                    self._graph_key = False
+            elif char in "{[":
+                self._depth += 1
+                if self._depth == 2 and char == "[" and self._graph_key:
+                    self._in_graph = True
+                    self.has_graph = True
+                    self._outer.append(text[start:pos])
+                    start = pos
+                    self._read_head()
+                elif self._depth == 3 and char == "{" and self._in_graph:
+                    self._in_record = True
+                    self._outer.append(text[start:i])
+                    self._outer.append("null")
+                    start = i
+                self._graph_key = False
+            else:
+                if self._depth == 3 and char == "}" and self._in_record:
+                    self._record.append(text[start:pos])
+                    records.append("".join(self._record))
+                    self._record = []
+                    self._in_record = False
+                    start = pos
+                elif self._depth == 2 and char == "]":
+                    self._in_graph = False
+                self._depth -= 1
+        if self._in_string and self._depth == 1:
+            self._key.append(text[key_start:])
+        (self._record if self._in_record else self._outer).append(text[start:])
+        return records
+
+    def close(self) -> str:
+        """Text of the document without its records"""
+        return "".join(self._outer)
+
+    def _read_head(self) -> None:
+        outer = "".join(self._outer)
+        self._outer = [outer]
+        head, found = GRAPH_KEY_SUFFIX.subn("", outer[:-1])
+        if found:
+            members = json.loads(head + "}")
+            # Without a preceding @context, one may still follow the records
+            if "@context" in members:
+                self.head = members
+
+
+class JSONLDGraphBuilder:
+    """
+    Adds JSON-LD records to a graph.
+
+    The records are handed over already decoded, straight to the JSON-LD
+    to RDF conversion of rdflib. Going through ``Graph.parse`` would decode
+    them again from text and process the document context for every record.
+    """
+
+    def __init__(self, graph: Graph, context: Any = None) -> None:
+        self.graph = graph
+        self._context = Context(version=1.1)
+        if context:
+            self._context.load(context)
+        self._parser = Parser()
+
+    def add(self, records: list[Any]) -> None:
+        if records:
+            self._parser.parse(records, self._context, self.graph)
+
+
+def parse_json_ld(document: Any, graph: Graph | None = None) -> Graph:
+    """Add a decoded JSON-LD document to the graph, or to a new one"""
+    graph = Graph() if graph is None else graph
+    to_rdf(document, graph, version=1.1)
+    return graph
+
+
+def parse_records(records: list[str], context: Any, graph: Graph) -> Graph:
+    """Decode the text of JSON-LD records and add them to the graph"""
+    JSONLDGraphBuilder(graph, context).add([json.loads(record) for record in records])
+    return graph
+
+
+async def read_json(
+    chunks: AsyncIterator[bytes],
+    max_size: int | None = None,
+    offloader: Offloader | None = None,
+) -> Any:
+    """
+    Decode a JSON document once all its bytes arrived. Raises BodyTooLarge
+    as soon as more than ``max_size`` bytes arrived.
+    """
+    offloader = offloader or Offloader()
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if max_size is not None and len(body) > max_size:
+            raise BodyTooLarge(f"Response body exceeds {max_size} bytes")
+    return await offloader.run("parse", json.loads, bytes(body))
+
+
+async def parse_json_ld_stream(
+    chunks: AsyncIterator[bytes],
+    max_size: int | None = None,
+    offloader: Offloader | None = None,
+) -> Graph:
+    """
+    Parse a JSON-LD document into a graph while its bytes arrive.
+
+    Every record of the top-level ``@graph`` array is parsed as soon as it
+    is complete, the records of a chunk together in the ``offloader``.
+    Documents without such an array, or with members other than
+    ``@context`` next to it, are parsed once complete.
+    Raises BodyTooLarge as soon as more than ``max_size`` bytes arrived.
+    """
+    offloader = offloader or Offloader()
+    graph = Graph()
+    splitter = JSONLDRecordSplitter()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    deferred: list[str] = []
+    # Members following the records turn up only at the end of the document
+    received: list[str] = []
+
+    async def add(records: list[str]) -> None:
+        if not records:
+            return
+        received.extend(records)
+        if splitter.head is None or splitter.head.keys() - OUTER_KEYS:
+            deferred.extend(records)
+            return
+        context = splitter.head.get("@context")
+        await offloader.fill("parse", graph, parse_records, records, context)
+
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if max_size is not None and size > max_size:
+            raise BodyTooLarge(f"Response body exceeds {max_size} bytes")
+        await add(splitter.feed(decoder.decode(chunk)))
+    await add(splitter.feed(decoder.decode(b"", final=True)))
+
+    document = json.loads(splitter.close())
+    if not splitter.has_graph:
+        await offloader.fill("parse", graph, parse_json_ld, document)
+    elif document.keys() - OUTER_KEYS:
+        document["@graph"] = [
+            item for item in document["@graph"] if item is not None
+        ] + [json.loads(record) for record in received]
+        return await offloader.fill("parse", Graph(), parse_json_ld, document)
+    elif deferred:
+        context = document.get("@context")
+        await offloader.fill("parse", graph, parse_records, deferred, context)
+    return graph
@@ -0,0 +1,88 @@
+import math
+from collections import deque
+
+from .metrics import PEER_TIMEOUT_SECONDS
+
+
+class LatencyWindow:
+    """Sliding window over the latest latencies observed for a peer"""
+
+    def __init__(self, size: int) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> float | None:
+        """Nearest-rank percentile of the window, ``q`` between 0 and 1"""
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        rank = max(math.ceil(q * len(samples)), 1)
+        return samples[rank - 1]
+
+
+class AdaptiveTimeouts:
+    """
+    Per-peer timeouts derived from the observed latencies.
+
+    The timeout of a peer is its recent p99 latency times ``multiplier``,
+    clamped between ``min_timeout`` and ``max_timeout``. Until a peer has
+    ``min_samples`` observations the fixed ``default_timeout`` is used.
+    Timed out queries are observed with the timeout they hit, so the
+    timeout of a peer that slows down keeps growing up to the ceiling.
+    """
+
+    def __init__(
+        self,
+        default_timeout: float,
+        min_timeout: float,
+        max_timeout: float,
+        multiplier: float = 2.0,
+        min_samples: int = 20,
+        window_size: int = 200,
+        enabled: bool = True,
+    ) -> None:
+        self._default_timeout = default_timeout
+        self._min_timeout = min_timeout
+        self._max_timeout = max_timeout
+        self._multiplier = multiplier
+        self._min_samples = min_samples
+        self._window_size = window_size
+        self._enabled = enabled
+        self._windows: dict[str, LatencyWindow] = {}
+
+    def observe(self, url: str, latency: float) -> None:
+        window = self._windows.get(url)
+        if window is None:
+            window = LatencyWindow(self._window_size)
+            self._windows[url] = window
+        window.observe(latency)
+
+    def percentile(self, url: str, q: float) -> float | None:
+        window = self._windows.get(url)
+        if window is None or len(window) < self._min_samples:
+            return None
+        return window.percentile(q)
+
+    def forget(self, url: str) -> None:
+        """Drop the latencies of a peer that left, and its timeout metric"""
+        self._windows.pop(url, None)
+        try:
+            PEER_TIMEOUT_SECONDS.remove(url)
+        except KeyError:
+            pass
+
+    def timeout_for(self, url: str) -> float:
+        p99 = self.percentile(url, 0.99) if self._enabled else None
+        if p99 is None:
+            timeout = self._default_timeout
+        else:
+            timeout = min(
+                max(p99 * self._multiplier, self._min_timeout), self._max_timeout
+            )
+        PEER_TIMEOUT_SECONDS.labels(peer=url).set(timeout)
+        return timeout
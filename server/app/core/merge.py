@@ -0,0 +1,106 @@
+from typing import Any
+
+
+def relabel_blank_nodes(value: Any, prefix: str) -> Any:
+    """Prefix the blank node labels of framed JSON-LD"""
+    if isinstance(value, dict):
+        return {
+            key: (
+                f"_:{prefix}{item[2:]}"
+                if key == "@id" and isinstance(item, str) and item.startswith("_:")
+                else relabel_blank_nodes(item, prefix)
+            )
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [relabel_blank_nodes(item, prefix) for item in value]
+    return value
+
+
+def merge_node(target: dict[str, Any], source: dict[str, Any]) -> None:
+    """
+    Deep merge a framed node into another with the same ``@id``. Values of
+    both are kept once, and embedded nodes with the same ``@id`` are merged.
+    """
+    for key, value in source.items():
+        if key == "@id":
+            continue
+        if key not in target:
+            target[key] = value
+            continue
+        values = _as_list(target[key])
+        for item in _as_list(value):
+            same = _find_node(values, item)
+            if same is not None:
+                merge_node(same, item)
+            elif item not in values:
+                values.append(item)
+        target[key] = values[0] if len(values) == 1 else values
+
+
+def count_nodes(value: Any, rdf_type: str) -> int:
+    """Number of distinct nodes of the compacted type in framed JSON-LD"""
+    ids: set[str] = set()
+    anonymous = 0
+    pending = [value]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, list):
+            pending.extend(item)
+        elif isinstance(item, dict):
+            if rdf_type in _as_list(item.get("@type", [])):
+                if "@id" in item:
+                    ids.add(item["@id"])
+                else:
+                    anonymous += 1
+            pending.extend(item.values())
+    return len(ids) + anonymous
+
+
+class FramedMerge:
+    """
+    Merge of framed JSON-LD documents written in the same context.
+
+    Top-level nodes are merged by ``@id``, and nodes without one are kept
+    apart. Blank node labels are made unique to every document first, as
+    the same label in two documents names two different nodes. Unlike
+    merging the graphs, a node embedded at different places of a tree by
+    different documents stays embedded at both.
+    """
+
+    def __init__(self) -> None:
+        self._nodes: dict[str, dict[str, Any]] = {}
+        self._anonymous: list[dict[str, Any]] = []
+        self._documents = 0
+
+    def add(self, nodes: list[dict[str, Any]]) -> None:
+        nodes = relabel_blank_nodes(nodes, f"d{self._documents}")
+        self._documents += 1
+        for node in nodes:
+            node_id = node.get("@id")
+            if node_id is None:
+                self._anonymous.append(node)
+            elif node_id in self._nodes:
+                merge_node(self._nodes[node_id], node)
+            else:
+                self._nodes[node_id] = node
+
+    @property
+    def nodes(self) -> list[dict[str, Any]]:
+        """Merged nodes, sorted by ``@id`` the way framing lists them"""
+        return self._anonymous + [
+            self._nodes[node_id] for node_id in sorted(self._nodes)
+        ]
+
+
+def _as_list(value: Any) -> list[Any]:
+    return list(value) if isinstance(value, list) else [value]
+
+
+def _find_node(values: list[Any], node: Any) -> dict[str, Any] | None:
+    if not isinstance(node, dict) or "@id" not in node:
+        return None
+    for value in values:
+        if isinstance(value, dict) and value.get("@id") == node["@id"]:
+            return value
+    return None
@@ -0,0 +1,87 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+DNS_RESOLUTION_SECONDS = Histogram(
+    "ds_search_discovery_dns_resolution_seconds",
+    "Time spent resolving the search service DNS name",
+)
+DNS_RESOLUTION_FAILURES = Counter(
+    "ds_search_discovery_dns_failures_total",
+    "Failed resolutions of the search service DNS name",
+)
+KNOWN_PEERS = Gauge(
+    "ds_search_known_peers",
+    "Peer search services currently in the membership table",
+)
+PEER_CIRCUIT_STATE = Gauge(
+    "ds_search_peer_circuit_state",
+    "Circuit breaker state of a peer (0 closed, 1 half-open, 2 open)",
+    ["peer"],
+)
+PEER_TIMEOUT_SECONDS = Gauge(
+    "ds_search_peer_timeout_seconds",
+    "Timeout applied to the latest query of a peer",
+    ["peer"],
+)
+HEDGES_SENT = Counter(
+    "ds_search_hedges_sent_total",
+    "Duplicate requests sent to a slow peer or catalog",
+)
+HEDGES_WON = Counter(
+    "ds_search_hedges_won_total",
+    "Hedged requests answered by the duplicate first",
+)
+OFFLOAD_QUEUE_DEPTH = Gauge(
+    "ds_search_offload_queue_depth",
+    "Parsing and framing tasks waiting for a free executor worker",
+)
+OFFLOAD_WAIT_SECONDS = Histogram(
+    "ds_search_offload_wait_seconds",
+    "Time parsing and framing tasks waited for an executor worker",
+    ["stage"],
+)
+RESPONSE_BYTES = Histogram(
+    "ds_search_response_bytes",
+    "Size of the response bodies of an endpoint",
+    ["endpoint"],
+    buckets=[2**i for i in range(10, 30, 2)],
+)
+RESPONSE_ENCODE_SECONDS = Histogram(
+    "ds_search_response_encode_seconds",
+    "Time spent encoding the response bodies of an endpoint as JSON",
+    ["endpoint"],
+)
+CACHE_HITS = Counter(
+    "ds_search_cache_hits_total",
+    "Lookups answered from a result cache",
+    ["cache"],
+)
+CACHE_STALE_HITS = Counter(
+    "ds_search_cache_stale_hits_total",
+    "Lookups answered with an expired entry while it is refreshed",
+    ["cache"],
+)
+CACHE_MISSES = Counter(
+    "ds_search_cache_misses_total",
+    "Lookups a result cache could not answer",
+    ["cache"],
+)
+CACHE_EVICTIONS = Counter(
+    "ds_search_cache_evictions_total",
+    "Entries dropped from a result cache, once expired or to make room",
+    ["cache", "reason"],
+)
+CACHE_BYTES = Gauge(
+    "ds_search_cache_bytes",
+    "Approximate memory held by the entries of a result cache",
+    ["cache"],
+)
+COALESCED_CALLS = Counter(
+    "ds_search_coalesced_total",
+    "Searches that joined an identical search already in flight",
+    ["operation"],
+)
+PEER_NOT_MODIFIED = Counter(
+    "ds_search_peer_not_modified_total",
+    "Peer answers revalidated as not modified and reused from the cache",
+    ["peer"],
+)
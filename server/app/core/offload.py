@@ -0,0 +1,121 @@
+from typing import Any, Callable, TypeVar
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+
+from rdflib import Graph
+from rdflib.term import Node
+
+from .metrics import OFFLOAD_QUEUE_DEPTH, OFFLOAD_WAIT_SECONDS
+
+T = TypeVar("T")
+Triple = tuple[Node, Node, Node]
+
+
+class OffloadExecutor(str, Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class Offloader:
+    """
+    Runs the CPU-bound stages of a request, parsing and framing JSON-LD, out
+    of the event loop so that one large result does not hold up the other
+    requests.
+
+    The work runs in a thread pool, or in a process pool to get around the
+    GIL, or inline on the event loop. Graphs do not cross process boundaries
+    as such: they are exchanged as lists of triples, which pickle as plain
+    terms. Worker processes are spawned rather than forked, so that blank
+    nodes they create do not collide with those of the parent.
+    """
+
+    def __init__(
+        self,
+        executor: OffloadExecutor = OffloadExecutor.INLINE,
+        max_workers: int = 4,
+    ) -> None:
+        self._kind = executor
+        self._max_workers = max_workers
+        self._executor: Executor | None = None
+        if executor == OffloadExecutor.THREAD:
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="offload"
+            )
+        elif executor == OffloadExecutor.PROCESS:
+            self._executor = ProcessPoolExecutor(
+                max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        self._in_flight = 0
+
+    async def run(self, stage: str, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run ``func(*args)`` in the executor. In a process pool, ``func`` and
+        its arguments must be picklable.
+        """
+        if self._executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        self._update_queue_depth()
+        try:
+            timed: tuple[T, float] = await loop.run_in_executor(
+                self._executor, _timed, func, time.time(), *args
+            )
+        finally:
+            self._in_flight -= 1
+            self._update_queue_depth()
+        result, wait = timed
+        OFFLOAD_WAIT_SECONDS.labels(stage).observe(wait)
+        return result
+
+    async def fill(
+        self, stage: str, graph: Graph, func: Callable[..., Graph], *args: Any
+    ) -> Graph:
+        """
+        Add to the graph what ``func(*args, graph)`` adds to it. In a process
+        pool ``func`` fills a new graph, whose triples are added to the graph.
+        """
+        if self._kind != OffloadExecutor.PROCESS:
+            return await self.run(stage, func, *args, graph)
+        triples = await self.run(stage, _filled_triples, func, *args)
+        for triple in triples:
+            graph.add(triple)
+        return graph
+
+    async def run_on_graph(
+        self, stage: str, func: Callable[..., T], graph: Graph, *args: Any
+    ) -> T:
+        """Run ``func(graph, *args)``, on a copy of the graph in a process pool"""
+        if self._kind != OffloadExecutor.PROCESS:
+            return await self.run(stage, func, graph, *args)
+        return await self.run(stage, _on_triples, func, list(graph), *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _update_queue_depth(self) -> None:
+        # The pool runs at most max_workers tasks, the others are queued
+        OFFLOAD_QUEUE_DEPTH.set(max(0, self._in_flight - self._max_workers))
+
+
+def _timed(func: Callable[..., T], submitted_at: float, *args: Any) -> tuple[T, float]:
+    # Wall clock time, as the task may run in another process
+    wait = max(0.0, time.time() - submitted_at)
+    return func(*args), wait
+
+
+def _filled_triples(func: Callable[..., Graph], *args: Any) -> list[Triple]:
+    return list(func(*args, Graph()))
+
+
+def _on_triples(func: Callable[..., T], triples: list[Triple], *args: Any) -> T:
+    graph = Graph()
+    for triple in triples:
+        graph.add(triple)
+    return func(graph, *args)
@@ -0,0 +1,156 @@
+from typing import Callable, Iterable
+
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, replace
+
+from .discovery import IDiscoveryService, IWatchDiscoveryService, PeerEndpoint
+from .metrics import KNOWN_PEERS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PeerInfo:
+    """State of a peer search service as seen by this node"""
+
+    url: str
+    last_seen: float
+    node_id: str | None = None
+    ready: bool = True
+    healthy: bool = True
+    successes: int = 0
+    failures: int = 0
+    latency_ewma: float | None = None
+
+
+class PeerTable:
+    """
+    Membership table of the peer search services.
+
+    A background task keeps the table in sync with the discovery service,
+    either by polling it or, for watch-based backends, by applying the
+    membership changes it pushes. The search usecases record the outcome of
+    every peer query in it. Readers get an immutable snapshot that is rebuilt
+    only when the table changes. The ``on_leave`` callbacks are called with
+    the URL of every peer that leaves, to drop the state kept about it.
+    """
+
+    def __init__(
+        self,
+        discovery_service: IDiscoveryService,
+        refresh_interval: float = 5.0,
+        latency_alpha: float = 0.2,
+        on_leave: Iterable[Callable[[str], None]] = (),
+    ) -> None:
+        self._discovery_service = discovery_service
+        self._refresh_interval = refresh_interval
+        self._latency_alpha = latency_alpha
+        self._on_leave = list(on_leave)
+        self._peers: dict[str, PeerInfo] = {}
+        self._snapshot: tuple[PeerInfo, ...] = ()
+        self._refresh_task: asyncio.Task[None] | None = None
+
+    def snapshot(self) -> tuple[PeerInfo, ...]:
+        return self._snapshot
+
+    def use_discovery_service(self, discovery_service: IDiscoveryService) -> None:
+        self._discovery_service = discovery_service
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = asyncio.create_task(self._run())
+
+    def update(self, urls: Iterable[str]) -> None:
+        """Replace the membership, keeping the stats of the known peers"""
+        self.update_endpoints(PeerEndpoint(url=url) for url in urls)
+
+    def update_endpoints(self, endpoints: Iterable[PeerEndpoint]) -> None:
+        """Replace the membership with the endpoints of a discovery backend"""
+        now = time.time()
+        peers = {}
+        for endpoint in endpoints:
+            url = endpoint.url
+            peer = self._peers.get(url)
+            if peer is None:
+                logger.info(f"Peer joined: {endpoint}")
+                peers[url] = PeerInfo(
+                    url=url,
+                    last_seen=now,
+                    node_id=endpoint.node_id,
+                    ready=endpoint.ready,
+                )
+            else:
+                peers[url] = replace(
+                    peer,
+                    last_seen=now,
+                    node_id=endpoint.node_id,
+                    ready=endpoint.ready,
+                )
+        departed = self._peers.keys() - peers.keys()
+        self._peers = peers
+        self._publish()
+        for url in departed:
+            logger.info(f"Peer left: {url}")
+            for callback in self._on_leave:
+                callback(url)
+
+    def record_success(self, url: str, latency: float) -> None:
+        peer = self._peers.get(url)
+        if peer is None:
+            return
+        if peer.latency_ewma is None:
+            latency_ewma = latency
+        else:
+            latency_ewma = (
+                self._latency_alpha * latency
+                + (1 - self._latency_alpha) * peer.latency_ewma
+            )
+        self._peers[url] = replace(
+            peer,
+            healthy=True,
+            successes=peer.successes + 1,
+            latency_ewma=latency_ewma,
+        )
+        self._publish()
+
+    def record_failure(self, url: str) -> None:
+        peer = self._peers.get(url)
+        if peer is None:
+            return
+        self._peers[url] = replace(peer, healthy=False, failures=peer.failures + 1)
+        self._publish()
+
+    def _publish(self) -> None:
+        self._snapshot = tuple(self._peers.values())
+        KNOWN_PEERS.set(len(self._snapshot))
+
+    async def refresh(self) -> None:
+        try:
+            urls = await self._discovery_service.discover()
+        except Exception as e:
+            logger.error(f"Peer discovery failed, keeping current peers: {e}")
+            return
+        self.update(urls)
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._refresh_task = asyncio.create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def _run(self) -> None:
+        discovery_service = self._discovery_service
+        if isinstance(discovery_service, IWatchDiscoveryService):
+            async with aclosing(discovery_service.watch()) as updates:
+                async for endpoints in updates:
+                    self.update_endpoints(endpoints)
+            return
+        while True:
+            await asyncio.sleep(self._refresh_interval)
+            await self.refresh()
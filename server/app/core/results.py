@@ -0,0 +1,113 @@
+from typing import Any
+
+import json
+from dataclasses import dataclass, field
+from enum import Enum
+
+from rdflib import Graph
+
+from .cache import CacheStatus, graph_size
+from .deadline import Deadline
+
+# Memory held by decoded JSON relative to the length of its compact text,
+# measured on framed catalogs
+JSON_OVERHEAD = 4
+
+
+class PeerStatus(str, Enum):
+    OK = "ok"
+    ERROR = "error"
+    TIMEOUT = "timeout"
+    SKIPPED = "skipped"
+    PENDING = "pending"
+
+
+@dataclass(frozen=True)
+class PeerResult:
+    """
+    Outcome of the query of a single peer in a distributed search. Peers
+    answering in the shared context give their framed ``nodes`` as they
+    are, instead of a graph.
+    """
+
+    url: str
+    status: PeerStatus
+    graph: Graph = field(default_factory=Graph)
+    elapsed: float = 0.0
+    nodes: list[dict[str, Any]] | None = None
+    # Timed out because of the deadline of the search, not of the peer
+    cut_short: bool = False
+
+
+@dataclass(frozen=True)
+class ValidatedAnswer:
+    """
+    Parsed answer of a peer, a graph or framed nodes, and the entity tag
+    it was sent with, to revalidate it with the peer
+    """
+
+    etag: str
+    answer: Graph | list[dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class CompletionPolicy:
+    """
+    Conditions on which a distributed search returns before every peer has
+    answered: once the ``quorum`` fraction of the peers answered, once
+    ``min_results`` datasets were found or once the ``soft_deadline`` passed,
+    whichever comes first. The peers still running are reported as pending.
+    """
+
+    quorum: float | None = None
+    min_results: int | None = None
+    soft_deadline: Deadline | None = None
+
+
+@dataclass(frozen=True)
+class DistributedSearchResult:
+    """
+    Merged graph of a distributed search and the outcome of every peer.
+    When every peer answered in the shared context, their framed nodes are
+    merged in ``nodes`` instead and the graph stays empty. ``cache_status``
+    tells whether the result comes from the results cache, if there is one.
+    """
+
+    graph: Graph
+    peers: list[PeerResult]
+    nodes: list[dict[str, Any]] | None = None
+    cache_status: CacheStatus | None = None
+
+    @property
+    def complete(self) -> bool:
+        return all(peer.status == PeerStatus.OK for peer in self.peers)
+
+    @property
+    def cut_short(self) -> bool:
+        """
+        Whether the search returned before every peer was done, because of
+        its deadline or its completion policy
+        """
+        return any(
+            peer.status == PeerStatus.PENDING or peer.cut_short for peer in self.peers
+        )
+
+
+def result_size(result: DistributedSearchResult) -> int:
+    """Approximate memory held by a distributed search result, in bytes"""
+    size = graph_size(result.graph)
+    if result.nodes is not None:
+        size += nodes_size(result.nodes)
+    return size
+
+
+def answer_size(answer: ValidatedAnswer) -> int:
+    """Approximate memory held by the answer of a peer, in bytes"""
+    if isinstance(answer.answer, Graph):
+        return graph_size(answer.answer)
+    return nodes_size(answer.answer)
+
+
+def nodes_size(nodes: list[dict[str, Any]]) -> int:
+    """Approximate memory held by framed JSON-LD nodes, in bytes"""
+    return JSON_OVERHEAD * len(json.dumps(nodes, separators=(",", ":")))
@@ -0,0 +1,95 @@
+from typing import Awaitable, Callable, Generic, TypeVar
+
+import asyncio
+import math
+from dataclasses import dataclass, field
+
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import COALESCED_CALLS
+
+T = TypeVar("T")
+
+
+@dataclass(eq=False)
+class _Flight(Generic[T]):
+    task: asyncio.Future[T]
+    expires_at: float
+    waiters: int = field(default=0)
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls doing the same work into a single execution
+    whose result every caller receives.
+
+    A call joins a flight with the same key only if the flight's deadline
+    is not earlier than its own, so the work is never cut shorter than the
+    call asked for; otherwise it starts another one. A call waits for a
+    flight with a later deadline only until its own deadline, then raises
+    DeadlineExceeded. A caller giving up does not cancel the shared work as
+    long as other callers wait for it; the work is cancelled once all of
+    them gave up.
+    """
+
+    def __init__(self, operation: str) -> None:
+        self._operation = operation
+        self._flights: dict[str, list[_Flight[T]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(flights) for flights in self._flights.values())
+
+    async def run(
+        self,
+        key: str,
+        work: Callable[[], Awaitable[T]],
+        deadline: Deadline | None = None,
+    ) -> T:
+        expires_at = math.inf if deadline is None else deadline.expires_at
+        # Of the flights lasting long enough, the one done the soonest
+        flight = min(
+            (
+                flight
+                for flight in self._flights.get(key, [])
+                if flight.expires_at >= expires_at
+            ),
+            key=lambda flight: flight.expires_at,
+            default=None,
+        )
+        if flight is None:
+            flight = self._take_off(key, work, expires_at)
+        else:
+            COALESCED_CALLS.labels(self._operation).inc()
+
+        flight.waiters += 1
+        try:
+            if deadline is None or flight.expires_at == expires_at:
+                return await asyncio.shield(flight.task)
+            try:
+                return await asyncio.wait_for(
+                    asyncio.shield(flight.task), deadline.remaining()
+                )
+            except asyncio.TimeoutError:
+                if flight.task.done():
+                    raise
+                raise DeadlineExceeded("Request deadline exceeded")
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody waits for the work any more
+                self._land(key, flight)
+                flight.task.cancel()
+
+    def _take_off(
+        self, key: str, work: Callable[[], Awaitable[T]], expires_at: float
+    ) -> _Flight[T]:
+        flight = _Flight(asyncio.ensure_future(work()), expires_at)
+        self._flights.setdefault(key, []).append(flight)
+        flight.task.add_done_callback(lambda _: self._land(key, flight))
+        return flight
+
+    def _land(self, key: str, flight: _Flight[T]) -> None:
+        flights = self._flights.get(key, [])
+        if flight in flights:
+            flights.remove(flight)
+        if not flights:
+            self._flights.pop(key, None)
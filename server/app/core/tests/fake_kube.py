@@ -0,0 +1,87 @@
+from typing import Any, AsyncIterator
+
+import asyncio
+import json
+
+import httpx
+
+
+def pod_factory(
+    name: str,
+    ip: str | None = "10.0.0.1",
+    ready: bool = True,
+    node_id: str | None = "node1",
+    resource_version: str = "1",
+) -> dict[str, Any]:
+    labels = {"app.kubernetes.io/name": "ds-search"}
+    if node_id is not None:
+        labels["node-id"] = node_id
+    status: dict[str, Any] = {
+        "conditions": [{"type": "Ready", "status": "True" if ready else "False"}]
+    }
+    if ip is not None:
+        status["podIP"] = ip
+    return {
+        "metadata": {
+            "name": name,
+            "resourceVersion": resource_version,
+            "labels": labels,
+        },
+        "status": status,
+    }
+
+
+class FakeKubeAPI:
+    """
+    Fake k8s API server serving the pod list and streaming the watch events
+    pushed by the test. Every watch request gets its own event stream.
+    """
+
+    def __init__(self, pods: list[dict[str, Any]], resource_version: str = "1"):
+        self.pods = pods
+        self.resource_version = resource_version
+        self.requests: list[httpx.Request] = []
+        self._streams: list[asyncio.Queue[dict[str, Any] | None]] = []
+        self._stream_opened = asyncio.Event()
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url="https://kube.test",
+            transport=httpx.MockTransport(self.handle),
+        )
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.url.params.get("watch") == "1":
+            stream: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+            self._streams.append(stream)
+            self._stream_opened.set()
+            return httpx.Response(200, content=self._stream_events(stream))
+        return httpx.Response(
+            200,
+            json={
+                "kind": "PodList",
+                "metadata": {"resourceVersion": self.resource_version},
+                "items": self.pods,
+            },
+        )
+
+    async def _stream_events(
+        self, stream: asyncio.Queue[dict[str, Any] | None]
+    ) -> AsyncIterator[bytes]:
+        while True:
+            event = await stream.get()
+            if event is None:
+                return
+            yield json.dumps(event).encode() + b"\n"
+
+    async def wait_for_watch(self, count: int = 1) -> None:
+        while len(self._streams) < count:
+            self._stream_opened.clear()
+            await self._stream_opened.wait()
+
+    def push(self, event_type: str, obj: dict[str, Any]) -> None:
+        self._streams[-1].put_nowait({"type": event_type, "object": obj})
+
+    def close_watch(self) -> None:
+        self._streams[-1].put_nowait(None)
@@ -0,0 +1,113 @@
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from ..breaker import BreakerState, CircuitBreaker, CircuitBreakerRegistry
+
+
+def circuit_state(url: str) -> float | None:
+    return REGISTRY.get_sample_value("ds_search_peer_circuit_state", {"peer": url})
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("http://peer1.com", 3, reset_timeout=30)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+
+        assert breaker.state == BreakerState.OPEN
+        assert not breaker.allow_request()
+        assert circuit_state("http://peer1.com") == 2
+
+    def test_half_open(self):
+        breaker = CircuitBreaker("http://peer2.com", 1, reset_timeout=30)
+        breaker.record_failure()
+        assert not breaker.try_half_open()
+
+        with patch("time.monotonic", return_value=time.monotonic() + 31):
+            assert breaker.try_half_open()
+
+        assert breaker.state == BreakerState.HALF_OPEN
+        assert not breaker.allow_request()
+        assert circuit_state("http://peer2.com") == 1
+
+    def test_half_open_failure_reopens(self):
+        breaker = CircuitBreaker("http://peer3.com", 5, reset_timeout=0)
+        for _ in range(5):
+            breaker.record_failure()
+        assert breaker.try_half_open()
+
+        breaker.record_failure()
+
+        assert breaker.state == BreakerState.OPEN
+
+    def test_half_open_success_closes(self):
+        breaker = CircuitBreaker("http://peer4.com", 1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.try_half_open()
+
+        breaker.record_success()
+
+        assert breaker.state == BreakerState.CLOSED
+        assert breaker.allow_request()
+        assert circuit_state("http://peer4.com") == 0
+
+
+class TestCircuitBreakerRegistry:
+    @pytest.mark.asyncio
+    async def test_probe_success(self):
+        http_client = httpx.AsyncClient()
+        registry = CircuitBreakerRegistry(
+            http_client, failure_threshold=1, reset_timeout=0
+        )
+        registry.record_failure("http://peer1.com")
+        assert not registry.allow_request("http://peer1.com")
+
+        with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
+            mock_get.return_value = httpx.Response(
+                200, request=httpx.Request("GET", "http://peer1.com/health-check")
+            )
+            await registry.probe()
+            mock_get.assert_awaited_once_with(
+                "http://peer1.com/health-check", timeout=5.0
+            )
+
+        assert registry.allow_request("http://peer1.com")
+
+    @pytest.mark.asyncio
+    async def test_probe_failure(self):
+        http_client = httpx.AsyncClient()
+        registry = CircuitBreakerRegistry(
+            http_client, failure_threshold=1, reset_timeout=0
+        )
+        registry.record_failure("http://peer1.com")
+        registry.record_success("http://peer2.com")
+
+        with patch("httpx.AsyncClient.get", new_callable=AsyncMock) as mock_get:
+            mock_get.side_effect = httpx.ConnectError("refused")
+            await registry.probe()
+            assert mock_get.await_count == 1
+
+        assert registry.get("http://peer1.com").state == BreakerState.OPEN
+        assert registry.allow_request("http://peer2.com")
+
+    def test_forget(self):
+        registry = CircuitBreakerRegistry(httpx.AsyncClient(), failure_threshold=1)
+        registry.record_failure("http://departed.com")
+        assert circuit_state("http://departed.com") == 2
+
+        registry.forget("http://departed.com")
+
+        assert circuit_state("http://departed.com") is None
+        # A new pod reusing the address starts closed
+        assert registry.allow_request("http://departed.com")
+        registry.forget("http://unknown.com")
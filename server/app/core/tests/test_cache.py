@@ -0,0 +1,88 @@
+import time
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+from rdflib import Graph, Literal, URIRef
+
+from ..cache import TRIPLE_OVERHEAD, TTLCache, graph_size
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, {"cache": "test", **labels}) or 0
+
+
+class TestTTLCache:
+    @pytest.fixture
+    def cache(self):
+        return TTLCache[str]("test", max_bytes=10, ttl=30.0, sizeof=len)
+
+    def test_hit_and_miss(self, cache):
+        hits = sample("ds_search_cache_hits_total")
+        misses = sample("ds_search_cache_misses_total")
+
+        assert cache.get("a") is None
+        cache.put("a", "value")
+
+        assert cache.get("a") == "value"
+        assert sample("ds_search_cache_hits_total") == hits + 1
+        assert sample("ds_search_cache_misses_total") == misses + 1
+
+    def test_expiry(self, cache):
+        cache.put("a", "value")
+        cache.put("b", "value", ttl=60.0)
+
+        with patch("time.monotonic", return_value=time.monotonic() + 31):
+            assert cache.get("a") is None
+            assert cache.get("b") == "value"
+        assert len(cache) == 1
+
+    def test_stale(self):
+        cache = TTLCache[str]("test", max_bytes=10, ttl=30.0, sizeof=len, stale_ttl=60)
+        stale_hits = sample("ds_search_cache_stale_hits_total")
+        cache.put("a", "value")
+
+        assert cache.lookup("a") == ("value", True)
+        with patch("time.monotonic", return_value=time.monotonic() + 31):
+            assert cache.lookup("a") == ("value", False)
+            # Only fresh values are got
+            assert cache.get("a") is None
+        with patch("time.monotonic", return_value=time.monotonic() + 91):
+            assert cache.lookup("a") is None
+        assert sample("ds_search_cache_stale_hits_total") == stale_hits + 2
+        assert len(cache) == 0
+
+    def test_least_recently_used_evicted(self, cache):
+        evictions = sample("ds_search_cache_evictions_total", reason="size")
+        cache.put("a", "aaaa")
+        cache.put("b", "bbbb")
+        cache.get("a")
+
+        cache.put("c", "cccc")
+
+        assert cache.get("b") is None
+        assert cache.get("a") == "aaaa"
+        assert cache.size == 8
+        assert sample("ds_search_cache_bytes") == 8
+        assert sample("ds_search_cache_evictions_total", reason="size") == (
+            evictions + 1
+        )
+
+    def test_entry_larger_than_bound(self, cache):
+        cache.put("a", "a" * 11)
+
+        assert len(cache) == 0
+
+    def test_replace(self, cache):
+        cache.put("a", "aaaa")
+        cache.put("a", "bb")
+
+        assert cache.get("a") == "bb"
+        assert cache.size == 2
+
+
+def test_graph_size():
+    graph = Graph()
+    graph.add((URIRef("urn:s"), URIRef("urn:p"), Literal("value")))
+
+    assert graph_size(graph) == 5 + 5 + 5 + TRIPLE_OVERHEAD
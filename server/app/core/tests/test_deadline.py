@@ -0,0 +1,35 @@
+import math
+import time
+from unittest.mock import patch
+
+import pytest
+
+from ..deadline import Deadline, DeadlineExceeded
+
+
+class TestDeadline:
+    def test_common(self):
+        deadline = Deadline.from_budget_ms(800)
+        assert 0.7 < deadline.remaining() <= 0.8
+        assert not deadline.expired
+        deadline.check()
+
+    def test_expired(self):
+        deadline = Deadline.from_budget(1)
+        with patch("time.monotonic", return_value=time.monotonic() + 2):
+            assert deadline.remaining() == 0
+            assert deadline.expired
+            with pytest.raises(DeadlineExceeded):
+                deadline.check()
+
+    def test_budget_ms(self):
+        deadline = Deadline(expires_at=100.0)
+        with patch("time.monotonic", return_value=99.0):
+            assert deadline.budget_ms() == 1000
+            assert deadline.budget_ms(margin=0.05) == 950
+            assert deadline.budget_ms(margin=2.0) == 0
+
+    @pytest.mark.parametrize("budget", [math.inf, -math.inf, math.nan])
+    def test_not_finite(self, budget):
+        with pytest.raises(ValueError):
+            Deadline.from_budget_ms(budget)
@@ -1,9 +1,20 @@
+import asyncio
 import socket
 from unittest.mock import patch
 
+import httpx
 import pytest
+from prometheus_client import REGISTRY
 
-from ..discovery import DummyDiscoveryService, KubeDiscoveryService
+from ..discovery import (
+    DummyDiscoveryService,
+    KubeDiscoveryService,
+    KubeWatchDiscoveryService,
+    PeerEndpoint,
+    ServiceAccountAuth,
+)
+from ..peers import PeerTable
+from .fake_kube import FakeKubeAPI, pod_factory
 
 
 class TestDummyDiscoveryService:
@@ -36,8 +47,195 @@ class TestKubeDiscoveryService:
     @pytest.mark.asyncio
     async def test_failure(self):
         service = KubeDiscoveryService("default", "my-service", 8080)
+        failures = (
+            REGISTRY.get_sample_value("ds_search_discovery_dns_failures_total") or 0
+        )
         with patch("socket.gethostname", return_value="host"), patch(
-            "socket.gethostbyname", side_effect=socket.gaierror("test error")
+            "socket.gethostbyname_ex", side_effect=socket.gaierror("test error")
         ):
             result = await service.discover()
             assert result == []
+        assert (
+            REGISTRY.get_sample_value("ds_search_discovery_dns_failures_total")
+            == failures + 1
+        )
+
+    @pytest.mark.asyncio
+    async def test_cache(self):
+        service = KubeDiscoveryService("default", "my-service", 8080, cache_ttl=60)
+        with patch(
+            "socket.gethostbyname_ex", return_value=("fqdn", [], ["10.0.0.1"])
+        ) as mock_resolve:
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+            assert mock_resolve.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_stale_while_refresh(self):
+        service = KubeDiscoveryService("default", "my-service", 8080, cache_ttl=0)
+        with patch("socket.gethostbyname_ex", return_value=("fqdn", [], ["10.0.0.1"])):
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+
+        with patch("socket.gethostbyname_ex", return_value=("fqdn", [], ["10.0.0.2"])):
+            # The expired entry is served while the refresh runs
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+            await asyncio.sleep(0.05)
+            assert await service.discover() == ["http://10.0.0.2:8080"]
+
+    @pytest.mark.asyncio
+    async def test_failure_keeps_stale(self):
+        service = KubeDiscoveryService("default", "my-service", 8080, cache_ttl=0)
+        with patch("socket.gethostbyname_ex", return_value=("fqdn", [], ["10.0.0.1"])):
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+
+        with patch(
+            "socket.gethostbyname_ex", side_effect=socket.gaierror("test error")
+        ):
+            await service.discover()
+            await asyncio.sleep(0.05)
+            assert await service.discover() == ["http://10.0.0.1:8080"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_first_discovery(self):
+        service = KubeDiscoveryService("default", "my-service", 8080)
+        with patch(
+            "socket.gethostbyname_ex", return_value=("fqdn", [], ["10.0.0.1"])
+        ) as mock_resolve:
+            results = await asyncio.gather(*(service.discover() for _ in range(5)))
+            assert results == [["http://10.0.0.1:8080"]] * 5
+            assert mock_resolve.call_count == 1
+
+
+class TestKubeWatchDiscoveryService:
+    @pytest.fixture
+    def api(self):
+        return FakeKubeAPI(
+            pods=[
+                pod_factory("search-1", ip="10.0.0.1", node_id="node1"),
+                pod_factory("search-2", ip="10.0.0.2", node_id="node2", ready=False),
+                pod_factory("search-3", ip=None),
+            ]
+        )
+
+    @pytest.fixture
+    def service(self, api):
+        return KubeWatchDiscoveryService(
+            http_client=api.client(),
+            namespace="default",
+            label_selector="app.kubernetes.io/name=ds-search",
+            service_port=8080,
+            retry_delay=0.01,
+        )
+
+    @pytest.mark.asyncio
+    async def test_discover(self, api, service):
+        discovered = await service.discover()
+
+        assert discovered == ["http://10.0.0.1:8080"]
+        request = api.requests[0]
+        assert request.url.path == "/api/v1/namespaces/default/pods"
+        assert request.url.params["labelSelector"] == "app.kubernetes.io/name=ds-search"
+
+    @pytest.mark.asyncio
+    async def test_watch(self, api, service):
+        updates = service.watch()
+        try:
+            assert await anext(updates) == [
+                PeerEndpoint("http://10.0.0.1:8080", node_id="node1", ready=True),
+                PeerEndpoint("http://10.0.0.2:8080", node_id="node2", ready=False),
+            ]
+
+            next_update = asyncio.ensure_future(anext(updates))
+            await api.wait_for_watch()
+            assert api.requests[-1].url.params["resourceVersion"] == "1"
+
+            api.push("BOOKMARK", {"metadata": {"resourceVersion": "2"}})
+            api.push("MODIFIED", pod_factory("search-2", ip="10.0.0.2", node_id="n2"))
+            assert await next_update == [
+                PeerEndpoint("http://10.0.0.1:8080", node_id="node1", ready=True),
+                PeerEndpoint("http://10.0.0.2:8080", node_id="n2", ready=True),
+            ]
+
+            api.push("DELETED", pod_factory("search-1", ip="10.0.0.1"))
+            assert await anext(updates) == [
+                PeerEndpoint("http://10.0.0.2:8080", node_id="n2", ready=True),
+            ]
+            assert await service.discover() == ["http://10.0.0.2:8080"]
+        finally:
+            await updates.aclose()
+
+    @pytest.mark.asyncio
+    async def test_watch_reconnect(self, api, service):
+        updates = service.watch()
+        try:
+            await anext(updates)
+            next_update = asyncio.ensure_future(anext(updates))
+            await api.wait_for_watch()
+            api.push(
+                "ADDED",
+                pod_factory("search-4", ip="10.0.0.4", resource_version="5"),
+            )
+            await next_update
+
+            next_update = asyncio.ensure_future(anext(updates))
+            api.close_watch()
+            await api.wait_for_watch(2)
+            assert api.requests[-1].url.params["resourceVersion"] == "5"
+            api.push("DELETED", pod_factory("search-4", ip="10.0.0.4"))
+            endpoints = await next_update
+            assert [endpoint.url for endpoint in endpoints] == [
+                "http://10.0.0.1:8080",
+                "http://10.0.0.2:8080",
+            ]
+        finally:
+            await updates.aclose()
+
+    @pytest.mark.asyncio
+    async def test_watch_expired(self, api, service):
+        updates = service.watch()
+        try:
+            await anext(updates)
+            next_update = asyncio.ensure_future(anext(updates))
+            await api.wait_for_watch()
+
+            api.pods = [pod_factory("search-5", ip="10.0.0.5")]
+            api.resource_version = "10"
+            api.push("ERROR", {"code": 410, "message": "too old resource version"})
+
+            assert await next_update == [
+                PeerEndpoint("http://10.0.0.5:8080", node_id="node1", ready=True),
+            ]
+        finally:
+            await updates.aclose()
+
+    @pytest.mark.asyncio
+    async def test_peer_table(self, api, service):
+        table = PeerTable(service)
+        await table.start()
+        try:
+            await api.wait_for_watch()
+            api.push("ADDED", pod_factory("search-6", ip="10.0.0.6", node_id="n6"))
+            for _ in range(100):
+                if len(table.snapshot()) == 3:
+                    break
+                await asyncio.sleep(0.01)
+            peers = {peer.url: peer for peer in table.snapshot()}
+            assert peers["http://10.0.0.6:8080"].node_id == "n6"
+            assert not peers["http://10.0.0.2:8080"].ready
+        finally:
+            await table.aclose()
+            await service.aclose()
+
+
+class TestServiceAccountAuth:
+    def test_common(self, tmp_path):
+        token_file = tmp_path / "token"
+        token_file.write_text("token1\n")
+        auth = ServiceAccountAuth(str(token_file))
+
+        request = next(auth.auth_flow(httpx.Request("GET", "https://kube.test")))
+        assert request.headers["Authorization"] == "Bearer token1"
+
+        token_file.write_text("token2\n")
+        request = next(auth.auth_flow(httpx.Request("GET", "https://kube.test")))
+        assert request.headers["Authorization"] == "Bearer token2"
@@ -0,0 +1,140 @@
+from unittest.mock import patch
+
+import pytest
+
+from ..fingerprint import canonical_form, fingerprint
+
+DEFAULT_CONTEXT = {
+    "@vocab": "http://data-space.org/",
+    "dcat": "http://www.w3.org/ns/dcat#",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+
+
+def filters(context, dataset="dcat:dataset", identifier="dcterms:identifier"):
+    return {
+        "@context": context,
+        "@type": "Filters",
+        "filters": [{dataset: {identifier: "123"}}, {"title": "Sample"}],
+    }
+
+
+class TestFingerprint:
+    def test_stable(self):
+        document = filters(DEFAULT_CONTEXT)
+
+        assert fingerprint(document) == fingerprint(filters(DEFAULT_CONTEXT))
+        assert len(fingerprint(document)) == 64
+
+    def test_prefixes_and_aliases(self):
+        aliased = filters(
+            {
+                "@vocab": "http://data-space.org/",
+                "d": "http://www.w3.org/ns/dcat#",
+                "identifier": "http://purl.org/dc/terms/identifier",
+                "kind": "@type",
+            },
+            dataset="d:dataset",
+            identifier="identifier",
+        )
+        aliased["kind"] = aliased.pop("@type")
+        full = filters(
+            {"@vocab": "http://data-space.org/"},
+            dataset="http://www.w3.org/ns/dcat#dataset",
+            identifier="http://purl.org/dc/terms/identifier",
+        )
+
+        assert fingerprint(aliased) == fingerprint(filters(DEFAULT_CONTEXT))
+        assert fingerprint(full) == fingerprint(filters(DEFAULT_CONTEXT))
+
+    def test_order(self):
+        document = filters(DEFAULT_CONTEXT)
+        reordered = dict(reversed(document.items()))
+        reordered["filters"] = list(reversed(document["filters"]))
+
+        assert fingerprint(reordered) == fingerprint(document)
+        assert fingerprint(reordered, DEFAULT_CONTEXT) == fingerprint(
+            document, DEFAULT_CONTEXT
+        )
+
+    def test_list_order_kept(self):
+        context = {"@vocab": "http://data-space.org/"}
+        first = {"@context": context, "path": {"@list": ["a", "b"]}}
+        second = {"@context": context, "path": {"@list": ["b", "a"]}}
+
+        assert fingerprint(first) != fingerprint(second)
+
+    def test_values(self):
+        other = filters(DEFAULT_CONTEXT)
+        other["filters"][1]["title"] = "Other"
+
+        assert fingerprint(other) != fingerprint(filters(DEFAULT_CONTEXT))
+
+    def test_default_context_not_expanded_by_pyld(self):
+        document = filters(DEFAULT_CONTEXT)
+        with patch("app.core.fingerprint.jsonld.expand") as expand:
+            form = canonical_form(document, DEFAULT_CONTEXT)
+
+        expand.assert_not_called()
+        assert form == canonical_form(document)
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            {"@id": "dcat:catalog", "@type": ["dcat:Catalog", "Filters"]},
+            {"@id": "http://example.com/1"},
+            {"@type": [], "title": [None, [1, True], {}], "empty": []},
+            {"dcat:dataset": {"@id": "dcat:x"}, "http://www.w3.org/ns/dcat#dataset": 1},
+            {"dcterms://host/path": 1, "urn:x:y": None, "dcat": "dcat"},
+        ],
+    )
+    def test_default_context_same_as_pyld(self, body):
+        document = {"@context": DEFAULT_CONTEXT, **body}
+
+        assert canonical_form(document, DEFAULT_CONTEXT) == canonical_form(document)
+
+    def test_default_context_terms_not_prefixes(self):
+        context = {**DEFAULT_CONTEXT, "identifier": "http://purl.org/dc/terms/id"}
+        document = {"@context": context, "identifier:x": 1}
+
+        assert canonical_form(document, context) == canonical_form(document)
+
+    def test_default_context_aliased(self):
+        aliased = filters(
+            {
+                "@vocab": "http://data-space.org/",
+                "d": "http://www.w3.org/ns/dcat#",
+                "identifier": "http://purl.org/dc/terms/identifier",
+            },
+            dataset="d:dataset",
+            identifier="identifier",
+        )
+
+        assert fingerprint(aliased, DEFAULT_CONTEXT) == fingerprint(
+            filters(DEFAULT_CONTEXT), DEFAULT_CONTEXT
+        )
+
+    def test_default_context_unsupported(self):
+        document = {
+            "@context": DEFAULT_CONTEXT,
+            "path": {"@list": ["a", "b"]},
+            "title": {"@value": "Sample", "@language": "en"},
+        }
+
+        assert canonical_form(document, DEFAULT_CONTEXT) == canonical_form(document)
+
+    def test_undefined_terms(self):
+        # Expansion would drop both filters, which must not look alike
+        first = {"@context": {}, "filters": [{"a": 1}]}
+        second = {"@context": {}, "filters": [{"b": 2}]}
+
+        assert canonical_form(first)[0] == "document"
+        assert fingerprint(first) != fingerprint(second)
+        assert fingerprint({"filters": [{"a": 1}]}) != fingerprint(
+            {"filters": [{"b": 2}]}
+        )
+
+    def test_remote_context_not_loaded(self):
+        document = {"@context": ["https://example.com/context"], "a": 1}
+
+        assert canonical_form(document)[0] == "document"
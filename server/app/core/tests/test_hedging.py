@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ..hedging import HedgeBudget, RequestHedger
+from ..latency import AdaptiveTimeouts
+
+
+def hedges(name):
+    return REGISTRY.get_sample_value(f"ds_search_hedges_{name}_total") or 0
+
+
+class TestHedgeBudget:
+    def test_ratio(self):
+        budget = HedgeBudget(ratio=0.25)
+        spent = 0
+        for _ in range(20):
+            budget.deposit()
+            spent += budget.try_spend()
+        assert spent == 5
+
+    def test_burst_is_capped(self):
+        budget = HedgeBudget(ratio=1.0, max_tokens=2.0)
+        for _ in range(10):
+            budget.deposit()
+        assert budget.try_spend()
+        assert budget.try_spend()
+        assert not budget.try_spend()
+
+
+class TestRequestHedger:
+    @pytest.fixture
+    def timeouts(self):
+        return AdaptiveTimeouts(
+            default_timeout=1.0, min_timeout=0.01, max_timeout=2.0, min_samples=3
+        )
+
+    @pytest.fixture
+    def hedger(self, timeouts):
+        return RequestHedger(
+            timeouts, HedgeBudget(ratio=1.0), delay=0.05, percentile=0.95
+        )
+
+    def test_delay_for(self, hedger, timeouts):
+        assert hedger.delay_for("http://peer1.com") == 0.05
+        for latency in (0.1, 0.2, 0.3):
+            timeouts.observe("http://peer1.com", latency)
+        assert hedger.delay_for("http://peer1.com") == 0.3
+
+    @pytest.mark.asyncio
+    async def test_fast_request_is_not_hedged(self, hedger):
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        sent = hedges("sent")
+        assert await hedger.run("http://peer1.com", request) == 1
+        assert calls == 1
+        assert hedges("sent") == sent
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins(self, hedger):
+        calls = 0
+        cancelled = asyncio.Event()
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.set()
+                    raise
+            return calls
+
+        sent, won = hedges("sent"), hedges("won")
+        assert await hedger.run("http://peer1.com", request) == 2
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        assert hedges("sent") == sent + 1
+        assert hedges("won") == won + 1
+
+    @pytest.mark.asyncio
+    async def test_primary_wins(self, hedger):
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            call = calls
+            await asyncio.sleep(0.1 if call == 1 else 10)
+            return call
+
+        won = hedges("won")
+        assert await hedger.run("http://peer1.com", request) == 1
+        assert calls == 2
+        assert hedges("won") == won
+
+    @pytest.mark.asyncio
+    async def test_failed_hedge_waits_for_primary(self, hedger):
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            call = calls
+            if call == 2:
+                raise RuntimeError("hedge failed")
+            await asyncio.sleep(0.1)
+            return call
+
+        assert await hedger.run("http://peer1.com", request) == 1
+
+    @pytest.mark.asyncio
+    async def test_all_failed(self, hedger):
+        async def request():
+            await asyncio.sleep(0.1)
+            raise RuntimeError("failed")
+
+        with pytest.raises(RuntimeError):
+            await hedger.run("http://peer1.com", request)
+
+    @pytest.mark.asyncio
+    async def test_budget_exhausted(self, timeouts):
+        hedger = RequestHedger(timeouts, HedgeBudget(ratio=0.0), delay=0.01)
+        calls = 0
+
+        async def request():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+
+        assert await hedger.run("http://peer1.com", request) == 1
+        assert calls == 1
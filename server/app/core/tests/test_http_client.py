@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock
+
+import httpx
+import pytest
+
+from ..http_client import HttpPoolCollector, create_http_client
+
+
+def make_connection(idle: bool, closed: bool = False) -> MagicMock:
+    connection = MagicMock()
+    connection.is_idle.return_value = idle
+    connection.is_closed.return_value = closed
+    return connection
+
+
+class TestCreateHttpClient:
+    @pytest.mark.asyncio
+    async def test_common(self):
+        client = create_http_client(
+            max_connections=10,
+            max_keepalive_connections=5,
+            keepalive_expiry=15.0,
+            timeout=5.0,
+            connect_timeout=1.0,
+            read_timeout=3.0,
+        )
+        async with client:
+            assert client.timeout == httpx.Timeout(5.0, connect=1.0, read=3.0)
+            pool = client._transport._pool  # type: ignore[attr-defined]
+            assert pool._max_connections == 10
+            assert pool._max_keepalive_connections == 5
+            assert pool._keepalive_expiry == 15.0
+
+
+class TestHttpPoolCollector:
+    def test_common(self):
+        client = MagicMock()
+        client._transport._pool.connections = [
+            make_connection(idle=True),
+            make_connection(idle=False),
+            make_connection(idle=False),
+            make_connection(idle=False, closed=True),
+        ]
+        collector = HttpPoolCollector(client, max_connections=10)
+
+        metrics = {metric.name: metric for metric in collector.collect()}
+
+        samples = {
+            sample.labels["state"]: sample.value
+            for sample in metrics["ds_search_http_pool_connections"].samples
+        }
+        assert samples == {"active": 2, "idle": 1}
+        max_connections = metrics["ds_search_http_pool_max_connections"]
+        assert max_connections.samples[0].value == 10
+
+    def test_no_pool(self):
+        client = MagicMock()
+        client._transport = object()
+        collector = HttpPoolCollector(client, max_connections=10)
+
+        metrics = {metric.name: metric for metric in collector.collect()}
+
+        samples = metrics["ds_search_http_pool_connections"].samples
+        assert [sample.value for sample in samples] == [0, 0]
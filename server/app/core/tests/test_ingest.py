@@ -0,0 +1,165 @@
+from typing import Any
+
+import json
+
+import pytest
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from ..ingest import (
+    BodyTooLarge,
+    JSONLDGraphBuilder,
+    JSONLDRecordSplitter,
+    parse_json_ld,
+    parse_json_ld_stream,
+)
+
+CONTEXT = {
+    "dcat": "http://www.w3.org/ns/dcat#",
+    "dcterms": "http://purl.org/dc/terms/",
+}
+RECORDS: list[dict[str, Any]] = [
+    {
+        "@id": "http://example.com/catalog/1",
+        "@type": "dcat:Catalog",
+        "dcterms:title": 'Catalog "1" with [brackets] and {braces} \\ ü',
+        "dcat:dataset": [
+            {"@id": "http://example.com/dataset/1", "@type": "dcat:Dataset"},
+            {"@type": "dcat:Dataset", "dcterms:title": "Anonymous"},
+        ],
+    },
+    {
+        "@id": "http://example.com/catalog/2",
+        "@type": "dcat:Catalog",
+        "dcterms:title": "Catalog 2",
+    },
+]
+
+
+async def chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+def parsed(document):
+    graph = Graph()
+    graph.parse(data=document, format="json-ld")
+    return graph
+
+
+class TestJSONLDRecordSplitter:
+    def test_records(self):
+        document = json.dumps({"@context": CONTEXT, "@graph": RECORDS}, indent=2)
+        splitter = JSONLDRecordSplitter()
+
+        records = splitter.feed(document)
+
+        assert [json.loads(record) for record in records] == RECORDS
+        assert splitter.head == {"@context": CONTEXT}
+        assert json.loads(splitter.close()) == {
+            "@context": CONTEXT,
+            "@graph": [None, None],
+        }
+
+    def test_records_are_returned_as_they_complete(self):
+        document = json.dumps({"@context": CONTEXT, "@graph": RECORDS})
+        first_end = document.index(', {"@id": "http://example.com/catalog/2"')
+        splitter = JSONLDRecordSplitter()
+
+        assert len(splitter.feed(document[:first_end])) == 1
+        assert len(splitter.feed(document[first_end:])) == 1
+
+    def test_byte_by_byte(self):
+        document = json.dumps({"@context": CONTEXT, "@graph": RECORDS})
+        splitter = JSONLDRecordSplitter()
+
+        records = [record for char in document for record in splitter.feed(char)]
+
+        assert [json.loads(record) for record in records] == RECORDS
+
+    def test_no_graph(self):
+        document = json.dumps({"@context": CONTEXT, **RECORDS[1]})
+        splitter = JSONLDRecordSplitter()
+
+        assert splitter.feed(document) == []
+        assert not splitter.has_graph
+        assert splitter.close() == document
+
+    def test_nested_graph_is_not_split(self):
+        document = json.dumps({"@context": CONTEXT, "x": {"@graph": RECORDS}})
+        splitter = JSONLDRecordSplitter()
+
+        assert splitter.feed(document) == []
+        assert splitter.close() == document
+
+
+class TestJSONLDGraphBuilder:
+    def test_same_graph_as_parse(self):
+        document = {"@context": CONTEXT, "@graph": RECORDS}
+        graph = Graph()
+        builder = JSONLDGraphBuilder(graph, CONTEXT)
+
+        builder.add(RECORDS[:1])
+        builder.add(RECORDS[1:])
+
+        assert isomorphic(graph, parsed(json.dumps(document)))
+
+    def test_parse_json_ld(self):
+        document = {"@context": CONTEXT, **RECORDS[0]}
+
+        graph = parse_json_ld(document)
+
+        assert len(graph) == 7
+        assert isomorphic(graph, parsed(json.dumps(document)))
+
+
+class TestParseJSONLDStream:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 100000])
+    @pytest.mark.asyncio
+    async def test_same_graph_as_parse(self, chunk_size):
+        document = json.dumps({"@context": CONTEXT, "@graph": RECORDS}).encode()
+
+        graph = await parse_json_ld_stream(chunked(document, chunk_size))
+
+        assert len(graph) == 9
+        assert isomorphic(graph, parsed(document))
+
+    @pytest.mark.asyncio
+    async def test_context_after_graph(self):
+        document = json.dumps({"@graph": RECORDS, "@context": CONTEXT}).encode()
+
+        graph = await parse_json_ld_stream(chunked(document, 16))
+
+        assert isomorphic(graph, parsed(document))
+
+    @pytest.mark.parametrize(
+        "document",
+        [
+            {"@context": CONTEXT, "@graph": RECORDS, "dcterms:title": "Outer"},
+            {"@context": CONTEXT, "dcterms:title": "Outer", "@graph": RECORDS},
+            {"@id": "http://example.com/outer", "@graph": RECORDS, "@context": CONTEXT},
+        ],
+    )
+    @pytest.mark.asyncio
+    async def test_members_next_to_graph(self, document):
+        data = json.dumps(document).encode()
+
+        graph = await parse_json_ld_stream(chunked(data, 16))
+
+        assert isomorphic(graph, parse_json_ld(document))
+
+    @pytest.mark.asyncio
+    async def test_single_node(self):
+        document = json.dumps({"@context": CONTEXT, **RECORDS[0]}).encode()
+
+        graph = await parse_json_ld_stream(chunked(document, 16))
+
+        assert len(graph) == 7
+        assert isomorphic(graph, parsed(document))
+
+    @pytest.mark.asyncio
+    async def test_too_large(self):
+        document = json.dumps({"@context": CONTEXT, "@graph": RECORDS}).encode()
+
+        with pytest.raises(BodyTooLarge):
+            await parse_json_ld_stream(chunked(document, 16), max_size=100)
@@ -0,0 +1,84 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from ..latency import AdaptiveTimeouts, LatencyWindow
+
+
+class TestLatencyWindow:
+    def test_percentile(self):
+        window = LatencyWindow(size=100)
+        assert window.percentile(0.99) is None
+
+        for i in range(1, 101):
+            window.observe(i / 1000)
+
+        assert window.percentile(0.5) == 0.05
+        assert window.percentile(0.99) == 0.099
+        assert window.percentile(1.0) == 0.1
+
+    def test_sliding(self):
+        window = LatencyWindow(size=3)
+        for latency in (5.0, 0.1, 0.2, 0.3):
+            window.observe(latency)
+
+        assert len(window) == 3
+        assert window.percentile(1.0) == 0.3
+
+
+class TestAdaptiveTimeouts:
+    @pytest.fixture
+    def timeouts(self):
+        return AdaptiveTimeouts(
+            default_timeout=5.0,
+            min_timeout=0.2,
+            max_timeout=10.0,
+            multiplier=2.0,
+            min_samples=5,
+        )
+
+    def test_fallback(self, timeouts):
+        assert timeouts.timeout_for("http://peer1.com") == 5.0
+        for _ in range(4):
+            timeouts.observe("http://peer1.com", 0.5)
+        assert timeouts.timeout_for("http://peer1.com") == 5.0
+
+    def test_derived_from_p99(self, timeouts):
+        for _ in range(5):
+            timeouts.observe("http://peer1.com", 0.5)
+        assert timeouts.timeout_for("http://peer1.com") == 1.0
+        assert timeouts.timeout_for("http://peer2.com") == 5.0
+
+    def test_forget(self, timeouts):
+        for _ in range(5):
+            timeouts.observe("http://departed.com", 0.5)
+        timeouts.timeout_for("http://departed.com")
+
+        timeouts.forget("http://departed.com")
+
+        assert timeouts.percentile("http://departed.com", 0.99) is None
+        assert (
+            REGISTRY.get_sample_value(
+                "ds_search_peer_timeout_seconds", {"peer": "http://departed.com"}
+            )
+            is None
+        )
+        timeouts.forget("http://unknown.com")
+
+    def test_clamped(self, timeouts):
+        for _ in range(5):
+            timeouts.observe("http://fast.com", 0.01)
+            timeouts.observe("http://slow.com", 8.0)
+
+        assert timeouts.timeout_for("http://fast.com") == 0.2
+        assert timeouts.timeout_for("http://slow.com") == 10.0
+
+    def test_disabled(self):
+        timeouts = AdaptiveTimeouts(
+            default_timeout=5.0,
+            min_timeout=0.2,
+            max_timeout=10.0,
+            min_samples=1,
+            enabled=False,
+        )
+        timeouts.observe("http://peer1.com", 0.5)
+        assert timeouts.timeout_for("http://peer1.com") == 5.0
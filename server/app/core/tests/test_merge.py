@@ -0,0 +1,91 @@
+from typing import Any
+
+from ..merge import FramedMerge, count_nodes, merge_node, relabel_blank_nodes
+
+
+class TestMergeNode:
+    def test_values_kept_once(self):
+        target = {"@id": "ex:1", "title": "A", "keyword": ["x", "y"]}
+
+        merge_node(target, {"@id": "ex:1", "title": "A", "keyword": "z", "new": 1})
+
+        assert target == {
+            "@id": "ex:1",
+            "title": "A",
+            "keyword": ["x", "y", "z"],
+            "new": 1,
+        }
+
+    def test_embedded_nodes_merged(self):
+        target: dict[str, Any] = {
+            "@id": "ex:1",
+            "dataset": {"@id": "ex:d", "title": "D"},
+        }
+
+        merge_node(
+            target,
+            {
+                "@id": "ex:1",
+                "dataset": [
+                    {"@id": "ex:d", "keyword": "k"},
+                    {"@id": "ex:e"},
+                ],
+            },
+        )
+
+        assert target["dataset"] == [
+            {"@id": "ex:d", "title": "D", "keyword": "k"},
+            {"@id": "ex:e"},
+        ]
+
+
+class TestFramedMerge:
+    def test_merge_by_id(self):
+        merge = FramedMerge()
+
+        merge.add([{"@id": "ex:2", "title": "B"}, {"@id": "ex:1", "title": "A"}])
+        merge.add([{"@id": "ex:1", "title": "A", "keyword": "k"}, {"title": "C"}])
+
+        assert merge.nodes == [
+            {"title": "C"},
+            {"@id": "ex:1", "title": "A", "keyword": "k"},
+            {"@id": "ex:2", "title": "B"},
+        ]
+
+    def test_blank_nodes_of_documents_kept_apart(self):
+        merge = FramedMerge()
+
+        merge.add([{"@id": "_:b0", "title": "A"}])
+        merge.add([{"@id": "_:b0", "title": "B"}])
+
+        assert merge.nodes == [
+            {"@id": "_:d0b0", "title": "A"},
+            {"@id": "_:d1b0", "title": "B"},
+        ]
+
+    def test_empty(self):
+        assert FramedMerge().nodes == []
+
+
+def test_relabel_blank_nodes():
+    assert relabel_blank_nodes(
+        {"@id": "_:b0", "p": [{"@id": "_:b1"}, {"@id": "ex:1"}, "_:b2"]}, "n1"
+    ) == {"@id": "_:n1b0", "p": [{"@id": "_:n1b1"}, {"@id": "ex:1"}, "_:b2"]}
+
+
+def test_count_nodes():
+    nodes = [
+        {
+            "@id": "ex:catalog",
+            "@type": "dcat:Catalog",
+            "dcat:dataset": [
+                {"@id": "ex:1", "@type": "dcat:Dataset"},
+                {"@type": ["dcat:Dataset", "Thing"]},
+                {"@id": "ex:2", "@type": "dcat:Distribution"},
+            ],
+        },
+        {"@id": "ex:1", "@type": "dcat:Dataset"},
+    ]
+
+    assert count_nodes(nodes, "dcat:Dataset") == 2
+    assert count_nodes(nodes, "dcat:Catalog") == 1
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from prometheus_client import REGISTRY
+from rdflib import Graph
+from rdflib.compare import isomorphic
+
+from ..ingest import parse_json_ld, parse_json_ld_stream
+from ..offload import Offloader, OffloadExecutor
+
+DOCUMENT = {
+    "@context": {"dcat": "http://www.w3.org/ns/dcat#", "ex": "http://example.com/"},
+    "@graph": [
+        {
+            "@id": "ex:catalog",
+            "@type": "dcat:Catalog",
+            "dcat:dataset": [
+                {"@id": "ex:dataset", "@type": "dcat:Dataset"},
+                {"@type": "dcat:Dataset"},
+            ],
+        },
+        {"@id": "ex:other", "@type": "dcat:Catalog"},
+    ],
+}
+
+
+def waits(stage):
+    return (
+        REGISTRY.get_sample_value(
+            "ds_search_offload_wait_seconds_count", {"stage": stage}
+        )
+        or 0
+    )
+
+
+def queue_depth():
+    return REGISTRY.get_sample_value("ds_search_offload_queue_depth")
+
+
+async def chunks(data, size=40):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+class TestOffloader:
+    @pytest.fixture(params=list(OffloadExecutor))
+    def offloader(self, request):
+        offloader = Offloader(request.param, max_workers=1)
+        yield offloader
+        offloader.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_fill(self, offloader):
+        graph = await offloader.fill("parse", Graph(), parse_json_ld, DOCUMENT)
+
+        assert isomorphic(graph, parse_json_ld(DOCUMENT))
+
+    @pytest.mark.asyncio
+    async def test_run_on_graph(self, offloader):
+        graph = parse_json_ld(DOCUMENT)
+
+        assert await offloader.run_on_graph("frame", len, graph) == len(graph)
+
+    @pytest.mark.asyncio
+    async def test_parse_stream(self, offloader):
+        data = json.dumps(DOCUMENT).encode()
+
+        graph = await parse_json_ld_stream(chunks(data), offloader=offloader)
+
+        assert isomorphic(graph, parse_json_ld(DOCUMENT))
+
+    @pytest.mark.asyncio
+    async def test_wait_time(self):
+        offloader = Offloader(OffloadExecutor.THREAD)
+        before = waits("test")
+
+        assert await offloader.run("test", sum, [1, 2]) == 3
+        assert waits("test") == before + 1
+        offloader.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_queue_depth(self):
+        offloader = Offloader(OffloadExecutor.THREAD, max_workers=1)
+        release = threading.Event()
+
+        tasks = [
+            asyncio.create_task(offloader.run("test", release.wait)) for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+        assert queue_depth() == 2
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert queue_depth() == 0
+        offloader.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_event_loop_not_blocked(self):
+        offloader = Offloader(OffloadExecutor.THREAD)
+        release = threading.Event()
+
+        task = asyncio.create_task(offloader.run("test", release.wait))
+        # The event loop goes on while the task runs
+        await asyncio.sleep(0.01)
+        assert not task.done()
+
+        release.set()
+        assert await task
+        offloader.shutdown()
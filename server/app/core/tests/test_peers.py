@@ -0,0 +1,103 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from ..peers import PeerTable
+
+
+class TestPeerTable:
+    @pytest.fixture
+    def discovery_service(self):
+        discovery_service = AsyncMock()
+        discovery_service.discover.return_value = [
+            "http://peer1.com",
+            "http://peer2.com",
+        ]
+        return discovery_service
+
+    @pytest.mark.asyncio
+    async def test_refresh(self, discovery_service):
+        table = PeerTable(discovery_service)
+        assert table.snapshot() == ()
+
+        await table.refresh()
+
+        assert [peer.url for peer in table.snapshot()] == [
+            "http://peer1.com",
+            "http://peer2.com",
+        ]
+        assert all(peer.healthy for peer in table.snapshot())
+
+    @pytest.mark.asyncio
+    async def test_refresh_failure(self, discovery_service):
+        table = PeerTable(discovery_service)
+        await table.refresh()
+
+        discovery_service.discover.side_effect = Exception("discovery error")
+        await table.refresh()
+
+        assert len(table.snapshot()) == 2
+
+    def test_update_keeps_stats(self, discovery_service):
+        table = PeerTable(discovery_service)
+        table.update(["http://peer1.com", "http://peer2.com"])
+        table.record_success("http://peer1.com", 0.1)
+
+        table.update(["http://peer1.com", "http://peer3.com"])
+
+        peers = {peer.url: peer for peer in table.snapshot()}
+        assert set(peers) == {"http://peer1.com", "http://peer3.com"}
+        assert peers["http://peer1.com"].successes == 1
+        assert peers["http://peer3.com"].successes == 0
+
+    def test_on_leave(self, discovery_service):
+        departed: list[str] = []
+        table = PeerTable(discovery_service, on_leave=[departed.append])
+        table.update(["http://peer1.com", "http://peer2.com"])
+
+        table.update(["http://peer2.com"])
+
+        assert departed == ["http://peer1.com"]
+
+    def test_snapshot_is_immutable(self, discovery_service):
+        table = PeerTable(discovery_service)
+        table.update(["http://peer1.com"])
+        snapshot = table.snapshot()
+
+        table.record_failure("http://peer1.com")
+
+        assert snapshot[0].healthy
+        assert not table.snapshot()[0].healthy
+        assert table.snapshot()[0].failures == 1
+
+    def test_record_success(self, discovery_service):
+        table = PeerTable(discovery_service, latency_alpha=0.5)
+        table.update(["http://peer1.com"])
+        table.record_failure("http://peer1.com")
+
+        table.record_success("http://peer1.com", 0.2)
+        table.record_success("http://peer1.com", 0.4)
+
+        peer = table.snapshot()[0]
+        assert peer.healthy
+        assert peer.successes == 2
+        assert peer.failures == 1
+        assert peer.latency_ewma == pytest.approx(0.3)
+
+    def test_record_unknown_peer(self, discovery_service):
+        table = PeerTable(discovery_service)
+        table.record_success("http://unknown.com", 0.1)
+        table.record_failure("http://unknown.com")
+        assert table.snapshot() == ()
+
+    @pytest.mark.asyncio
+    async def test_background_refresh(self, discovery_service):
+        table = PeerTable(discovery_service, refresh_interval=0.01)
+        await table.start()
+        try:
+            discovery_service.discover.return_value = ["http://peer3.com"]
+            await asyncio.sleep(0.05)
+            assert [peer.url for peer in table.snapshot()] == ["http://peer3.com"]
+        finally:
+            await table.aclose()
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ..deadline import Deadline, DeadlineExceeded
+from ..singleflight import SingleFlight
+
+
+def coalesced():
+    return (
+        REGISTRY.get_sample_value("ds_search_coalesced_total", {"operation": "test"})
+        or 0
+    )
+
+
+class Work:
+    """Slow work counting its executions"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return self.calls
+
+
+class TestSingleFlight:
+    @pytest.fixture
+    def flights(self):
+        return SingleFlight[int]("test")
+
+    @pytest.fixture
+    def work(self):
+        return Work()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_coalesced(self, flights, work):
+        before = coalesced()
+
+        results = await asyncio.gather(*(flights.run("a", work) for _ in range(3)))
+
+        assert results == [1, 1, 1]
+        assert work.calls == 1
+        assert coalesced() == before + 2
+        assert len(flights) == 0
+        # Once landed, the work runs anew
+        assert await flights.run("a", work) == 2
+
+    @pytest.mark.asyncio
+    async def test_different_keys(self, flights, work):
+        await asyncio.gather(flights.run("a", work), flights.run("b", work))
+
+        assert work.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_error_shared(self, flights):
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("failed")
+
+        results = await asyncio.gather(
+            flights.run("a", fail), flights.run("a", fail), return_exceptions=True
+        )
+
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    @pytest.mark.asyncio
+    async def test_waiter_cancelled(self, flights, work):
+        first = asyncio.create_task(flights.run("a", work))
+        second = asyncio.create_task(flights.run("a", work))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+
+        # The other waiter still gets the result of the shared work
+        assert await second == 1
+        assert first.cancelled()
+        assert work.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_all_waiters_cancelled(self, flights):
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return 1
+
+        waiters = [asyncio.create_task(flights.run("a", work)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert len(flights) == 0
+
+    @pytest.mark.asyncio
+    async def test_deadlines(self, flights):
+        async def answer(value):
+            await asyncio.sleep(0.05)
+            return value
+
+        results = await asyncio.gather(
+            flights.run("a", lambda: answer(1), Deadline.from_budget(1)),
+            # The first flight might be cut shorter than these calls allow
+            flights.run("a", lambda: answer(2), Deadline.from_budget(2)),
+            flights.run("a", lambda: answer(3)),
+            # Joins the flight with the earliest deadline not before its own
+            flights.run("a", lambda: answer(4), Deadline.from_budget(0.5)),
+            flights.run("a", lambda: answer(5), Deadline.from_budget(1.5)),
+        )
+
+        assert list(results) == [1, 2, 3, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_wait_bound_by_deadline(self, flights, work):
+        first = asyncio.create_task(flights.run("a", work))
+        await asyncio.sleep(0)
+
+        with pytest.raises(DeadlineExceeded):
+            await flights.run("a", work, Deadline.from_budget(0.01))
+
+        # The flight goes on for the caller without a deadline
+        assert await first == 1
+        assert work.calls == 1
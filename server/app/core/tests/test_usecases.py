@@ -1,33 +1,70 @@
+import asyncio
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
-from rdflib import Graph
+from prometheus_client import REGISTRY
+from rdflib import RDF, Graph, URIRef
+from rdflib.namespace import DCAT
 
+from ...rest_api.serializers import CatalogFilters
+from ..breaker import BreakerState, CircuitBreakerRegistry
+from ..cache import CacheMode, CacheStatus, TTLCache, graph_size
+from ..deadline import Deadline, DeadlineExceeded
+from ..discovery import PeerEndpoint
+from ..hedging import HedgeBudget, RequestHedger
+from ..latency import AdaptiveTimeouts
+from ..merge import count_nodes
+from ..peers import PeerTable
+from ..results import CompletionPolicy, PeerStatus, answer_size, result_size
 from ..usecases import SearchUsecases
 
+CONTEXT = {"dcat": "http://www.w3.org/ns/dcat#", "dcterms": "http://purl.org/dc/terms/"}
+
 
 class TestSearchUsecases:
     @pytest.fixture
-    def discovery_service(self):
-        discovery_service = AsyncMock()
-        discovery_service.discover.return_value = [
-            "http://peer1.com",
-            "http://peer2.com",
-        ]
-        return discovery_service
+    def peer_table(self):
+        peer_table = PeerTable(discovery_service=AsyncMock())
+        peer_table.update(["http://peer1.com", "http://peer2.com"])
+        return peer_table
+
+    @pytest.fixture
+    def handler(self):
+        """Handler of the requests to the peers and the local catalog"""
+        return MagicMock(return_value=httpx.Response(200, json={}))
+
+    @pytest.fixture
+    def http_client(self, handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    @pytest.fixture
+    def breakers(self, http_client):
+        return CircuitBreakerRegistry(http_client, failure_threshold=2)
 
     @pytest.fixture
-    def usecases(self, discovery_service):
+    def timeouts(self):
+        return AdaptiveTimeouts(
+            default_timeout=1.0, min_timeout=0.01, max_timeout=2.0, min_samples=3
+        )
+
+    @pytest.fixture
+    def usecases(self, peer_table, http_client, breakers, timeouts):
         return SearchUsecases(
             catalog_service_url="http://localhost:8000",
             request_timeout=1.0,
-            discovery_service=discovery_service,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
         )
 
     @pytest.fixture
     def query(self):
         mock_query = MagicMock()
         mock_query.model_dump.return_value = {"key": "value"}
+        mock_query.fingerprint.return_value = "fingerprint"
         return mock_query
 
     @pytest.mark.asyncio
@@ -39,40 +76,346 @@ class TestSearchUsecases:
         ) as mock_post:
             result = await usecases.local_search(query)
             mock_post.assert_called_once_with(
-                "http://localhost:8000", "/public-catalog/", {"key": "value"}
+                "http://localhost:8000",
+                "/public-catalog/",
+                {"key": "value"},
+                deadline=None,
             )
 
             assert isinstance(result, Graph)
             assert result == mock_graph
 
     @pytest.mark.asyncio
-    async def test_local_search(self, usecases, query):
-        mock_response = {
-            "@context": "",
-            "@id": "item1",
-        }
+    async def test_local_search(self, usecases, query, handler):
+        handler.return_value = httpx.Response(
+            200,
+            json={
+                "@context": {"dcterms": "http://purl.org/dc/terms/"},
+                "@graph": [
+                    {"@id": "http://example.com/item1", "dcterms:title": "Item 1"},
+                    {"@id": "http://example.com/item2", "dcterms:title": "Item 2"},
+                ],
+            },
+        )
 
-        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
-            mock_post.return_value.json.return_value = mock_response
-            mock_post.return_value.raise_for_status = AsyncMock()
+        result = await usecases.local_search(query)
 
-            result = await usecases.local_search(query)
+        assert isinstance(result, Graph)
+        assert len(result) == 2
+        request = handler.call_args.args[0]
+        assert request.url == "http://localhost:8000/public-catalog/"
+        assert json.loads(request.content) == {"key": "value"}
 
-            assert isinstance(result, Graph)
-            assert "@context" in mock_response
-            assert "@id" in mock_response
+    @pytest.mark.asyncio
+    async def test_local_search_hedged(
+        self, peer_table, http_client, breakers, timeouts, query
+    ):
+        usecases = SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            hedger=RequestHedger(timeouts, HedgeBudget(ratio=1.0), delay=0.05),
+        )
+        calls = 0
+
+        async def respond(request):
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                await asyncio.sleep(10)
+            return httpx.Response(
+                200,
+                json={
+                    "@id": "http://example.com/item1",
+                    "http://purl.org/dc/terms/title": "Item 1",
+                },
+            )
+
+        http_client._transport = httpx.MockTransport(respond)
+        result = await usecases.local_search(query)
+
+        assert calls == 2
+        assert len(result) == 1
 
     @pytest.mark.asyncio
-    async def test_local_search_failure(self, usecases, query):
-        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
-            mock_post.side_effect = Exception("Mocked error")
+    async def test_local_search_failure(self, usecases, query, handler):
+        handler.side_effect = Exception("Mocked error")
 
-            result = await usecases.local_search(query)
-            assert isinstance(result, Graph)
-            assert len(result) == 0  # Ensure the graph is empty
+        result = await usecases.local_search(query)
+        assert isinstance(result, Graph)
+        assert len(result) == 0  # Ensure the graph is empty
+
+    @pytest.mark.asyncio
+    async def test_local_search_response_too_large(
+        self, peer_table, http_client, breakers, timeouts, query, handler
+    ):
+        usecases = SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            max_response_size=100,
+        )
+        sent = 0
+
+        async def body():
+            nonlocal sent
+            yield b'{"@graph": ['
+            for i in range(100):
+                sent += 1
+                yield b'{"@id": "http://example.com/item%d"},' % i
+
+        handler.return_value = httpx.Response(200, json={"@id": "x" * 100})
+        assert len(await usecases.local_search(query)) == 0
+
+        handler.return_value = httpx.Response(200, content=body())
+        assert len(await usecases.local_search(query)) == 0
+        assert sent < 10
+
+    @pytest.mark.asyncio
+    async def test_local_search_cached(
+        self, peer_table, http_client, breakers, timeouts, handler
+    ):
+        usecases = SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            cache=TTLCache("test", max_bytes=2**20, ttl=30.0, sizeof=graph_size),
+        )
+        handler.side_effect = [
+            Exception("Mocked error"),
+            httpx.Response(200, json={"@id": "http://example.com/item1"}),
+        ]
+
+        filters = {"@type": "Filters", "filters": [{"a": 1, "b": 2}]}
+        reordered = {"filters": [{"b": 2, "a": 1}], "@type": "Filters"}
+
+        # Failed queries are not cached
+        assert len(await usecases.local_search(CatalogFilters(**filters))) == 0
+        result = await usecases.local_search(CatalogFilters(**filters))
+        assert await usecases.local_search(CatalogFilters(**reordered)) is result
+        assert handler.call_count == 2
+
+    @pytest.fixture
+    def cached_usecases(self, peer_table, http_client, breakers, timeouts):
+        return SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            results_cache=TTLCache(
+                "test", max_bytes=2**20, ttl=0.05, sizeof=result_size, stale_ttl=30
+            ),
+            degraded_results_ttl=0.01,
+        )
+
+    @staticmethod
+    def peer_graph(*args, **kwargs):
+        graph = Graph()
+        graph.add((URIRef(args[0]), RDF.type, DCAT.Catalog))
+        return graph
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_cached(self, cached_usecases, query):
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=self.peer_graph
+        ) as mock_query:
+            result = await cached_usecases.distributed_search(query)
+            assert result.cache_status == CacheStatus.MISS
+            cached = await cached_usecases.distributed_search(query)
+            assert cached.cache_status == CacheStatus.HIT
+            assert cached.graph is result.graph
+            assert mock_query.call_count == 2
+
+            await asyncio.sleep(0.06)
+            # Stale results are served at once, and refreshed only once
+            stale = await asyncio.gather(
+                cached_usecases.distributed_search(query),
+                cached_usecases.distributed_search(query),
+            )
+            assert [result.cache_status for result in stale] == [CacheStatus.STALE] * 2
+            assert stale[0].graph is result.graph
+            await asyncio.gather(*cached_usecases._refreshing.values())
+            assert mock_query.call_count == 4
+
+            refreshed = await cached_usecases.distributed_search(query)
+            assert refreshed.cache_status == CacheStatus.HIT
+            assert refreshed.graph is not result.graph
+            assert len(refreshed.graph) == 2
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_degraded_cached(self, cached_usecases, query):
+        with patch.object(
+            cached_usecases,
+            "_query_peer_services",
+            side_effect=[self.peer_graph("http://peer1.com"), Exception("error")],
+        ):
+            result = await cached_usecases.distributed_search(query)
+            assert not result.complete
+            assert not result.cut_short
+
+            # Cached too, for a shorter time
+            cached = await cached_usecases.distributed_search(query)
+            assert cached.cache_status == CacheStatus.HIT
+            await asyncio.sleep(0.02)
+            stale = await cached_usecases.distributed_search(query)
+            assert stale.cache_status == CacheStatus.STALE
+            await asyncio.gather(*cached_usecases._refreshing.values())
+
+    @pytest.mark.parametrize("cut", ["deadline", "soft deadline"])
+    @pytest.mark.asyncio
+    async def test_distributed_search_cut_short_not_cached(
+        self, cached_usecases, query, cut
+    ):
+        async def slow_peer(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return self.peer_graph(*args)
+
+        deadline = Deadline.from_budget(0.1)
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=slow_peer
+        ):
+            if cut == "deadline":
+                result = await cached_usecases.distributed_search(query, deadline)
+            else:
+                result = await cached_usecases.distributed_search(
+                    query, policy=CompletionPolicy(soft_deadline=deadline)
+                )
+        assert result.cut_short
+
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=self.peer_graph
+        ):
+            result = await cached_usecases.distributed_search(query)
+        assert result.cache_status == CacheStatus.MISS
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_cache_modes(self, cached_usecases, query):
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=self.peer_graph
+        ) as mock_query:
+            result = await cached_usecases.distributed_search(
+                query, cache_mode=CacheMode.BYPASS
+            )
+            assert result.cache_status == CacheStatus.BYPASS
+            result = await cached_usecases.distributed_search(
+                query, cache_mode=CacheMode.REFRESH
+            )
+            assert result.cache_status == CacheStatus.REFRESH
+            result = await cached_usecases.distributed_search(query)
+            assert result.cache_status == CacheStatus.HIT
+            assert mock_query.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_aclose_cancels_refresh(self, cached_usecases, query):
+        async def slow_peer(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=self.peer_graph
+        ):
+            await cached_usecases.distributed_search(query)
+        await asyncio.sleep(0.06)
+        with patch.object(
+            cached_usecases, "_query_peer_services", side_effect=slow_peer
+        ):
+            await cached_usecases.distributed_search(query)
+            tasks = list(cached_usecases._refreshing.values())
+            assert len(tasks) == 1
+            await cached_usecases.aclose()
+        assert tasks[0].cancelled()
 
     @pytest.mark.asyncio
-    async def test_distributed_search(self, usecases, query, discovery_service):
+    async def test_local_search_coalesced(self, usecases, query):
+        async def slow_catalog(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return Graph()
+
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=slow_catalog
+        ) as mock_query:
+            first, second = await asyncio.gather(
+                usecases.local_search(query), usecases.local_search(query)
+            )
+        assert first is second
+        assert mock_query.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_coalesced(self, usecases, query):
+        async def slow_peer(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return self.peer_graph(*args)
+
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=slow_peer
+        ) as mock_query:
+            waiters = [
+                asyncio.create_task(usecases.distributed_search(query))
+                for _ in range(3)
+            ]
+            other_policy = asyncio.create_task(
+                usecases.distributed_search(query, policy=CompletionPolicy(quorum=0.5))
+            )
+            await asyncio.sleep(0.01)
+            # A caller giving up does not abort the shared search
+            waiters[0].cancel()
+            results = await asyncio.gather(*waiters[1:], other_policy)
+
+        assert results[0] is results[1]
+        assert len(results[0].graph) == 2
+        assert results[2] is not results[0]
+        assert mock_query.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_local_search_not_cut_by_other_deadline(self, usecases, query):
+        async def slow_catalog(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return Graph()
+
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=slow_catalog
+        ) as mock_query:
+            results = await asyncio.gather(
+                usecases.local_search(query, Deadline.from_budget(0.1)),
+                usecases.local_search(query),
+                return_exceptions=True,
+            )
+        assert isinstance(results[0], DeadlineExceeded)
+        assert isinstance(results[1], Graph)
+        assert mock_query.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_not_cut_by_soft_deadline(self, usecases, query):
+        async def slow_peer(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return self.peer_graph(*args)
+
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=slow_peer
+        ) as mock_query:
+            hurried, patient = await asyncio.gather(
+                usecases.distributed_search(
+                    query,
+                    policy=CompletionPolicy(soft_deadline=Deadline.from_budget(0.01)),
+                ),
+                usecases.distributed_search(query),
+            )
+        assert {peer.status for peer in hurried.peers} == {PeerStatus.PENDING}
+        assert {peer.status for peer in patient.peers} == {PeerStatus.OK}
+        assert mock_query.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_distributed_search(self, usecases, query, peer_table):
         mock_graph_1 = Graph()
         mock_graph_1.parse(data='{"@context": "", "@id": "item1"}', format="json-ld")
 
@@ -82,20 +425,516 @@ class TestSearchUsecases:
         with patch.object(
             usecases, "_query_peer_services", side_effect=[mock_graph_1, mock_graph_2]
         ) as mock_query:
-            result_graph = await usecases.distributed_search(query)
+            result = await usecases.distributed_search(query)
 
-            assert isinstance(result_graph, Graph)
-            assert len(result_graph) == len(mock_graph_1) + len(mock_graph_2)
+            assert isinstance(result.graph, Graph)
+            assert len(result.graph) == len(mock_graph_1) + len(mock_graph_2)
+            assert result.complete
             assert mock_query.call_count == 2
 
+        for peer in peer_table.snapshot():
+            assert peer.healthy
+            assert peer.successes == 1
+            assert peer.latency_ewma is not None
+
     @pytest.mark.asyncio
-    async def test_distributed_search_failure(self, usecases, query, discovery_service):
-        mock_graph_ok = Graph()
-        mock_graph_ok.parse(data='{"@context": "", "@id": "ok"}', format="json-ld")
+    async def test_distributed_search_failure(
+        self, usecases, query, peer_table, handler
+    ):
+        handler.side_effect = Exception("Mocked error")
 
-        with patch("httpx.AsyncClient.post", new_callable=AsyncMock) as mock_post:
-            mock_post.side_effect = Exception("Mocked error")
+        result = await usecases.distributed_search(query)
+        assert isinstance(result.graph, Graph)
+        assert len(result.graph) == 0  # Ensure the graph is empty
+        assert not result.complete
 
-            result = await usecases.distributed_search(query)
-            assert isinstance(result, Graph)
-            assert len(result) == 0  # Ensure the graph is empty
+        for peer in peer_table.snapshot():
+            assert not peer.healthy
+            assert peer.failures == 1
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_concurrent(self, usecases, query):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def slow_query(url, endpoint, query, deadline=None):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return Graph()
+
+        with patch.object(usecases, "_query_peer_services", side_effect=slow_query):
+            await usecases.distributed_search(query)
+
+        assert max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_max_concurrent_requests(
+        self, peer_table, http_client, breakers, timeouts, query
+    ):
+        peer_table.update([f"http://peer{i}.com" for i in range(5)])
+        usecases = SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            max_concurrent_requests=2,
+        )
+        in_flight = 0
+        max_in_flight = 0
+
+        async def slow_query(url, endpoint, query, deadline=None):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return Graph()
+
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=slow_query
+        ) as mock_query:
+            await usecases.distributed_search(query)
+
+        assert mock_query.call_count == 5
+        assert max_in_flight == 2
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_peer_timeout(self, usecases, query, timeouts):
+        fast_graph = Graph()
+        fast_graph.parse(data='{"@context": "", "@id": "fast"}', format="json-ld")
+
+        async def query_peer(url, endpoint, query, deadline=None):
+            if url == "http://peer1.com":
+                await asyncio.sleep(10)
+            return fast_graph
+
+        timeouts._default_timeout = 0.05
+        with patch.object(usecases, "_query_peer_services", side_effect=query_peer):
+            result = await asyncio.wait_for(usecases.distributed_search(query), 1)
+
+        assert len(result.graph) == len(fast_graph)
+        assert [peer.status for peer in result.peers] == [
+            PeerStatus.TIMEOUT,
+            PeerStatus.OK,
+        ]
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_skips_unready_peers(
+        self, usecases, query, peer_table
+    ):
+        peer_table.update_endpoints(
+            [
+                PeerEndpoint("http://peer1.com", ready=True),
+                PeerEndpoint("http://peer2.com", ready=False),
+            ]
+        )
+        with patch.object(
+            usecases, "_query_peer_services", return_value=Graph()
+        ) as mock_query:
+            await usecases.distributed_search(query)
+
+        mock_query.assert_called_once_with(
+            "http://peer1.com", "/local-search/", query, deadline=None
+        )
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_circuit_breaker(self, usecases, query, breakers):
+        with patch.object(
+            usecases, "_query_peer_services", side_effect=Exception("Mocked error")
+        ) as mock_query:
+            await usecases.distributed_search(query)
+            await usecases.distributed_search(query)
+            assert mock_query.call_count == 4
+            assert breakers.get("http://peer1.com").state == BreakerState.OPEN
+
+            await usecases.distributed_search(query)
+            assert mock_query.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_adaptive_timeout(self, usecases, query, timeouts):
+        for _ in range(3):
+            timeouts.observe("http://peer1.com", 0.01)
+
+        async def query_peer(url, endpoint, query, deadline=None):
+            if url == "http://peer1.com":
+                await asyncio.sleep(0.5)
+            return Graph()
+
+        with patch.object(usecases, "_query_peer_services", side_effect=query_peer):
+            started_at = asyncio.get_running_loop().time()
+            await usecases.distributed_search(query)
+            elapsed = asyncio.get_running_loop().time() - started_at
+
+        assert elapsed < 0.4
+        assert timeouts.timeout_for("http://peer1.com") == pytest.approx(0.04)
+
+    @pytest.mark.asyncio
+    async def test_local_search_forwards_deadline(self, usecases, query, handler):
+        await usecases.local_search(query, deadline=Deadline.from_budget(0.8))
+
+        headers = handler.call_args.args[0].headers
+        assert 600 <= int(headers["X-Search-Deadline-Ms"]) <= 750
+
+    @pytest.mark.asyncio
+    async def test_local_search_deadline_expired(self, usecases, query):
+        with patch.object(usecases, "_post_catalog_query") as mock_post:
+            with pytest.raises(DeadlineExceeded):
+                await usecases.local_search(query, deadline=Deadline.from_budget(0))
+            mock_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_local_search_cut_by_deadline(self, usecases, query):
+        async def slow_post(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        with patch.object(usecases, "_post_catalog_query", side_effect=slow_post):
+            with pytest.raises(DeadlineExceeded):
+                await usecases.local_search(query, deadline=Deadline.from_budget(0.05))
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_deadline(self, usecases, query, peer_table):
+        fast_graph = Graph()
+        fast_graph.parse(data='{"@context": "", "@id": "fast"}', format="json-ld")
+
+        async def query_peer(url, endpoint, query, deadline=None):
+            if url == "http://peer1.com":
+                await asyncio.sleep(10)
+            return fast_graph
+
+        with patch.object(usecases, "_query_peer_services", side_effect=query_peer):
+            result = await asyncio.wait_for(
+                usecases.distributed_search(query, deadline=Deadline.from_budget(0.2)),
+                1,
+            )
+
+        assert len(result.graph) == len(fast_graph)
+        statuses = {peer.url: peer.status for peer in result.peers}
+        assert statuses == {
+            "http://peer1.com": PeerStatus.TIMEOUT,
+            "http://peer2.com": PeerStatus.OK,
+        }
+        # Running out of request budget is not the peer's fault
+        peers = {peer.url: peer for peer in peer_table.snapshot()}
+        assert peers["http://peer1.com"].failures == 0
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_budget_under_margin(
+        self, usecases, query, handler, breakers, peer_table
+    ):
+        for _ in range(3):
+            # Less budget than the deadline margin is left to forward
+            result = await usecases.distributed_search(
+                query, deadline=Deadline.from_budget(0.03)
+            )
+            assert [peer.status for peer in result.peers] == [PeerStatus.TIMEOUT] * 2
+
+        handler.assert_not_called()
+        assert breakers.allow_request("http://peer1.com")
+        assert all(peer.failures == 0 for peer in peer_table.snapshot())
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_peer_deadline_refusal(
+        self, usecases, query, handler, breakers, peer_table
+    ):
+        handler.return_value = httpx.Response(504, json={"detail": "exceeded"})
+
+        for _ in range(3):
+            result = await usecases.distributed_search(
+                query, deadline=Deadline.from_budget(1)
+            )
+            assert [peer.status for peer in result.peers] == [PeerStatus.TIMEOUT] * 2
+            assert result.cut_short
+
+        # The peers ran out of the forwarded budget, which is not their fault
+        assert breakers.allow_request("http://peer1.com")
+        assert all(peer.failures == 0 for peer in peer_table.snapshot())
+
+        # Without a deadline a 504 is an error of the peer
+        result = await usecases.distributed_search(query)
+        assert [peer.status for peer in result.peers] == [PeerStatus.ERROR] * 2
+        assert not result.cut_short
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_deadline_expired(self, usecases, query):
+        with patch.object(usecases, "_query_peer_services") as mock_query:
+            with pytest.raises(DeadlineExceeded):
+                await usecases.distributed_search(
+                    query, deadline=Deadline.from_budget(0)
+                )
+            mock_query.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_stream_distributed_search(
+        self, usecases, query, peer_table, breakers, timeouts
+    ):
+        peer_table.update(
+            [
+                "http://peer1.com",
+                "http://peer2.com",
+                "http://peer3.com",
+                "http://peer4.com",
+            ]
+        )
+        breakers.get("http://peer4.com").record_failure()
+        breakers.get("http://peer4.com").record_failure()
+        graph = Graph()
+        graph.parse(data='{"@context": "", "@id": "item1"}', format="json-ld")
+
+        async def query_peer(url, endpoint, query, deadline=None):
+            if url == "http://peer2.com":
+                raise Exception("Mocked error")
+            if url == "http://peer3.com":
+                await asyncio.sleep(10)
+            return graph
+
+        timeouts._default_timeout = 0.05
+        with patch.object(usecases, "_query_peer_services", side_effect=query_peer):
+            results = [
+                result async for result in usecases.stream_distributed_search(query)
+            ]
+
+        statuses = {result.url: result.status for result in results}
+        assert statuses == {
+            "http://peer1.com": PeerStatus.OK,
+            "http://peer2.com": PeerStatus.ERROR,
+            "http://peer3.com": PeerStatus.TIMEOUT,
+            "http://peer4.com": PeerStatus.SKIPPED,
+        }
+        # Results come in the order the peers answered
+        assert results[-1].url == "http://peer3.com"
+        assert results[-1].elapsed >= 0.05
+
+    @pytest.fixture
+    def query_peer(self):
+        def dataset_graph(url):
+            graph = Graph()
+            graph.parse(
+                data=f"""
+                @prefix dcat: <http://www.w3.org/ns/dcat#> .
+                <{url}/dataset> a dcat:Dataset .
+                """,
+                format="turtle",
+            )
+            return graph
+
+        delays = {"http://peer1.com": 0.0, "http://peer2.com": 0.05}
+
+        async def query_peer(url, endpoint, query, deadline=None):
+            await asyncio.sleep(delays.get(url, 10))
+            return dataset_graph(url)
+
+        return query_peer
+
+    @pytest.mark.parametrize(
+        "make_policy",
+        [
+            lambda: CompletionPolicy(quorum=0.5),
+            lambda: CompletionPolicy(min_results=2),
+            lambda: CompletionPolicy(soft_deadline=Deadline.from_budget(0.2)),
+        ],
+        ids=["quorum", "min_results", "soft_deadline"],
+    )
+    @pytest.mark.asyncio
+    async def test_distributed_search_partial(
+        self, usecases, query, peer_table, query_peer, make_policy
+    ):
+        peer_table.update(
+            [
+                "http://peer1.com",
+                "http://peer2.com",
+                "http://peer3.com",
+                "http://peer4.com",
+            ]
+        )
+
+        with patch.object(usecases, "_query_peer_services", side_effect=query_peer):
+            result = await asyncio.wait_for(
+                usecases.distributed_search(query, policy=make_policy()), 1
+            )
+
+        assert len(result.graph) == 2
+        assert not result.complete
+        assert {peer.url: peer.status for peer in result.peers} == {
+            "http://peer1.com": PeerStatus.OK,
+            "http://peer2.com": PeerStatus.OK,
+            "http://peer3.com": PeerStatus.PENDING,
+            "http://peer4.com": PeerStatus.PENDING,
+        }
+        # Left out peers are not blamed for it
+        assert all(peer.failures == 0 for peer in peer_table.snapshot())
+
+    @pytest.fixture
+    def passthrough_usecases(self, peer_table, http_client, breakers, timeouts):
+        return SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            passthrough_context=CONTEXT,
+        )
+
+    @staticmethod
+    def catalog(url, datasets):
+        return {
+            "@id": "http://example.com/catalog",
+            "@type": "dcat:Catalog",
+            "dcat:dataset": [
+                {"@id": f"{url}/dataset/{i}", "@type": "dcat:Dataset"}
+                for i in range(datasets)
+            ],
+        }
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_passthrough(
+        self, passthrough_usecases, query, handler
+    ):
+        handler.side_effect = lambda request: httpx.Response(
+            200,
+            json=(
+                {"@context": CONTEXT, "@graph": [self.catalog("http://peer1.com", 2)]}
+                if request.url.host == "peer1.com"
+                else {"@context": CONTEXT, **self.catalog("http://peer2.com", 1)}
+            ),
+        )
+
+        with patch("app.core.usecases.parse_json_ld") as parse_json_ld:
+            result = await passthrough_usecases.distributed_search(query)
+
+        parse_json_ld.assert_not_called()
+        assert len(result.graph) == 0
+        assert result.complete
+        assert result.nodes is not None
+        (catalog,) = result.nodes
+        assert [dataset["@id"] for dataset in catalog["dcat:dataset"]] == [
+            "http://peer1.com/dataset/0",
+            "http://peer1.com/dataset/1",
+            "http://peer2.com/dataset/0",
+        ]
+        assert all(peer.nodes is None for peer in result.peers)
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_passthrough_other_context(
+        self, passthrough_usecases, query, handler
+    ):
+        handler.side_effect = lambda request: httpx.Response(
+            200,
+            json={
+                "@context": (
+                    CONTEXT
+                    if request.url.host == "peer1.com"
+                    else {"dcat": "http://www.w3.org/ns/dcat#", "ex": "urn:ex:"}
+                ),
+                "@graph": [self.catalog(f"http://{request.url.host}", 1)],
+            },
+        )
+
+        result = await passthrough_usecases.distributed_search(query)
+
+        assert result.nodes is None
+        datasets = set(result.graph.subjects(RDF.type, DCAT.Dataset))
+        assert datasets == {
+            URIRef("http://peer1.com/dataset/0"),
+            URIRef("http://peer2.com/dataset/0"),
+        }
+
+    @pytest.mark.asyncio
+    async def test_distributed_search_passthrough_min_results(
+        self, passthrough_usecases, query, handler
+    ):
+        handler.side_effect = lambda request: httpx.Response(
+            200, json={"@context": CONTEXT, **self.catalog("http://peer1.com", 2)}
+        )
+
+        result = await passthrough_usecases.distributed_search(
+            query, policy=CompletionPolicy(min_results=2)
+        )
+
+        # The datasets of the first peer are enough
+        statuses = sorted(peer.status for peer in result.peers)
+        assert statuses == [PeerStatus.OK, PeerStatus.PENDING]
+        assert result.nodes is not None
+        assert len(result.nodes[0]["dcat:dataset"]) == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("passthrough_context", [None, CONTEXT])
+    async def test_peer_answers_revalidated(
+        self,
+        peer_table,
+        http_client,
+        breakers,
+        timeouts,
+        handler,
+        query,
+        passthrough_context,
+    ):
+        usecases = SearchUsecases(
+            catalog_service_url="http://localhost:8000",
+            request_timeout=1.0,
+            peer_table=peer_table,
+            http_client=http_client,
+            breakers=breakers,
+            timeouts=timeouts,
+            passthrough_context=passthrough_context,
+            peer_cache=TTLCache(
+                "test", max_bytes=2**20, ttl=30.0, sizeof=answer_size
+            ),
+        )
+        versions = {"peer1.com": 1, "peer2.com": 1}
+        bodies_sent = []
+
+        def peer(request):
+            host = request.url.host
+            tag = f'"{host}-{versions[host]}"'
+            if request.headers.get("If-None-Match") == tag:
+                return httpx.Response(304, headers={"ETag": tag})
+            bodies_sent.append(host)
+            catalog = self.catalog(f"http://{host}", versions[host])
+            return httpx.Response(
+                200, json={"@context": CONTEXT, **catalog}, headers={"ETag": tag}
+            )
+
+        handler.side_effect = peer
+        not_modified = (
+            REGISTRY.get_sample_value(
+                "ds_search_peer_not_modified_total", {"peer": "http://peer1.com"}
+            )
+            or 0
+        )
+
+        def datasets(result):
+            if result.nodes is None:
+                return len(set(result.graph.subjects(RDF.type, DCAT.Dataset)))
+            return count_nodes(result.nodes, "dcat:Dataset")
+
+        first = await usecases.distributed_search(query)
+        second = await usecases.distributed_search(query)
+        versions["peer2.com"] = 2
+        third = await usecases.distributed_search(query)
+
+        assert first.complete and second.complete and third.complete
+        assert sorted(bodies_sent) == ["peer1.com", "peer2.com", "peer2.com"]
+        assert (
+            REGISTRY.get_sample_value(
+                "ds_search_peer_not_modified_total", {"peer": "http://peer1.com"}
+            )
+            == not_modified + 2
+        )
+        assert datasets(second) == datasets(first) == 2
+        assert datasets(third) == 3
+
+        # Peers that left drop their series
+        usecases.forget("http://peer1.com")
+        usecases.forget("http://peer1.com")
+        assert (
+            REGISTRY.get_sample_value(
+                "ds_search_peer_not_modified_total", {"peer": "http://peer1.com"}
+            )
+            is None
+        )
@@ -1,25 +1,77 @@
-from typing import Any
+from typing import Any, AsyncGenerator, Awaitable, Callable, TypeVar
 
+import asyncio
 import json
 import logging
+import math
+import time
 from abc import ABC, abstractmethod
+from contextlib import aclosing
+from dataclasses import replace
 
 import httpx
-from rdflib import Graph
+from rdflib import RDF, Graph
+from rdflib.namespace import DCAT
 
 from ..rest_api.serializers import CatalogFilters
-from .discovery import IDiscoveryService
+from .breaker import CircuitBreakerRegistry
+from .cache import CacheMode, CacheStatus, TTLCache
+from .deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded
+from .hedging import RequestHedger
+from .ingest import BodyTooLarge, parse_json_ld, parse_json_ld_stream, read_json
+from .latency import AdaptiveTimeouts
+from .merge import FramedMerge, count_nodes
+from .metrics import PEER_NOT_MODIFIED
+from .offload import Offloader
+from .peers import PeerTable
+from .results import (
+    CompletionPolicy,
+    DistributedSearchResult,
+    PeerResult,
+    PeerStatus,
+    ValidatedAnswer,
+)
+from .singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+# Compacted type of the datasets in the shared context
+DATASET_TYPE = "dcat:Dataset"
+
 
 class ISearchUsecases(ABC):
     @abstractmethod
-    async def local_search(self, query: CatalogFilters) -> Graph:
+    async def local_search(
+        self, query: CatalogFilters, deadline: Deadline | None = None
+    ) -> Graph:
+        ...
+
+    @abstractmethod
+    async def distributed_search(
+        self,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        policy: CompletionPolicy | None = None,
+        cache_mode: CacheMode = CacheMode.USE,
+    ) -> DistributedSearchResult:
         ...
 
     @abstractmethod
-    async def distributed_search(self, query: CatalogFilters) -> Graph:
+    async def aclose(self) -> None:
+        ...
+
+    @abstractmethod
+    def ready_peers(self) -> list[str]:
+        ...
+
+    @abstractmethod
+    def stream_distributed_search(
+        self,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        peer_services: list[str] | None = None,
+    ) -> AsyncGenerator[PeerResult, None]:
         ...
 
 
@@ -28,48 +80,153 @@ class SearchUsecases(ISearchUsecases):
         self,
         catalog_service_url: str,
         request_timeout: float,
-        discovery_service: IDiscoveryService,
+        peer_table: PeerTable,
+        http_client: httpx.AsyncClient,
+        breakers: CircuitBreakerRegistry,
+        timeouts: AdaptiveTimeouts,
+        max_concurrent_requests: int = 10,
+        deadline_margin: float = 0.05,
+        hedger: RequestHedger | None = None,
+        max_response_size: int | None = None,
+        passthrough_context: dict[str, Any] | None = None,
+        offloader: Offloader | None = None,
+        cache: TTLCache[Graph] | None = None,
+        results_cache: TTLCache[DistributedSearchResult] | None = None,
+        peer_cache: TTLCache[ValidatedAnswer] | None = None,
+        degraded_results_ttl: float | None = None,
     ) -> None:
         self._catalog_service_url = catalog_service_url
-        self._discovery_service = discovery_service
+        self._http_client = http_client
+        self._peer_table = peer_table
+        self._breakers = breakers
+        self._timeouts = timeouts
         self._request_timeout = request_timeout
+        self._max_concurrent_requests = max_concurrent_requests
+        self._deadline_margin = deadline_margin
+        self._hedger = hedger
+        self._max_response_size = max_response_size
+        # Context of the framed peer results merged without building graphs
+        self._passthrough_context = passthrough_context
+        self._offloader = offloader or Offloader()
+        self._cache = cache
+        self._results_cache = results_cache
+        # Time to live of results in which some peers failed or were skipped
+        self._degraded_results_ttl = degraded_results_ttl
+        # Answers of the peers, revalidated with their entity tags
+        self._peer_cache = peer_cache
+        # Identical searches in flight, shared by concurrent callers
+        self._local_flights = SingleFlight[Graph]("local_search")
+        self._distributed_flights = SingleFlight[DistributedSearchResult](
+            "distributed_search"
+        )
+        # Background refreshes of stale results, one per key
+        self._refreshing: dict[str, asyncio.Task[None]] = {}
 
     async def _post_catalog_query(
         self,
         url: str,
         endpoint: str,
         query_jsonld: dict[str, Any],
+        deadline: Deadline | None = None,
     ) -> Graph:
         """
         Internal helper to POST a catalog query and parse the JSON-LD
-        response into an RDF Graph.
+        response into an RDF Graph. Errors are left to the caller.
+        The response is parsed while it arrives and given up once it exceeds
+        the maximum response size.
+        """
+
+        def parse(response: httpx.Response) -> Awaitable[Graph]:
+            return parse_json_ld_stream(
+                response.aiter_bytes(), self._max_response_size, self._offloader
+            )
+
+        return await self._stream_catalog_query(
+            url, endpoint, query_jsonld, parse, deadline=deadline
+        )
+
+    async def _stream_catalog_query(
+        self,
+        url: str,
+        endpoint: str,
+        query_jsonld: dict[str, Any],
+        read: Callable[[httpx.Response], Awaitable[T]],
+        deadline: Deadline | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> T:
+        """
+        POST a catalog query, with the extra ``headers`` if any, and read the
+        response with ``read``. Responses announcing more than the maximum
+        response size are given up before their body is read. 304 Not
+        Modified responses are left to ``read``, for conditional queries.
+        The remaining deadline budget, if any, is forwarded downstream.
+        With hedging enabled a slow request is duplicated, see RequestHedger.
         """
         headers = {
             "accept": "application/ld+json",
             "Content-Type": "application/json",
+            **(headers or {}),
         }
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{url}{endpoint}",
-                    json=query_jsonld,
-                    headers=headers,
-                    timeout=self._request_timeout,
-                )
+        if deadline is not None:
+            headers[DEADLINE_HEADER] = str(deadline.budget_ms(self._deadline_margin))
+
+        async def send() -> T:
+            # The pool never shares an HTTP/1.1 connection between requests,
+            # so the hedge goes out on another connection than the slow one
+            async with self._http_client.stream(
+                "POST",
+                f"{url}{endpoint}",
+                json=query_jsonld,
+                headers=headers,
+            ) as response:
+                if response.status_code == httpx.codes.NOT_MODIFIED:
+                    return await read(response)
                 response.raise_for_status()
-                rdf_graph = Graph()
-                rdf_graph.parse(data=json.dumps(response.json()), format="json-ld")
-                logger.info(f"Successfully queried {url}{endpoint}")
-                return rdf_graph
-            except Exception as exc:
-                logger.error(f"Query failed at {url}{endpoint}: {exc}")
-                return Graph()
+                content_length = int(response.headers.get("content-length", 0))
+                if (
+                    self._max_response_size is not None
+                    and content_length > self._max_response_size
+                ):
+                    raise BodyTooLarge(
+                        f"Response body of {content_length} bytes exceeds "
+                        f"{self._max_response_size} bytes"
+                    )
+                return await read(response)
+
+        if self._hedger is None:
+            result = await send()
+        else:
+            result = await self._hedger.run(url, send)
+        logger.info(f"Successfully queried {url}{endpoint}")
+        return result
+
+    async def _read_framed(
+        self, response: httpx.Response
+    ) -> Graph | list[dict[str, Any]]:
+        """
+        Framed nodes of a peer response written in the shared context, or
+        the graph of a response written in another one
+        """
+        document = await read_json(
+            response.aiter_bytes(), self._max_response_size, self._offloader
+        )
+        if (
+            not isinstance(document, dict)
+            or document.get("@context") != self._passthrough_context
+        ):
+            return await self._offloader.fill("parse", Graph(), parse_json_ld, document)
+        if "@graph" in document:
+            nodes = document["@graph"]
+            return nodes if isinstance(nodes, list) else [nodes]
+        node = {key: value for key, value in document.items() if key != "@context"}
+        return [node] if node else []
 
     async def _query_peer_services(
         self,
         url: str,
         endpoint: str,
         query: CatalogFilters,
+        deadline: Deadline | None = None,
     ) -> Graph:
         """
         Query the peer search services with the given filters and limit.
@@ -77,30 +234,449 @@ class SearchUsecases(ISearchUsecases):
         logger.info(f"Querying peer service at {url}")
         query_jsonld = query.model_dump(by_alias=True)
         logger.debug(f"Query JSON-LD: {query_jsonld}")
-        return await self._post_catalog_query(url, endpoint, query_jsonld)
+        return await self._post_catalog_query(
+            url, endpoint, query_jsonld, deadline=deadline
+        )
+
+    async def _query_peer(
+        self,
+        url: str,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+    ) -> Graph | list[dict[str, Any]]:
+        """
+        Query the search service of a peer. In pass-through mode the framed
+        nodes of the peer are kept as they are when it answers in the shared
+        context, see _read_framed.
+        """
+        if self._peer_cache is not None:
+            return await self._query_peer_revalidated(
+                url, query, self._peer_cache, deadline
+            )
+        if self._passthrough_context is None:
+            return await self._query_peer_services(
+                url, "/local-search/", query, deadline=deadline
+            )
+        logger.info(f"Querying peer service at {url}")
+        return await self._stream_catalog_query(
+            url,
+            "/local-search/",
+            query.model_dump(by_alias=True),
+            self._read_framed,
+            deadline=deadline,
+        )
+
+    async def _query_peer_revalidated(
+        self,
+        url: str,
+        query: CatalogFilters,
+        peer_cache: TTLCache[ValidatedAnswer],
+        deadline: Deadline | None = None,
+    ) -> Graph | list[dict[str, Any]]:
+        """
+        Query the search service of a peer with the entity tag of the answer
+        it gave to the same query before. A peer answering 304 Not Modified
+        is not read again, and its cached answer is reused from
+        ``peer_cache``.
+        """
+        framed = self._passthrough_context is not None
+        key = f"{url} {'framed' if framed else 'graph'} {query.fingerprint()}"
+        cached = peer_cache.get(key)
+        headers = {} if cached is None else {"If-None-Match": cached.etag}
+
+        async def read(response: httpx.Response) -> Graph | list[dict[str, Any]]:
+            if cached is not None and response.status_code == httpx.codes.NOT_MODIFIED:
+                logger.info(f"Answer of {url} not modified")
+                PEER_NOT_MODIFIED.labels(url).inc()
+                return cached.answer
+            response.raise_for_status()
+            answer: Graph | list[dict[str, Any]]
+            if framed:
+                answer = await self._read_framed(response)
+            else:
+                answer = await parse_json_ld_stream(
+                    response.aiter_bytes(), self._max_response_size, self._offloader
+                )
+            tag = response.headers.get("etag")
+            if tag is not None:
+                peer_cache.put(key, ValidatedAnswer(tag, answer))
+            return answer
+
+        logger.info(f"Querying peer service at {url}")
+        return await self._stream_catalog_query(
+            url,
+            "/local-search/",
+            query.model_dump(by_alias=True),
+            read,
+            deadline=deadline,
+            headers=headers,
+        )
+
+    async def _query_peer_with_timeout(
+        self,
+        url: str,
+        query: CatalogFilters,
+        semaphore: asyncio.Semaphore,
+        deadline: Deadline | None = None,
+    ) -> PeerResult:
+        """
+        Query a single peer once a concurrency slot is free, giving up after
+        the peer's adaptive timeout or the request deadline, whichever comes
+        first. Peers with an open circuit are skipped, and so are all peers
+        once the deadline leaves no budget to forward. The outcome is
+        recorded in the peer table, the circuit breaker and the latency
+        window of the peer, unless the query failed because of the deadline:
+        cut by it, or refused by the peer with a 504 as its budget ran out.
+        """
+        if not self._breakers.allow_request(url):
+            logger.info(f"Skipping {url}, circuit is open")
+            return PeerResult(url, PeerStatus.SKIPPED)
+        async with semaphore:
+            if deadline is not None and deadline.budget_ms(self._deadline_margin) <= 0:
+                logger.info(f"Not querying {url}, no deadline budget left")
+                return PeerResult(url, PeerStatus.TIMEOUT, cut_short=True)
+            timeout = self._timeouts.timeout_for(url)
+            cut_by_deadline = deadline is not None and deadline.remaining() < timeout
+            if deadline is not None and cut_by_deadline:
+                timeout = deadline.remaining()
+            started_at = time.monotonic()
+            try:
+                answer = await asyncio.wait_for(
+                    self._query_peer(url, query, deadline=deadline),
+                    timeout=timeout,
+                )
+            except asyncio.TimeoutError:
+                logger.error(f"Query timed out at {url} after {timeout:.3f}s")
+                if not cut_by_deadline:
+                    self._timeouts.observe(url, timeout)
+                    self._record_failure(url)
+                return PeerResult(
+                    url,
+                    PeerStatus.TIMEOUT,
+                    elapsed=time.monotonic() - started_at,
+                    cut_short=cut_by_deadline,
+                )
+            except Exception as exc:
+                elapsed = time.monotonic() - started_at
+                if cut_by_deadline or (
+                    deadline is not None and _is_gateway_timeout(exc)
+                ):
+                    logger.error(f"Query at {url} ran out of deadline: {exc}")
+                    return PeerResult(
+                        url, PeerStatus.TIMEOUT, elapsed=elapsed, cut_short=True
+                    )
+                logger.error(f"Query failed at {url}: {exc}")
+                self._record_failure(url)
+                return PeerResult(url, PeerStatus.ERROR, elapsed=elapsed)
+            latency = time.monotonic() - started_at
+            self._timeouts.observe(url, latency)
+            self._peer_table.record_success(url, latency)
+            self._breakers.record_success(url)
+            if isinstance(answer, Graph):
+                return PeerResult(url, PeerStatus.OK, answer, latency)
+            return PeerResult(url, PeerStatus.OK, elapsed=latency, nodes=answer)
+
+    def _record_failure(self, url: str) -> None:
+        self._peer_table.record_failure(url)
+        self._breakers.record_failure(url)
+
+    async def _fan_out(
+        self,
+        peer_services: list[str],
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+    ) -> AsyncGenerator[PeerResult, None]:
+        """
+        Query the peer services concurrently and yield their results in the
+        order they complete. Outstanding queries are cancelled on exit.
+        """
+        semaphore = asyncio.Semaphore(self._max_concurrent_requests)
+        tasks = [
+            asyncio.create_task(
+                self._query_peer_with_timeout(url, query, semaphore, deadline)
+            )
+            for url in peer_services
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
-    async def local_search(self, query: CatalogFilters) -> Graph:
-        """Query the local public catalog with the given filters"""
-        return await self._query_peer_services(
-            self._catalog_service_url, "/public-catalog/", query
+    async def local_search(
+        self, query: CatalogFilters, deadline: Deadline | None = None
+    ) -> Graph:
+        """
+        Query the local public catalog with the given filters.
+        Raises DeadlineExceeded if the deadline passes before the catalog
+        has answered. Answers of the catalog are cached by the canonical
+        form of the filters, failed queries are not. Concurrent searches with
+        the same filters share a single query of the catalog.
+        """
+        key = query.fingerprint()
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        return await self._local_flights.run(
+            key, lambda: self._search_local_catalog(key, query, deadline), deadline
         )
 
-    async def distributed_search(self, query: CatalogFilters) -> Graph:
+    async def _search_local_catalog(
+        self, key: str, query: CatalogFilters, deadline: Deadline | None
+    ) -> Graph:
+        timeout = self._request_timeout
+        if deadline is not None:
+            deadline.check()
+        cut_by_deadline = deadline is not None and deadline.remaining() < timeout
+        if deadline is not None and cut_by_deadline:
+            timeout = deadline.remaining()
+        started_at = time.monotonic()
+        try:
+            graph = await asyncio.wait_for(
+                self._query_peer_services(
+                    self._catalog_service_url,
+                    "/public-catalog/",
+                    query,
+                    deadline=deadline,
+                ),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            # The timer may fire a hair before the deadline itself expires
+            if cut_by_deadline:
+                raise DeadlineExceeded("Request deadline exceeded")
+            logger.error(f"Query timed out at {self._catalog_service_url}")
+            return Graph()
+        except Exception as exc:
+            logger.error(f"Query failed at {self._catalog_service_url}: {exc}")
+            return Graph()
+        # Catalog latencies drive the hedge delay of the local search
+        self._timeouts.observe(self._catalog_service_url, time.monotonic() - started_at)
+        if self._cache is not None:
+            self._cache.put(key, graph)
+        return graph
+
+    async def distributed_search(
+        self,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        policy: CompletionPolicy | None = None,
+        cache_mode: CacheMode = CacheMode.USE,
+    ) -> DistributedSearchResult:
         """
         Aggregate responses from the peer services.
-        Returns a list of Graph objects containing all aggregated results.
+        Returns the merged graph and the outcome of every peer. Peers that
+        have not answered by the deadline are left out, and the search
+        returns early as soon as the completion policy is met.
+        Results of searches every peer was done with are cached by the
+        canonical form of the filters, for a shorter time if some peers
+        failed or were skipped. A stale result is returned at once while a
+        single background search per key refreshes it. ``cache_mode`` skips
+        reading the cache, or both reading and writing it. Concurrent
+        searches with the same filters, completion conditions and deadlines
+        share a single fan-out.
         """
+        key = query.fingerprint()
+        if self._results_cache is not None and cache_mode == CacheMode.USE:
+            cached = self._results_cache.lookup(key)
+            if cached is not None:
+                result, fresh = cached
+                if fresh:
+                    return replace(result, cache_status=CacheStatus.HIT)
+                self._refresh_in_background(key, query)
+                return replace(result, cache_status=CacheStatus.STALE)
 
-        logger.info("Starting aggregation of catalog responses")
+        result = await self._coalesced_search(
+            key, query, deadline, policy, store=cache_mode != CacheMode.BYPASS
+        )
+        if self._results_cache is None:
+            return result
+        status = {
+            CacheMode.USE: CacheStatus.MISS,
+            CacheMode.REFRESH: CacheStatus.REFRESH,
+            CacheMode.BYPASS: CacheStatus.BYPASS,
+        }[cache_mode]
+        return replace(result, cache_status=status)
 
-        peer_services = await self._discovery_service.discover()
-        logger.info(f"Discovered {len(peer_services)} peer services: {peer_services}")
+    async def _coalesced_search(
+        self,
+        key: str,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        policy: CompletionPolicy | None = None,
+        store: bool = True,
+    ) -> DistributedSearchResult:
+        """
+        Distributed search shared with the identical searches in flight,
+        storing the results not cut short in the results cache if ``store``
+        is set
+        """
+        policy = policy or CompletionPolicy()
+        # The search answers by the earliest of its deadlines
+        answer_by = min(
+            (d for d in (deadline, policy.soft_deadline) if d is not None),
+            key=lambda d: d.expires_at,
+            default=None,
+        )
+        # Only searches answering at the same time share a fan-out: the
+        # partial result of another deadline would be cut at the wrong time
+        flight_key = json.dumps(
+            [
+                key,
+                policy.quorum,
+                policy.min_results,
+                store,
+                None if answer_by is None else answer_by.expires_at,
+            ]
+        )
+
+        async def search() -> DistributedSearchResult:
+            result = await self._distributed_search(query, deadline, policy)
+            # A result no peer was cut short of satisfies every completion
+            # policy. Failed peers are retried sooner.
+            if store and not result.cut_short and self._results_cache is not None:
+                ttl = None if result.complete else self._degraded_results_ttl
+                self._results_cache.put(key, result, ttl)
+            return result
+
+        return await self._distributed_flights.run(flight_key, search, answer_by)
+
+    def _refresh_in_background(self, key: str, query: CatalogFilters) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh() -> None:
+            try:
+                await self._coalesced_search(key, query)
+            except Exception as exc:
+                logger.error(f"Refresh of a cached distributed search failed: {exc}")
+            finally:
+                del self._refreshing[key]
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    async def aclose(self) -> None:
+        """Cancel the background refreshes"""
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _distributed_search(
+        self,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        policy: CompletionPolicy | None = None,
+    ) -> DistributedSearchResult:
+        policy = policy or CompletionPolicy()
+        peer_services = self.ready_peers()
+        quorum = None
+        if policy.quorum is not None:
+            quorum = math.ceil(policy.quorum * len(peer_services))
 
         result_graph = Graph()
-        for url in peer_services:
-            service_graph = await self._query_peer_services(
-                url, "/local-search/", query
-            )
-            result_graph += service_graph
+        merge = FramedMerge()
+        peers: dict[str, PeerResult] = {}
+        answered = 0
+        datasets = 0
+        peer_results = self.stream_distributed_search(query, deadline, peer_services)
+        async with aclosing(peer_results):
+            while True:
+                try:
+                    if policy.soft_deadline is None:
+                        peer_result = await anext(peer_results)
+                    else:
+                        peer_result = await asyncio.wait_for(
+                            anext(peer_results), policy.soft_deadline.remaining()
+                        )
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    logger.info("Soft deadline passed, returning partial results")
+                    break
+                result_graph += peer_result.graph
+                if peer_result.nodes is not None:
+                    merge.add(peer_result.nodes)
+                peers[peer_result.url] = replace(peer_result, graph=Graph(), nodes=None)
+                if peer_result.status != PeerStatus.OK:
+                    continue
+                answered += 1
+                if peer_result.nodes is not None:
+                    datasets += count_nodes(peer_result.nodes, DATASET_TYPE)
+                else:
+                    datasets += len(
+                        set(peer_result.graph.subjects(RDF.type, DCAT.Dataset))
+                    )
+                if quorum is not None and answered >= quorum:
+                    logger.info(f"Quorum of {quorum} peers reached")
+                    break
+                if policy.min_results is not None and datasets >= policy.min_results:
+                    logger.info(f"Found {datasets} datasets, returning early")
+                    break
+
+        nodes: list[dict[str, Any]] | None = None
+        if self._passthrough_context is not None:
+            nodes = merge.nodes
+            if len(result_graph):
+                # Some peers answered in another context, so the framed nodes
+                # are merged with their graphs instead
+                document = {"@context": self._passthrough_context, "@graph": nodes}
+                await self._offloader.fill(
+                    "parse", result_graph, parse_json_ld, document
+                )
+                nodes = None
+        return DistributedSearchResult(
+            graph=result_graph,
+            peers=[
+                peers.get(url, PeerResult(url, PeerStatus.PENDING))
+                for url in peer_services
+            ],
+            nodes=nodes,
+        )
+
+    def forget(self, url: str) -> None:
+        """Drop the revalidation metric of a peer that left"""
+        try:
+            PEER_NOT_MODIFIED.remove(url)
+        except KeyError:
+            pass
+
+    def ready_peers(self) -> list[str]:
+        """URLs of the peer services currently ready to be queried"""
+        return [peer.url for peer in self._peer_table.snapshot() if peer.ready]
+
+    async def stream_distributed_search(
+        self,
+        query: CatalogFilters,
+        deadline: Deadline | None = None,
+        peer_services: list[str] | None = None,
+    ) -> AsyncGenerator[PeerResult, None]:
+        """
+        Query the peer services and yield the result of every peer as soon
+        as it is known, including the peers that failed or were skipped.
+        All ready peers are queried unless ``peer_services`` is given.
+        """
+
+        logger.info("Starting aggregation of catalog responses")
+        if deadline is not None:
+            deadline.check()
+
+        if peer_services is None:
+            peer_services = self.ready_peers()
+        logger.info(f"Querying {len(peer_services)} peer services: {peer_services}")
+
+        peer_results = self._fan_out(peer_services, query, deadline)
+        async with aclosing(peer_results):
+            async for peer_result in peer_results:
+                yield peer_result
+
 
-        return result_graph
+def _is_gateway_timeout(exc: Exception) -> bool:
+    """Whether a peer refused a query as its deadline budget ran out"""
+    return (
+        isinstance(exc, httpx.HTTPStatusError)
+        and exc.response.status_code == httpx.codes.GATEWAY_TIMEOUT
+    )
@@ -1,12 +1,16 @@
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
+
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from app.container import ServiceContainer
 from app.logging_config import setup_logging
 from app.rest_api.routes import health_check, search
+from app.settings import get_settings
 
 
 class CustomFastAPI(FastAPI):
@@ -34,9 +38,20 @@ class CustomFastAPI(FastAPI):
         return self.openapi_schema
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    container = ServiceContainer(get_settings())
+    await container.start()
+    app.state.container = container
+    try:
+        yield
+    finally:
+        await container.aclose()
+
+
 setup_logging()
 
-app = CustomFastAPI()
+app = CustomFastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -1,4 +1,12 @@
+from typing import Annotated
+
+from fastapi import Header, HTTPException, Query, Request
+
+from app.container import ServiceContainer
+from app.core.cache import CacheMode
+from app.core.deadline import DEADLINE_HEADER, Deadline
 from app.core.entities import Person
+from app.core.results import CompletionPolicy
 
 
 def get_user() -> Person:
@@ -6,3 +14,99 @@ def get_user() -> Person:
         id="fd2a5fdf-366f-4a7a-b21c-d31d6eee6c76",
         name="John Smith",
     )
+
+
+def get_container(request: Request) -> ServiceContainer:
+    """Dependency to get the application-scoped service container"""
+    container: ServiceContainer = request.app.state.container
+    return container
+
+
+def get_deadline(
+    deadline_header: Annotated[
+        float | None,
+        Header(
+            alias=DEADLINE_HEADER,
+            ge=0,
+            allow_inf_nan=False,
+            description="Time budget of the request in milliseconds",
+        ),
+    ] = None,
+    deadline_ms: Annotated[
+        float | None,
+        Query(
+            ge=0,
+            allow_inf_nan=False,
+            description="Time budget of the request in milliseconds",
+        ),
+    ] = None,
+) -> Deadline | None:
+    """
+    Dependency to get the request deadline from the header or the query
+    parameter. The header wins when both are given.
+    """
+    budget_ms = deadline_header if deadline_header is not None else deadline_ms
+    if budget_ms is None:
+        return None
+    return _deadline(budget_ms)
+
+
+def get_completion_policy(
+    quorum: Annotated[
+        float | None,
+        Query(
+            ge=0,
+            le=1,
+            description="Return once this fraction of the peers has answered",
+        ),
+    ] = None,
+    min_results: Annotated[
+        int | None,
+        Query(ge=1, description="Return once this many datasets were found"),
+    ] = None,
+    soft_deadline_ms: Annotated[
+        float | None,
+        Query(
+            ge=0,
+            allow_inf_nan=False,
+            description="Return the results found so far after this many "
+            "milliseconds",
+        ),
+    ] = None,
+) -> CompletionPolicy:
+    """Dependency to get the completion policy of a distributed search"""
+    soft_deadline = None
+    if soft_deadline_ms is not None:
+        soft_deadline = _deadline(soft_deadline_ms)
+    return CompletionPolicy(
+        quorum=quorum, min_results=min_results, soft_deadline=soft_deadline
+    )
+
+
+def _deadline(budget_ms: float) -> Deadline:
+    # FastAPI 0.109 does not enforce allow_inf_nan on parameters
+    try:
+        return Deadline.from_budget_ms(budget_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def get_cache_mode(
+    cache_control: Annotated[
+        str | None,
+        Header(
+            alias="Cache-Control",
+            description="`no-cache` to refresh the cached result, `no-store` "
+            "to bypass the cache",
+        ),
+    ] = None,
+) -> CacheMode:
+    """Dependency to get how a search uses the results cache"""
+    directives = {
+        directive.strip().lower() for directive in (cache_control or "").split(",")
+    }
+    if "no-store" in directives:
+        return CacheMode.BYPASS
+    if "no-cache" in directives:
+        return CacheMode.REFRESH
+    return CacheMode.USE
@@ -0,0 +1,68 @@
+from typing import Any, AsyncIterator, Iterator
+
+import json
+import time
+
+from app.core.metrics import RESPONSE_BYTES, RESPONSE_ENCODE_SECONDS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is used only when installed
+    orjson = None  # type: ignore[assignment]
+
+
+def dumps(value: Any, pretty: bool = False) -> bytes:
+    """
+    Encode a value as compact JSON, with orjson when it is installed.
+    Pretty JSON is indented by 4 spaces for humans, as the service always
+    wrote it before.
+    """
+    if pretty:
+        return json.dumps(value, indent=4).encode()
+    if orjson is not None:
+        try:
+            return orjson.dumps(value)
+        except orjson.JSONEncodeError:
+            # Integers over 64 bits, such as large xsd:integer literals
+            pass
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class ResponseStats:
+    """
+    Size of a response body and time spent encoding it, recorded per
+    endpoint once the body is written
+    """
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.size = 0
+        self.encode_seconds = 0.0
+
+    def encode(self, value: Any, pretty: bool = False) -> bytes:
+        started_at = time.perf_counter()
+        data = dumps(value, pretty)
+        self.encode_seconds += time.perf_counter() - started_at
+        return data
+
+    def count(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass the chunks of a body through, recording it at the end"""
+        try:
+            for chunk in chunks:
+                self.size += len(chunk)
+                yield chunk
+        finally:
+            self.observe()
+
+    async def acount(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """Pass the chunks of a body through, recording it at the end"""
+        try:
+            async for chunk in chunks:
+                self.size += len(chunk)
+                yield chunk
+        finally:
+            self.observe()
+
+    def observe(self) -> None:
+        RESPONSE_BYTES.labels(self.endpoint).observe(self.size)
+        RESPONSE_ENCODE_SECONDS.labels(self.endpoint).observe(self.encode_seconds)
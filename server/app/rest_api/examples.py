@@ -72,4 +72,43 @@ decentralized_catalog_filters_example: dict[str, Any] = {
             ],
         },
     ],
+    "completeness": {
+        "complete": False,
+        "peers": [
+            {
+                "url": "https://ds-search.node1.example.com",
+                "status": "ok",
+                "elapsed_ms": 42.0,
+            },
+            {
+                "url": "https://ds-search.node2.example.com",
+                "status": "pending",
+                "elapsed_ms": 0.0,
+            },
+        ],
+    },
 }
+
+distributed_search_stream_example = (
+    '{"peer":"https://ds-search.node1.example.com","result":{"@context":{...},'
+    '"@id":"https://example.com/catalog/123","@type":"dcat:Catalog"}}\n'
+    '{"peers":[{"url":"https://ds-search.node1.example.com","status":"ok",'
+    '"elapsed_ms":42.0},{"url":"https://ds-search.node2.example.com",'
+    '"status":"timeout","elapsed_ms":5000.0}],"elapsed_ms":5001.3}\n'
+)
+
+distributed_search_events_example = (
+    "event: result\n"
+    'data: {"peer":"https://ds-search.node1.example.com","result":{...}}\n\n'
+    "event: progress\n"
+    'data: {"answered":1,"done":1,"total":2,'
+    '"url":"https://ds-search.node1.example.com",'
+    '"status":"ok","elapsed_ms":42.0}\n\n'
+    ": heartbeat\n\n"
+    "event: progress\n"
+    'data: {"answered":1,"done":2,"total":2,'
+    '"url":"https://ds-search.node2.example.com",'
+    '"status":"timeout","elapsed_ms":5000.0}\n\n'
+    "event: complete\n"
+    'data: {"peers":[...],"elapsed_ms":5001.3}\n\n'
+)
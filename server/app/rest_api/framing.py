@@ -0,0 +1,323 @@
+from typing import Any, Iterable
+
+import math
+
+from rdflib import RDF, BNode, Graph, Literal, URIRef
+from rdflib.namespace import XSD
+from rdflib.term import Node
+
+# Literals rdflib writes as native JSON values
+NATIVE_TYPES = {XSD.boolean, XSD.integer, XSD.double, XSD.string}
+GEN_DELIMS = ":/?#[]@"
+# Namespace attribute lookups are slow on the hot path
+TYPE, FIRST, REST, NIL, LIST = RDF.type, RDF.first, RDF.rest, RDF.nil, RDF.List
+
+
+class UnsupportedGraph(Exception):
+    """The graph uses a feature the fast framer does not reproduce"""
+
+
+class IRICompactor:
+    """
+    Compacts IRIs with the terms and the ``@vocab`` of a context the way
+    pyld does: a term for its own IRI, a term relative to the vocabulary,
+    then the shortest compact IRI with a prefix term.
+    """
+
+    def __init__(self, context: dict[str, str]) -> None:
+        self._vocab = context.get("@vocab")
+        self._mappings = {
+            term: iri for term, iri in context.items() if not term.startswith("@")
+        }
+        self._terms: dict[str, str] = {}
+        for term in sorted(self._mappings, key=lambda term: (len(term), term)):
+            self._terms.setdefault(self._mappings[term], term)
+        self._prefixes = [
+            (term, iri)
+            for term, iri in self._mappings.items()
+            if ":" not in term and iri and iri[-1] in GEN_DELIMS
+        ]
+
+    def compact(self, iri: str, vocab: bool = False) -> str:
+        """
+        Compact an IRI, as a property or a type when ``vocab`` is set and
+        as a node identifier otherwise
+        """
+        if vocab:
+            if iri in self._terms:
+                return self._terms[iri]
+            if self._vocab and iri.startswith(self._vocab) and iri != self._vocab:
+                suffix = iri[len(self._vocab) :]
+                if suffix not in self._mappings:
+                    return suffix
+        candidates = [
+            f"{term}:{iri[len(prefix_iri):]}"
+            for term, prefix_iri in self._prefixes
+            if iri != prefix_iri and iri.startswith(prefix_iri)
+        ]
+        candidates = [curie for curie in candidates if curie not in self._mappings]
+        if candidates:
+            return min(candidates, key=lambda curie: (len(curie), curie))
+        if any(iri.startswith(f"{term}:") for term, _ in self._prefixes):
+            raise UnsupportedGraph(f"IRI confused with a compact IRI: {iri}")
+        return iri
+
+
+def framed_nodes(graph: Graph, rdf_type: URIRef) -> list[URIRef | BNode]:
+    """
+    Nodes of the type in the order framing lists them. Blank nodes come
+    first in the order of their rdflib identifiers, while pyld lists them
+    in the order rdflib happens to serialize them.
+    """
+    nodes = {
+        node
+        for node in graph.subjects(RDF.type, rdf_type)
+        if isinstance(node, URIRef)
+        or (isinstance(node, BNode) and _is_serialized(graph, node))
+    }
+    return sorted(
+        nodes, key=lambda node: node.n3() if isinstance(node, BNode) else node
+    )
+
+
+def _is_serialized(graph: Graph, node: BNode) -> bool:
+    """
+    Whether rdflib writes the blank node, which it only does when the node
+    is reached from an IRI or from a blank node nothing refers to
+    """
+    seen: set[Node] = {node}
+    pending: list[Node] = [node]
+    while pending:
+        referrers = list(graph.subjects(None, pending.pop()))
+        if not referrers:
+            return True
+        for referrer in referrers:
+            if isinstance(referrer, URIRef):
+                return True
+            if referrer not in seen:
+                seen.add(referrer)
+                pending.append(referrer)
+    return False
+
+
+class _FrameState:
+    def __init__(self, embed_framed: bool) -> None:
+        self.embed_framed = embed_framed
+        self.embedded: set[Node] = set()
+        self.stack: set[Node] = set()
+        # Node objects of every blank node, and the references to blank nodes
+        # that framing does not count, inside lists of lists
+        self.blank_nodes: dict[BNode, list[dict[str, Any]]] = {}
+        self.blank_references: dict[BNode, list[dict[str, Any]]] = {}
+
+
+class CatalogFramer:
+    """
+    Framer of the nodes of a type, producing what pyld produces for a frame
+    made of a context and an ``@type``, on the graph serialized by rdflib.
+
+    The tree below every node is built straight from the subject index of
+    the graph. Every top-level node is framed on its own: nodes are embedded
+    the first time they are reached below it and referred to afterwards, and
+    so are the nodes that would make a cycle. Blank node identifiers are
+    only kept for blank nodes that are referred to more than once, and are
+    numbered in the order they appear. The output is the one of pyld apart
+    from these labels and the order of the top-level blank nodes, which
+    are arbitrary in both. Raises UnsupportedGraph for graphs pyld would
+    frame differently or reject.
+    """
+
+    def __init__(self, graph: Graph, rdf_type: URIRef, compactor: IRICompactor) -> None:
+        self._graph = graph
+        self._type = rdf_type
+        self._compactor = compactor
+        self._vocab_terms: dict[str, str] = {}
+        self._ids: dict[URIRef, str] = {}
+
+    def frame(self) -> list[dict[str, Any]]:
+        """Every node of the type, as the ``@graph`` of the framed document"""
+        state = _FrameState(embed_framed=True)
+        framed = []
+        for node in framed_nodes(self._graph, self._type):
+            # Every top-level node embeds the nodes below it anew
+            state.embedded = set()
+            framed.append(self._embed(node, state))
+        self._label_blank_nodes(state)
+        return framed
+
+    def frame_node(
+        self, node: URIRef | BNode, embed_framed: bool = True
+    ) -> dict[str, Any]:
+        """
+        A single node of the type. Other nodes of the type below it are only
+        referred to unless ``embed_framed`` is set.
+        """
+        state = _FrameState(embed_framed)
+        framed = self._embed(node, state)
+        self._label_blank_nodes(state)
+        return framed
+
+    def _vocab(self, iri: str) -> str:
+        term = self._vocab_terms.get(iri)
+        if term is None:
+            term = self._vocab_terms[iri] = self._compactor.compact(iri, vocab=True)
+        return term
+
+    def _id(self, node: URIRef) -> str:
+        node_id = self._ids.get(node)
+        if node_id is None:
+            node_id = self._ids[node] = self._compactor.compact(str(node))
+        return node_id
+
+    def _reference(self, node: URIRef | BNode, state: _FrameState) -> dict[str, Any]:
+        if isinstance(node, BNode):
+            output: dict[str, Any] = {"@id": None}
+            state.blank_nodes.setdefault(node, []).append(output)
+            return output
+        return {"@id": self._id(node)}
+
+    def _embed(self, node: URIRef | BNode, state: _FrameState) -> dict[str, Any]:
+        output = self._reference(node, state)
+        state.embedded.add(node)
+        state.stack.add(node)
+        types: list[str] = []
+        objects: dict[Node, list[Node]] = {}
+        for predicate, obj in self._graph.predicate_objects(node):
+            if predicate == TYPE:
+                if not isinstance(obj, URIRef):
+                    raise UnsupportedGraph(f"Type is not an IRI: {obj}")
+                types.append(self._vocab(str(obj)))
+            else:
+                objects.setdefault(predicate, []).append(obj)
+        if types:
+            output["@type"] = types[0] if len(types) == 1 else types
+        for predicate in sorted(objects, key=str):
+            values = self._values(objects[predicate], state)
+            output[self._vocab(str(predicate))] = (
+                values[0] if len(values) == 1 else values
+            )
+        state.stack.discard(node)
+        return output
+
+    def _values(self, objects: Iterable[Node], state: _FrameState) -> list[Any]:
+        values = []
+        literals = set()
+        for obj in objects:
+            if isinstance(obj, Literal):
+                # Literals equal as JSON values are only listed once
+                key = (obj.datatype, _language(obj), _json_value(obj))
+                if key in literals:
+                    continue
+                literals.add(key)
+            values.append(self._value(obj, state))
+        return values
+
+    def _value(self, obj: Node, state: _FrameState) -> Any:
+        items = self._collection(obj)
+        if items is not None:
+            return {"@list": [self._list_item(item, state) for item in items]}
+        if isinstance(obj, (URIRef, BNode)):
+            if (
+                obj in state.stack
+                or obj in state.embedded
+                or (not state.embed_framed and (obj, TYPE, self._type) in self._graph)
+            ):
+                return self._reference(obj, state)
+            return self._embed(obj, state)
+        if isinstance(obj, Literal):
+            return self._literal(obj)
+        raise UnsupportedGraph(f"Unsupported object: {obj!r}")
+
+    def _list_item(self, item: Node, state: _FrameState) -> Any:
+        items = self._collection(item)
+        if items is None:
+            return self._value(item, state)
+        # The items of lists of lists are not framed
+        return {"@list": [self._raw_value(nested, state) for nested in items]}
+
+    def _raw_value(self, obj: Node, state: _FrameState) -> Any:
+        items = self._collection(obj)
+        if items is not None:
+            return {"@list": [self._raw_value(item, state) for item in items]}
+        if isinstance(obj, BNode):
+            output: dict[str, Any] = {"@id": None}
+            state.blank_references.setdefault(obj, []).append(output)
+            return output
+        if isinstance(obj, URIRef):
+            return {"@id": self._id(obj)}
+        if isinstance(obj, Literal):
+            return self._literal(obj)
+        raise UnsupportedGraph(f"Unsupported object: {obj!r}")
+
+    def _literal(self, literal: Literal) -> Any:
+        if literal.datatype is not None:
+            return {
+                "@type": self._vocab(str(literal.datatype)),
+                "@value": _json_value(literal),
+            }
+        if literal.language:
+            return {"@language": _language(literal), "@value": str(literal)}
+        return str(literal)
+
+    def _collection(self, node: Node) -> list[Node] | None:
+        """Items of the RDF list starting at the node, as rdflib finds them"""
+        if node == NIL:
+            return []
+        if not isinstance(node, BNode) or not self._graph.value(node, FIRST):
+            return None
+        items: list[Node] = []
+        chain: set[Node | None] = {node}
+        current: Node | None = node
+        while current:
+            if current == NIL:
+                return items
+            if isinstance(current, URIRef):
+                return None
+            first = rest = None
+            for predicate, obj in self._graph.predicate_objects(current):
+                if not first and predicate == FIRST:
+                    first = obj
+                elif not rest and predicate == REST:
+                    rest = obj
+                elif predicate != TYPE or obj != LIST:
+                    return None
+            if first is None:
+                return None
+            items.append(first)
+            current = rest
+            if current in chain:
+                return None
+            chain.add(current)
+        return None
+
+    @staticmethod
+    def _label_blank_nodes(state: _FrameState) -> None:
+        labels = 0
+        for node in dict.fromkeys([*state.blank_nodes, *state.blank_references]):
+            framed = state.blank_nodes.get(node, [])
+            outputs = framed + state.blank_references.get(node, [])
+            if len(framed) == 1:
+                for output in outputs:
+                    del output["@id"]
+            else:
+                for output in outputs:
+                    output["@id"] = f"_:b{labels}"
+                labels += 1
+
+
+def _json_value(literal: Literal) -> Any:
+    if literal.datatype in NATIVE_TYPES:
+        value = literal.toPython()
+        # Ill-typed lexical forms stay strings
+        if isinstance(value, Literal):
+            return str(value)
+        if isinstance(value, float) and not math.isfinite(value):
+            # Not valid JSON, and dropped by pyld
+            raise UnsupportedGraph(f"Non-finite double: {literal}")
+        return value
+    return str(literal)
+
+
+def _language(literal: Literal) -> str | None:
+    # pyld lowercases language tags
+    return literal.language.lower() if literal.language else None
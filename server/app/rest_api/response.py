@@ -1,12 +1,26 @@
-from typing import Any
+from typing import Any, Iterator
 
+import hashlib
 import json
+import logging
+import time
+from enum import Enum
 
 from fastapi import Response
+from fastapi.responses import StreamingResponse
 from pyld import jsonld
-from rdflib import Graph
+from rdflib import RDF, BNode, Graph, URIRef
 from rdflib.namespace import DCAT, DCTERMS, FOAF, SKOS, XSD, Namespace
 
+from app.core.merge import relabel_blank_nodes
+from app.core.offload import Offloader
+from app.core.results import DistributedSearchResult, PeerResult
+
+from .encoding import ResponseStats, dumps
+from .framing import CatalogFramer, IRICompactor, UnsupportedGraph, framed_nodes
+
+logger = logging.getLogger(__name__)
+
 DSPACE = Namespace("http://data-space.org/")
 SPDX = Namespace("http://spdx.org/rdf/terms#")
 DCATAP = Namespace("http://data.europa.eu/r5r/")
@@ -22,27 +36,218 @@ CONTEXT = {
     "skos": str(SKOS),
 }
 RDF_TYPE = "dcat:Catalog"
+COMPACTOR = IRICompactor(CONTEXT)
+
+
+class FramingEngine(str, Enum):
+    FAST = "fast"
+    PYLD = "pyld"
+
+
+def frame_graph(
+    graph: Graph, rdf_type: str = RDF_TYPE, engine: FramingEngine = FramingEngine.FAST
+) -> dict[str, Any]:
+    """
+    Frame the nodes of the given type in the graph as JSON-LD. The fast
+    engine falls back to pyld for graphs it does not support.
+    """
+    if engine == FramingEngine.FAST:
+        try:
+            nodes = CatalogFramer(graph, expand_type(rdf_type), COMPACTOR).frame()
+        except UnsupportedGraph as e:
+            logger.debug(f"Framing with pyld instead: {e}")
+        else:
+            return framed_document(nodes)
+    return frame_graph_pyld(graph, rdf_type)
+
+
+def framed_document(nodes: list[dict[str, Any]]) -> dict[str, Any]:
+    """Document of the framed nodes, with a single node at the top level"""
+    if len(nodes) == 1:
+        return {"@context": dict(CONTEXT), **nodes[0]}
+    if nodes:
+        return {"@context": dict(CONTEXT), "@graph": nodes}
+    return {"@context": dict(CONTEXT)}
+
+
+def frame_graph_pyld(graph: Graph, rdf_type: str = RDF_TYPE) -> dict[str, Any]:
+    """Frame the nodes of the given type in the graph with pyld"""
+    frame = {
+        "@context": CONTEXT,
+        "@type": rdf_type,
+    }
+    json_ld_str = graph.serialize(format="json-ld")
+    json_ld = json.loads(json_ld_str)
+    framed_json_ld: dict[str, Any] = jsonld.frame(json_ld, frame)
+    return framed_json_ld
+
+
+def expand_type(rdf_type: str) -> URIRef:
+    """Expand a compact type such as dcat:Catalog with the CONTEXT prefixes"""
+    prefix, _, name = rdf_type.partition(":")
+    if name and prefix in CONTEXT:
+        return URIRef(CONTEXT[prefix] + name)
+    if not name:
+        return URIRef(CONTEXT["@vocab"] + rdf_type)
+    return URIRef(rdf_type)
+
+
+def node_subgraph(graph: Graph, node: URIRef | BNode, rdf_type: URIRef) -> Graph:
+    """
+    Triples describing the node and the nodes it refers to, the way framing
+    embeds them. Other nodes of the framed type are only referred to.
+    """
+    subgraph = Graph()
+    seen = {node}
+    pending = [node]
+    while pending:
+        subject = pending.pop()
+        for predicate, obj in graph.predicate_objects(subject):
+            subgraph.add((subject, predicate, obj))
+            if (
+                isinstance(obj, (URIRef, BNode))
+                and obj not in seen
+                and (obj, RDF.type, rdf_type) not in graph
+            ):
+                seen.add(obj)
+                pending.append(obj)
+    return subgraph
+
+
+def iter_framed_nodes(
+    graph: Graph, rdf_type: str = RDF_TYPE, engine: FramingEngine = FramingEngine.FAST
+) -> Iterator[Any]:
+    """
+    Frame the nodes of the given type one at a time, in the order framing
+    the whole graph would list them. Blank node labels are made unique
+    across the nodes, since every node is framed on its own.
+    """
+    type_uri = expand_type(rdf_type)
+    framer = CatalogFramer(graph, type_uri, COMPACTOR)
+    for index, node in enumerate(framed_nodes(graph, type_uri)):
+        framed: Any = None
+        if engine == FramingEngine.FAST:
+            try:
+                framed = framer.frame_node(node, embed_framed=False)
+            except UnsupportedGraph as e:
+                logger.debug(f"Framing {node} with pyld instead: {e}")
+        if framed is None:
+            framed = frame_graph_pyld(node_subgraph(graph, node, type_uri), rdf_type)
+            framed.pop("@context", None)
+        for framed_node in framed.pop("@graph", [framed]):
+            yield relabel_blank_nodes(framed_node, f"n{index}")
+
+
+def peer_status(peer_result: PeerResult) -> dict[str, Any]:
+    return {
+        "url": peer_result.url,
+        "status": peer_result.status.value,
+        "elapsed_ms": round(peer_result.elapsed * 1000, 1),
+    }
+
+
+def completeness(result: DistributedSearchResult) -> dict[str, Any]:
+    """Completeness metadata of a distributed search response"""
+    return {
+        "complete": result.complete,
+        "peers": [peer_status(peer) for peer in result.peers],
+    }
+
+
+def render_json_ld(
+    graph: Graph,
+    rdf_type: str = RDF_TYPE,
+    metadata: dict[str, Any] | None = None,
+    engine: FramingEngine = FramingEngine.FAST,
+    pretty: bool = False,
+) -> tuple[bytes, float]:
+    """
+    Body of the framed graph, with the ``metadata`` keys at the top level,
+    and the seconds spent encoding it
+    """
+    framed_json_ld = frame_graph(graph, rdf_type, engine)
+    if metadata:
+        # Top level keys describe the document, so a single framed node
+        # is moved into the @graph array first
+        if "@graph" not in framed_json_ld:
+            context = framed_json_ld.pop("@context")
+            graph_nodes = [framed_json_ld] if framed_json_ld else []
+            framed_json_ld = {"@context": context, "@graph": graph_nodes}
+        framed_json_ld.update(metadata)
+    started_at = time.perf_counter()
+    body = dumps(framed_json_ld, pretty)
+    return body, time.perf_counter() - started_at
+
+
+async def offload_json_ld(
+    offloader: Offloader,
+    graph: Graph,
+    rdf_type: str = RDF_TYPE,
+    metadata: dict[str, Any] | None = None,
+    engine: FramingEngine = FramingEngine.FAST,
+    pretty: bool = False,
+    stats: ResponseStats | None = None,
+) -> bytes:
+    """
+    Frame and render the graph as JSON-LD out of the event loop, recording
+    the body in ``stats``
+    """
+    try:
+        body, encode_seconds = await offloader.run_on_graph(
+            "frame", render_json_ld, graph, rdf_type, metadata, engine, pretty
+        )
+    except Exception as e:
+        raise ValueError(f"Framing failed: {e}")
+    if stats is not None:
+        stats.size += len(body)
+        stats.encode_seconds += encode_seconds
+        stats.observe()
+    return body
+
+
+def etag(body: bytes) -> str:
+    """Strong entity tag of a response body"""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, tag: str) -> bool:
+    """Whether an If-None-Match header lists the entity tag"""
+    if if_none_match is None:
+        return False
+    tags = {candidate.strip() for candidate in if_none_match.split(",")}
+    # If-None-Match compares entity tags weakly
+    return "*" in tags or tag in {candidate.removeprefix("W/") for candidate in tags}
 
 
 class JSONLDResponse(Response):
+    """
+    JSON-LD response of a graph framed when the response is built, or of
+    a document already rendered, see offload_json_ld.
+    """
+
     media_type = "application/ld+json"
 
     def __init__(
         self,
-        content: Graph,
+        content: Graph | bytes,
         rdf_type: str = RDF_TYPE,
         status_code: int = 200,
         headers: dict[str, str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        engine: FramingEngine = FramingEngine.FAST,
+        pretty: bool = False,
         **kwargs: Any,
     ) -> None:
-        if not isinstance(content, Graph):
+        if isinstance(content, bytes):
+            json_ld = content
+        elif isinstance(content, Graph):
+            try:
+                json_ld = self.to_json_ld(content, rdf_type, metadata, engine, pretty)
+            except Exception as e:
+                raise ValueError(f"Framing failed: {e}")
+        else:
             raise Exception("The content must be an instance of rdflib.Graph")
 
-        try:
-            json_ld = self.to_json_ld(content, rdf_type)
-        except Exception as e:
-            raise ValueError(f"Framing failed: {e}")
-
         super().__init__(
             content=json_ld,
             status_code=status_code,
@@ -50,12 +255,92 @@ class JSONLDResponse(Response):
             **kwargs,
         )
 
-    def to_json_ld(self, graph: Graph, rdf_type: str) -> str:
-        frame = {
-            "@context": CONTEXT,
-            "@type": rdf_type,
-        }
-        json_ld_str = graph.serialize(format="json-ld")
-        json_ld = json.loads(json_ld_str)
-        framed_json_ld = jsonld.frame(json_ld, frame)
-        return json.dumps(framed_json_ld, indent=4)
+    def to_json_ld(
+        self,
+        graph: Graph,
+        rdf_type: str,
+        metadata: dict[str, Any] | None = None,
+        engine: FramingEngine = FramingEngine.FAST,
+        pretty: bool = False,
+    ) -> bytes:
+        body, _ = render_json_ld(graph, rdf_type, metadata, engine, pretty)
+        return body
+
+
+class StreamingJSONLDResponse(StreamingResponse):
+    """
+    JSON-LD response framed and written one node at a time.
+
+    JSONLDResponse holds several copies of the whole framed document while
+    building it. Here only the graph and the node being written are held,
+    so the memory used on top of the graph is bounded by the largest node.
+    The nodes are always listed in ``@graph``, followed by the ``metadata``
+    keys. Framing runs in the thread pool as the body is sent. Nodes that
+    are already framed, such as merged peer results, are written as they are.
+    The body is recorded in ``stats`` once it is written.
+    """
+
+    media_type = "application/ld+json"
+
+    def __init__(
+        self,
+        content: Graph | list[dict[str, Any]],
+        rdf_type: str = RDF_TYPE,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+        metadata: dict[str, Any] | None = None,
+        engine: FramingEngine = FramingEngine.FAST,
+        pretty: bool = False,
+        stats: ResponseStats | None = None,
+        **kwargs: Any,
+    ) -> None:
+        if not isinstance(content, (Graph, list)):
+            raise Exception(
+                "The content must be an instance of rdflib.Graph or framed nodes"
+            )
+
+        chunks = self.iter_json_ld(
+            content, rdf_type, metadata or {}, engine, pretty, stats
+        )
+        super().__init__(
+            content=chunks if stats is None else stats.count(chunks),
+            status_code=status_code,
+            headers=headers,
+            **kwargs,
+        )
+
+    @staticmethod
+    def iter_json_ld(
+        content: Graph | list[dict[str, Any]],
+        rdf_type: str,
+        metadata: dict[str, Any],
+        engine: FramingEngine = FramingEngine.FAST,
+        pretty: bool = False,
+        stats: ResponseStats | None = None,
+    ) -> Iterator[bytes]:
+        """Chunks of the document JSONLDResponse would write with @graph"""
+        encode = dumps if stats is None else stats.encode
+
+        def member(value: Any, level: int) -> bytes:
+            data = encode(value, pretty)
+            return data.replace(b"\n", b"\n" + b" " * level) if pretty else data
+
+        def newline(level: int) -> bytes:
+            return b"\n" + b" " * level if pretty else b""
+
+        colon = b": " if pretty else b":"
+        yield b"{" + newline(4) + b'"@context"' + colon + member(CONTEXT, 4)
+        yield b"," + newline(4) + b'"@graph"' + colon + b"["
+        nodes = (
+            iter_framed_nodes(content, rdf_type, engine)
+            if isinstance(content, Graph)
+            else content
+        )
+        empty = True
+        for node in nodes:
+            yield (b"" if empty else b",") + newline(8) + member(node, 8)
+            empty = False
+        yield (b"" if empty else newline(4)) + b"]"
+        for key, value in metadata.items():
+            yield b"," + newline(4) + encode(key) + colon + member(value, 4)
+        yield newline(0) + b"}"
@@ -3,44 +3,80 @@ from typing import Annotated
 import logging
 
 from classy_fastapi import Routable, post
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 
-from app.core import discovery, entities, usecases
-from app.settings import Settings, get_settings
+from app.container import ServiceContainer
+from app.core import entities, usecases
+from app.core.cache import CACHE_STATUS_HEADER, CacheMode
+from app.core.deadline import Deadline, DeadlineExceeded
+from app.core.offload import Offloader
+from app.core.results import CompletionPolicy
 
-from ..depends import get_user
-from ..examples import catalog_filters_example, decentralized_catalog_filters_example
-from ..response import JSONLDResponse
+from ..depends import (
+    get_cache_mode,
+    get_completion_policy,
+    get_container,
+    get_deadline,
+    get_user,
+)
+from ..encoding import ResponseStats
+from ..examples import (
+    catalog_filters_example,
+    decentralized_catalog_filters_example,
+    distributed_search_events_example,
+    distributed_search_stream_example,
+)
+from ..response import (
+    FramingEngine,
+    JSONLDResponse,
+    StreamingJSONLDResponse,
+    completeness,
+    etag,
+    etag_matches,
+    offload_json_ld,
+)
 from ..serializers import CatalogFilters
+from ..streaming import (
+    NDJSON_MEDIA_TYPE,
+    SSE_HEADERS,
+    SSE_MEDIA_TYPE,
+    stream_ndjson,
+    stream_sse,
+)
 from ..tags import Tags
 
 logger = logging.getLogger(__name__)
 
+PRETTY_DESCRIPTION = "Indent the JSON-LD response for humans"
 
-def get_usecases(settings: Settings = Depends(get_settings)) -> usecases.SearchUsecases:
+
+def get_usecases(
+    container: ServiceContainer = Depends(get_container),
+) -> usecases.SearchUsecases:
     """Dependency to get the usecases instance"""
+    return container.usecases
 
-    discovery_service: discovery.IDiscoveryService
 
-    if settings.discovery_type == "dummy":
-        discovery_service = discovery.DummyDiscoveryService(
-            search_service_urls=settings.dummy_search_service_urls,
-        )
-    elif settings.discovery_type == "kube":
-        discovery_service = discovery.KubeDiscoveryService(
-            namespace=settings.pod_namespace,
-            service_name=settings.service_name,
-            service_port=settings.service_port,
-        )
-    else:
-        logger.error(f"Unsupported discovery type: {settings.discovery_type}")
-        raise ValueError(f"Unsupported discovery type: {settings.discovery_type}")
-
-    return usecases.SearchUsecases(
-        discovery_service=discovery_service,
-        catalog_service_url=settings.catalog_service_url,
-        request_timeout=settings.request_timeout,
-    )
+def get_heartbeat_interval(
+    container: ServiceContainer = Depends(get_container),
+) -> float:
+    """Dependency to get the interval of the Server-Sent Events heartbeat"""
+    return container.settings.sse_heartbeat_interval
+
+
+def get_offloader(
+    container: ServiceContainer = Depends(get_container),
+) -> Offloader:
+    """Dependency to get the executor parsing and framing JSON-LD"""
+    return container.offloader
+
+
+def get_framing_engine(
+    container: ServiceContainer = Depends(get_container),
+) -> FramingEngine:
+    """Dependency to get the engine framing the JSON-LD responses"""
+    return container.settings.framing_engine
 
 
 class SearchRoutes(Routable):
@@ -58,15 +94,24 @@ class SearchRoutes(Routable):
                         "example": catalog_filters_example,
                     },
                 },
-            }
+            },
+            304: {"description": "The results listed in If-None-Match are current"},
         },
     )
     async def local_search(
         self,
         filters: CatalogFilters,
         user: Annotated[entities.Person, Depends(get_user)],
+        deadline: Annotated[Deadline | None, Depends(get_deadline)],
+        engine: Annotated[FramingEngine, Depends(get_framing_engine)],
+        offloader: Annotated[Offloader, Depends(get_offloader)],
+        pretty: Annotated[bool, Query(description=PRETTY_DESCRIPTION)] = False,
+        if_none_match: Annotated[
+            str | None,
+            Header(description="Entity tags of the results the client holds"),
+        ] = None,
         usecases: usecases.SearchUsecases = Depends(get_usecases),
-    ) -> JSONLDResponse:
+    ) -> Response:
         """
         Search the local catalog with dataset list.
 
@@ -80,19 +125,46 @@ class SearchRoutes(Routable):
 
         https://hiro-microdatacenters-bv.github.io/ds-catalog/docs/index.html#tag/Catalog/operation/get_catalog
 
+        ### Deadline:
+        An optional time budget in milliseconds can be given in the
+        `X-Search-Deadline-Ms` header or the `deadline_ms` query parameter.
+        The request fails with 504 if the budget is spent before the local
+        catalog has answered.
+
+        ### Revalidation:
+        The response carries a strong `ETag` of its body. A request whose
+        `If-None-Match` header lists it is answered `304 Not Modified`
+        without a body, so that aggregators reuse the results they hold.
+
         """
-        logger.info("Received request to search the local catalog")
-        response = await usecases.local_search(filters)
+        logger.info(
+            f"Received request to search the local catalog: {filters.fingerprint()}"
+        )
+        try:
+            response = await usecases.local_search(filters, deadline=deadline)
+        except DeadlineExceeded as e:
+            logger.warning(f"Local search aborted: {e}")
+            raise HTTPException(status_code=504, detail=str(e))
         logger.info("Successfully queried the local catalog")
         logger.debug(f"Response type: {type(response)}, Response: {response}")
-        return JSONLDResponse(content=response, status_code=200)
+        json_ld = await offload_json_ld(
+            offloader,
+            response,
+            engine=engine,
+            pretty=pretty,
+            stats=ResponseStats("local_search"),
+        )
+        headers = {"ETag": etag(json_ld)}
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return JSONLDResponse(content=json_ld, status_code=200, headers=headers)
 
     @post(
         "/distributed-search/",
         operation_id="distributed_search",
         name="Decentralized Search across catalogs",
         tags=[Tags.Decentralized_search],
-        response_class=JSONLDResponse,
+        response_class=StreamingJSONLDResponse,
         responses={
             200: {
                 "description": "Successful Response",
@@ -108,8 +180,13 @@ class SearchRoutes(Routable):
         self,
         filters: CatalogFilters,
         user: Annotated[entities.Person, Depends(get_user)],
+        deadline: Annotated[Deadline | None, Depends(get_deadline)],
+        policy: Annotated[CompletionPolicy, Depends(get_completion_policy)],
+        engine: Annotated[FramingEngine, Depends(get_framing_engine)],
+        cache_mode: Annotated[CacheMode, Depends(get_cache_mode)],
+        pretty: Annotated[bool, Query(description=PRETTY_DESCRIPTION)] = False,
         usecases: usecases.SearchUsecases = Depends(get_usecases),
-    ) -> JSONLDResponse:
+    ) -> StreamingJSONLDResponse:
         """
         Search the across catalogs with dataset list.
 
@@ -122,12 +199,190 @@ class SearchRoutes(Routable):
         for details, check ds-catalog-service documentation.
         https://hiro-microdatacenters-bv.github.io/ds-catalog/docs/index.html
 
+        ### Deadline:
+        An optional time budget in milliseconds can be given in the
+        `X-Search-Deadline-Ms` header or the `deadline_ms` query parameter.
+        It is forwarded to the peers, and the peers that have not answered
+        when it is spent are left out of the result.
+
+        ### Partial results:
+        The search can return before every peer has answered, once the
+        `quorum` fraction of the peers has answered, once `min_results`
+        datasets were found or once `soft_deadline_ms` has passed, whichever
+        comes first. The `completeness` key of the response tells whether
+        every peer answered and gives the status of each of them: `ok`,
+        `error`, `timeout`, `skipped` (open circuit) or `pending` (left out
+        by the options above).
+
+        ### Caching:
+        Complete results are cached for a few seconds. Once expired, a result
+        is still returned for a while as it is refreshed in the background.
+        A `Cache-Control: no-cache` request header queries the peers anew,
+        and `no-store` bypasses the cache altogether. The `X-Search-Cache`
+        response header tells whether the result was a `hit`, `stale`, a
+        `miss`, a `refresh` or a `bypass`.
+
         """
-        logger.info("Received request to perform decentralized search across catalogs")
-        responses = await usecases.distributed_search(filters)
+        logger.info(
+            "Received request to perform decentralized search across catalogs: "
+            f"{filters.fingerprint()}"
+        )
+        try:
+            result = await usecases.distributed_search(
+                filters, deadline=deadline, policy=policy, cache_mode=cache_mode
+            )
+        except DeadlineExceeded as e:
+            logger.warning(f"Distributed search aborted: {e}")
+            raise HTTPException(status_code=504, detail=str(e))
         logger.info("Successfully aggregated responses from catalogs")
-        logger.debug(f"Aggregated responses: {responses}")
-        return JSONLDResponse(content=responses, status_code=200)
+        logger.debug(f"Aggregated responses: {result.graph}")
+        headers = {}
+        if result.cache_status is not None:
+            headers[CACHE_STATUS_HEADER] = result.cache_status.value
+        return StreamingJSONLDResponse(
+            content=result.graph if result.nodes is None else result.nodes,
+            status_code=200,
+            headers=headers,
+            metadata={"completeness": completeness(result)},
+            engine=engine,
+            pretty=pretty,
+            stats=ResponseStats("distributed_search"),
+        )
+
+    @post(
+        "/distributed-search/stream",
+        operation_id="distributed_search_stream",
+        name="Streaming Decentralized Search across catalogs",
+        tags=[Tags.Decentralized_search],
+        response_class=StreamingResponse,
+        responses={
+            200: {
+                "description": "Successful Response",
+                "content": {
+                    NDJSON_MEDIA_TYPE: {
+                        "example": distributed_search_stream_example,
+                    },
+                },
+            }
+        },
+    )
+    async def distributed_search_stream(
+        self,
+        filters: CatalogFilters,
+        user: Annotated[entities.Person, Depends(get_user)],
+        deadline: Annotated[Deadline | None, Depends(get_deadline)],
+        engine: Annotated[FramingEngine, Depends(get_framing_engine)],
+        offloader: Annotated[Offloader, Depends(get_offloader)],
+        usecases: usecases.SearchUsecases = Depends(get_usecases),
+    ) -> StreamingResponse:
+        """
+        Search across catalogs, streaming the results of every peer as they
+        arrive.
+
+        The request accepts the same filters as `/distributed-search/`.
+
+        ### Format:
+        The response is newline delimited JSON. Every peer that found
+        catalogs adds a line `{"peer": <url>, "result": <framed JSON-LD>}` as
+        soon as it has answered. The last line is a trailer
+        `{"peers": [...], "elapsed_ms": <total>}` with the status (`ok`,
+        `error`, `timeout` or `skipped`) and the timing of every peer.
+
+        ### Deadline:
+        Same as for `/distributed-search/`. The peers that have not answered
+        when the budget is spent are reported as timed out in the trailer.
+
+        """
+        logger.info(
+            "Received request to stream decentralized search results: "
+            f"{filters.fingerprint()}"
+        )
+        if deadline is not None and deadline.expired:
+            logger.warning("Distributed search stream aborted: deadline exceeded")
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        peer_results = usecases.stream_distributed_search(filters, deadline=deadline)
+        stats = ResponseStats("distributed_search_stream")
+        return StreamingResponse(
+            stats.acount(
+                stream_ndjson(
+                    peer_results, engine=engine, offloader=offloader, stats=stats
+                )
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+
+    @post(
+        "/distributed-search/events",
+        operation_id="distributed_search_events",
+        name="Progressive Decentralized Search across catalogs",
+        tags=[Tags.Decentralized_search],
+        response_class=StreamingResponse,
+        responses={
+            200: {
+                "description": "Successful Response",
+                "content": {
+                    SSE_MEDIA_TYPE: {
+                        "example": distributed_search_events_example,
+                    },
+                },
+            }
+        },
+    )
+    async def distributed_search_events(
+        self,
+        filters: CatalogFilters,
+        user: Annotated[entities.Person, Depends(get_user)],
+        deadline: Annotated[Deadline | None, Depends(get_deadline)],
+        heartbeat_interval: Annotated[float, Depends(get_heartbeat_interval)],
+        engine: Annotated[FramingEngine, Depends(get_framing_engine)],
+        offloader: Annotated[Offloader, Depends(get_offloader)],
+        usecases: usecases.SearchUsecases = Depends(get_usecases),
+    ) -> StreamingResponse:
+        """
+        Search across catalogs, reporting the progress as Server-Sent Events.
+
+        The request accepts the same filters as `/distributed-search/`.
+
+        ### Events:
+        * `result` - framed JSON-LD catalogs of a peer, as soon as it answered
+        * `progress` - number of peers that answered (`answered`) and of
+          peers done, whether they answered, failed or were skipped (`done`),
+          out of the total, with the status and the timing of the latest one
+        * `complete` - status and timing of every peer, ends the stream
+
+        Heartbeat comments keep the connection open while the peers are
+        quiet. Closing the connection cancels the outstanding peer queries.
+
+        ### Deadline:
+        Same as for `/distributed-search/`.
+
+        """
+        logger.info(
+            "Received request to stream decentralized search events: "
+            f"{filters.fingerprint()}"
+        )
+        if deadline is not None and deadline.expired:
+            logger.warning("Distributed search events aborted: deadline exceeded")
+            raise HTTPException(status_code=504, detail="Request deadline exceeded")
+        peer_services = usecases.ready_peers()
+        peer_results = usecases.stream_distributed_search(
+            filters, deadline=deadline, peer_services=peer_services
+        )
+        stats = ResponseStats("distributed_search_events")
+        return StreamingResponse(
+            stats.acount(
+                stream_sse(
+                    peer_results,
+                    len(peer_services),
+                    heartbeat_interval,
+                    engine=engine,
+                    offloader=offloader,
+                    stats=stats,
+                )
+            ),
+            media_type=SSE_MEDIA_TYPE,
+            headers=SSE_HEADERS,
+        )
 
 
 routes = SearchRoutes()
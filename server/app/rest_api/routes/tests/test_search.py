@@ -1,19 +1,53 @@
 from typing import Any, Dict
 
-from unittest.mock import AsyncMock, patch
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import pytest
 from fastapi.testclient import TestClient
 from rdflib import Graph
 
+from app.core.cache import CacheMode, CacheStatus
+from app.core.deadline import DeadlineExceeded
+from app.core.offload import Offloader, OffloadExecutor
+from app.core.results import (
+    CompletionPolicy,
+    DistributedSearchResult,
+    PeerResult,
+    PeerStatus,
+)
 from app.core.tests.factories import person_factory
 from app.main import app  # Import the FastAPI app instance
-from app.rest_api.routes.search import get_usecases
+from app.rest_api.response import CONTEXT, FramingEngine
+from app.rest_api.routes.search import (
+    get_framing_engine,
+    get_heartbeat_interval,
+    get_offloader,
+    get_usecases,
+)
+from app.rest_api.streaming import SSE_HEARTBEAT, stream_sse
 
 from ...serializers import CatalogFilters
 
 client = TestClient(app)  # Use the app instance instead of the router
 
 
+@pytest.fixture(scope="module")
+def offloader():
+    offloader = Offloader(OffloadExecutor.THREAD, max_workers=2)
+    yield offloader
+    offloader.shutdown()
+
+
+@pytest.fixture(autouse=True, params=list(FramingEngine))
+def framing_engine(request, offloader):
+    app.dependency_overrides[get_framing_engine] = lambda: request.param
+    app.dependency_overrides[get_offloader] = lambda: offloader
+    yield request.param
+    app.dependency_overrides = {}
+
+
 @patch("app.rest_api.routes.search.get_user")
 @patch("app.rest_api.routes.search.get_usecases")
 def test_local_search(mock_get_usecases, mock_get_user):
@@ -83,7 +117,7 @@ def test_local_search(mock_get_usecases, mock_get_user):
     assert "@type" in response.json()
 
     # Ensure the mocked method was awaited with the correct argument
-    mock_usecases.local_search.assert_awaited_once_with(catalog_filters)
+    mock_usecases.local_search.assert_awaited_once_with(catalog_filters, deadline=None)
 
     # Clean up the dependency override
     app.dependency_overrides = {}
@@ -119,8 +153,14 @@ def test_distributed_search(mock_get_usecases, mock_get_user):
         format="turtle",
     )
 
-    # Mock the distributed_search method to return a list of mocked graphs
-    mock_usecases.distributed_search.return_value = mocked_graph
+    # Mock the distributed_search method to return the mocked graph
+    mock_usecases.distributed_search.return_value = DistributedSearchResult(
+        graph=mocked_graph,
+        peers=[
+            PeerResult("http://peer1.com", PeerStatus.OK, elapsed=0.01),
+            PeerResult("http://peer2.com", PeerStatus.PENDING),
+        ],
+    )
     mock_get_usecases.return_value = mock_usecases
 
     # Override the dependency in the FastAPI app
@@ -162,9 +202,378 @@ def test_distributed_search(mock_get_usecases, mock_get_user):
     data = response.json()
     assert "@context" in data
     assert "@graph" in data
+    assert data["completeness"] == {
+        "complete": False,
+        "peers": [
+            {"url": "http://peer1.com", "status": "ok", "elapsed_ms": 10.0},
+            {"url": "http://peer2.com", "status": "pending", "elapsed_ms": 0.0},
+        ],
+    }
 
     # Ensure the mocked method was awaited with the correct argument
-    mock_usecases.distributed_search.assert_awaited_once_with(catalog_filters)
+    mock_usecases.distributed_search.assert_awaited_once_with(
+        catalog_filters,
+        deadline=None,
+        policy=CompletionPolicy(),
+        cache_mode=CacheMode.USE,
+    )
 
     # Clean up the dependency override
     app.dependency_overrides = {}
+
+
+def test_local_search_deadline():
+    mock_usecases = AsyncMock()
+    mock_usecases.local_search.return_value = Graph()
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post(
+        "/local-search/",
+        json={"@type": "Filters"},
+        headers={"X-Search-Deadline-Ms": "800"},
+    )
+
+    assert response.status_code == 200
+    deadline = mock_usecases.local_search.await_args.kwargs["deadline"]
+    assert 0.7 < deadline.remaining() <= 0.8
+
+    response = client.post("/local-search/?deadline_ms=300", json={"@type": "Filters"})
+
+    assert response.status_code == 200
+    deadline = mock_usecases.local_search.await_args.kwargs["deadline"]
+    assert 0.2 < deadline.remaining() <= 0.3
+
+    app.dependency_overrides = {}
+
+
+@pytest.mark.parametrize("budget", ["inf", "nan", "-1"])
+@pytest.mark.parametrize("path", ["/local-search/", "/distributed-search/"])
+def test_invalid_deadline(path, budget):
+    mock_usecases = AsyncMock()
+    mock_usecases.local_search.return_value = Graph()
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    assert client.post(f"{path}?deadline_ms={budget}", json={}).status_code == 422
+    response = client.post(path, json={}, headers={"X-Search-Deadline-Ms": budget})
+    assert response.status_code == 422
+    response = client.post(f"{path}?soft_deadline_ms={budget}", json={})
+    assert response.status_code == (422 if "distributed" in path else 200)
+    mock_usecases.distributed_search.assert_not_awaited()
+
+    app.dependency_overrides = {}
+
+
+def test_local_search_etag():
+    mock_usecases = AsyncMock()
+    mock_usecases.local_search.return_value = Graph()
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/local-search/", json={"@type": "Filters"})
+    tag = response.headers["ETag"]
+
+    assert response.status_code == 200
+    assert tag.startswith('"')
+
+    response = client.post(
+        "/local-search/",
+        json={"@type": "Filters"},
+        headers={"If-None-Match": f'"other", W/{tag}'},
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == tag
+    assert response.content == b""
+
+    response = client.post(
+        "/local-search/", json={"@type": "Filters"}, headers={"If-None-Match": '"a"'}
+    )
+
+    assert response.status_code == 200
+
+    app.dependency_overrides = {}
+
+
+def test_local_search_deadline_exceeded():
+    mock_usecases = AsyncMock()
+    mock_usecases.local_search.side_effect = DeadlineExceeded("deadline exceeded")
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post(
+        "/local-search/",
+        json={"@type": "Filters"},
+        headers={"X-Search-Deadline-Ms": "0"},
+    )
+
+    assert response.status_code == 504
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_deadline_exceeded():
+    mock_usecases = AsyncMock()
+    mock_usecases.distributed_search.side_effect = DeadlineExceeded("exceeded")
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/distributed-search/?deadline_ms=0", json={})
+
+    assert response.status_code == 504
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_stream():
+    graph = Graph()
+    graph.parse(
+        data="""
+    @prefix dcat: <http://www.w3.org/ns/dcat#> .
+    @prefix dcterms: <http://purl.org/dc/terms/> .
+
+    <http://example.com/catalog/1> a dcat:Catalog ;
+        dcterms:title "Peer catalog" .
+""",
+        format="turtle",
+    )
+
+    async def stream_distributed_search(query, deadline=None):
+        yield PeerResult("http://peer1.com", PeerStatus.OK, graph, 0.01)
+        yield PeerResult("http://peer2.com", PeerStatus.OK, Graph(), 0.02)
+        yield PeerResult("http://peer3.com", PeerStatus.TIMEOUT, elapsed=0.5)
+
+    mock_usecases = MagicMock()
+    mock_usecases.stream_distributed_search.side_effect = stream_distributed_search
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/distributed-search/stream", json={"@type": "Filters"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2
+    assert lines[0]["peer"] == "http://peer1.com"
+    assert lines[0]["result"]["@id"] == "http://example.com/catalog/1"
+    assert "@context" in lines[0]["result"]
+    assert lines[1]["peers"] == [
+        {"url": "http://peer1.com", "status": "ok", "elapsed_ms": 10.0},
+        {"url": "http://peer2.com", "status": "ok", "elapsed_ms": 20.0},
+        {"url": "http://peer3.com", "status": "timeout", "elapsed_ms": 500.0},
+    ]
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_stream_deadline_exceeded():
+    mock_usecases = MagicMock()
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/distributed-search/stream?deadline_ms=0", json={})
+
+    assert response.status_code == 504
+    mock_usecases.stream_distributed_search.assert_not_called()
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_events():
+    graph = Graph()
+    graph.parse(
+        data="""
+    @prefix dcat: <http://www.w3.org/ns/dcat#> .
+
+    <http://example.com/catalog/1> a dcat:Catalog .
+""",
+        format="turtle",
+    )
+
+    async def stream_distributed_search(query, deadline=None, peer_services=None):
+        yield PeerResult("http://peer1.com", PeerStatus.OK, graph, 0.01)
+        await asyncio.sleep(0.05)
+        yield PeerResult("http://peer2.com", PeerStatus.ERROR, elapsed=0.05)
+
+    mock_usecases = MagicMock()
+    mock_usecases.ready_peers.return_value = ["http://peer1.com", "http://peer2.com"]
+    mock_usecases.stream_distributed_search.side_effect = stream_distributed_search
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+    app.dependency_overrides[get_heartbeat_interval] = lambda: 0.01
+
+    response = client.post("/distributed-search/events", json={"@type": "Filters"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        event.split("\n")
+        for event in response.text.split("\n\n")
+        if event and not event.startswith(":")
+    ]
+    assert [event[0] for event in events] == [
+        "event: result",
+        "event: progress",
+        "event: progress",
+        "event: complete",
+    ]
+    assert ": heartbeat" in response.text
+    progress = json.loads(events[2][1].removeprefix("data: "))
+    assert progress["answered"] == 1
+    assert progress["done"] == 2
+    assert progress["total"] == 2
+    assert progress["status"] == "error"
+    mock_usecases.stream_distributed_search.assert_called_once_with(
+        CatalogFilters(**{"@type": "Filters"}),
+        deadline=None,
+        peer_services=["http://peer1.com", "http://peer2.com"],
+    )
+
+    app.dependency_overrides = {}
+
+
+@pytest.mark.asyncio
+async def test_distributed_search_events_cancelled():
+    cancelled = asyncio.Event()
+
+    async def peer_results():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        yield PeerResult("http://peer1.com", PeerStatus.OK)
+
+    events = stream_sse(peer_results(), total=1, heartbeat_interval=0.01)
+    assert await anext(events) == SSE_HEARTBEAT
+
+    await events.aclose()
+    assert cancelled.is_set()
+
+
+def test_distributed_search_partial_results():
+    graph = Graph()
+    graph.parse(
+        data="""
+    @prefix dcat: <http://www.w3.org/ns/dcat#> .
+
+    <http://example.com/catalog/1> a dcat:Catalog .
+""",
+        format="turtle",
+    )
+    mock_usecases = AsyncMock()
+    mock_usecases.distributed_search.return_value = DistributedSearchResult(
+        graph=graph, peers=[PeerResult("http://peer1.com", PeerStatus.OK)]
+    )
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post(
+        "/distributed-search/?quorum=0.5&min_results=10&soft_deadline_ms=200",
+        json={},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    # A single catalog is still listed in @graph next to the metadata
+    assert data["@graph"][0]["@id"] == "http://example.com/catalog/1"
+    assert data["completeness"]["complete"]
+    policy = mock_usecases.distributed_search.await_args.kwargs["policy"]
+    assert policy.quorum == 0.5
+    assert policy.min_results == 10
+    assert 0.1 < policy.soft_deadline.remaining() <= 0.2
+
+    response = client.post("/distributed-search/?quorum=2", json={})
+    assert response.status_code == 422
+
+    app.dependency_overrides = {}
+
+
+@pytest.mark.parametrize(
+    "cache_control, cache_mode",
+    [
+        (None, CacheMode.USE),
+        ("no-cache", CacheMode.REFRESH),
+        ("max-age=0, No-Store", CacheMode.BYPASS),
+    ],
+)
+def test_distributed_search_cache(cache_control, cache_mode):
+    mock_usecases = AsyncMock()
+    mock_usecases.distributed_search.return_value = DistributedSearchResult(
+        graph=Graph(), peers=[], cache_status=CacheStatus.STALE
+    )
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    headers = {} if cache_control is None else {"Cache-Control": cache_control}
+    response = client.post("/distributed-search/", json={}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["X-Search-Cache"] == "stale"
+    kwargs = mock_usecases.distributed_search.await_args.kwargs
+    assert kwargs["cache_mode"] == cache_mode
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_passthrough():
+    catalog = {"@id": "http://example.com/catalog/1", "@type": "dcat:Catalog"}
+    mock_usecases = AsyncMock()
+    mock_usecases.distributed_search.return_value = DistributedSearchResult(
+        graph=Graph(),
+        peers=[PeerResult("http://peer1.com", PeerStatus.OK)],
+        nodes=[catalog],
+    )
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/distributed-search/", json={})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["@context"] == CONTEXT
+    assert data["@graph"] == [catalog]
+    assert data["completeness"]["complete"]
+
+    app.dependency_overrides = {}
+
+
+def test_distributed_search_stream_passthrough():
+    catalog = {"@id": "http://example.com/catalog/1", "@type": "dcat:Catalog"}
+
+    async def stream_distributed_search(query, deadline=None):
+        yield PeerResult("http://peer1.com", PeerStatus.OK, nodes=[catalog])
+        yield PeerResult("http://peer2.com", PeerStatus.OK, nodes=[])
+
+    mock_usecases = MagicMock()
+    mock_usecases.stream_distributed_search.side_effect = stream_distributed_search
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    response = client.post("/distributed-search/stream", json={"@type": "Filters"})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 2
+    assert lines[0] == {
+        "peer": "http://peer1.com",
+        "result": {"@context": CONTEXT, **catalog},
+    }
+
+    app.dependency_overrides = {}
+
+
+@pytest.mark.parametrize("path", ["/local-search/", "/distributed-search/"])
+def test_pretty(path):
+    graph = Graph()
+    graph.parse(
+        data="""
+    @prefix dcat: <http://www.w3.org/ns/dcat#> .
+
+    <http://example.com/catalog/1> a dcat:Catalog .
+""",
+        format="turtle",
+    )
+    mock_usecases = AsyncMock()
+    mock_usecases.local_search.return_value = graph
+    mock_usecases.distributed_search.return_value = DistributedSearchResult(
+        graph=graph, peers=[PeerResult("http://peer1.com", PeerStatus.OK)]
+    )
+    app.dependency_overrides[get_usecases] = lambda: mock_usecases
+
+    compact = client.post(path, json={})
+    pretty = client.post(f"{path}?pretty=true", json={})
+
+    assert compact.json() == pretty.json()
+    assert "\n" not in compact.text
+    assert pretty.text == json.dumps(pretty.json(), indent=4)
+
+    app.dependency_overrides = {}
@@ -1,6 +1,9 @@
 from pydantic import BaseModel, ConfigDict, Field
 
+from app.core.fingerprint import fingerprint
+
 from .examples import catalog_filters_example
+from .response import CONTEXT
 
 
 class HealthCheck(BaseModel):
@@ -24,3 +27,10 @@ class CatalogFilters(JsonLD):
             ],
         },
     )
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the filters, the same for filters with the same
+        meaning, identifying the query in logs, caches and coalescing
+        """
+        return fingerprint(self.model_dump(by_alias=True), CONTEXT)
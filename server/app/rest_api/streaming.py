@@ -0,0 +1,155 @@
+from typing import Any, AsyncGenerator, Callable
+
+import asyncio
+import time
+from contextlib import aclosing
+
+from app.core.offload import Offloader
+from app.core.results import PeerResult, PeerStatus
+
+from .encoding import ResponseStats, dumps
+from .response import RDF_TYPE, FramingEngine, frame_graph, framed_document, peer_status
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Keep the ingress from buffering the events
+    "X-Accel-Buffering": "no",
+}
+SSE_HEARTBEAT = b": heartbeat\n\n"
+
+
+def ndjson_line(
+    content: dict[str, Any], encode: Callable[[Any], bytes] = dumps
+) -> bytes:
+    return encode(content) + b"\n"
+
+
+def sse_event(
+    event: str, data: dict[str, Any], encode: Callable[[Any], bytes] = dumps
+) -> bytes:
+    # Compact JSON never spans several lines
+    return f"event: {event}\ndata: ".encode() + encode(data) + b"\n\n"
+
+
+async def framed_result(
+    peer_result: PeerResult,
+    rdf_type: str,
+    engine: FramingEngine,
+    offloader: Offloader,
+) -> dict[str, Any] | None:
+    """Framed catalogs of a peer, or None when it found none"""
+    if peer_result.nodes is not None:
+        return framed_document(peer_result.nodes) if peer_result.nodes else None
+    if len(peer_result.graph):
+        return await offloader.run_on_graph(
+            "frame", frame_graph, peer_result.graph, rdf_type, engine
+        )
+    return None
+
+
+async def stream_ndjson(
+    peer_results: AsyncGenerator[PeerResult, None],
+    rdf_type: str = RDF_TYPE,
+    engine: FramingEngine = FramingEngine.FAST,
+    offloader: Offloader | None = None,
+    stats: ResponseStats | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Write the framed catalogs of every peer on their own line as soon as the
+    peer has answered, followed by a trailer line with the status and the
+    timing of every peer. The peer queries are cancelled if the client goes
+    away before the end. The encoding time is recorded in ``stats``.
+    """
+    offloader = offloader or Offloader()
+    encode = dumps if stats is None else stats.encode
+    started_at = time.monotonic()
+    peers = []
+    async with aclosing(peer_results):
+        async for peer_result in peer_results:
+            peers.append(peer_status(peer_result))
+            result = await framed_result(peer_result, rdf_type, engine, offloader)
+            if result is not None:
+                yield ndjson_line({"peer": peer_result.url, "result": result}, encode)
+    yield ndjson_line(
+        {
+            "peers": peers,
+            "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1),
+        },
+        encode,
+    )
+
+
+async def stream_sse(
+    peer_results: AsyncGenerator[PeerResult, None],
+    total: int,
+    heartbeat_interval: float,
+    rdf_type: str = RDF_TYPE,
+    engine: FramingEngine = FramingEngine.FAST,
+    offloader: Offloader | None = None,
+    stats: ResponseStats | None = None,
+) -> AsyncGenerator[bytes, None]:
+    """
+    Write the search progress as Server-Sent Events.
+
+    Every peer that found catalogs sends a ``result`` event with its framed
+    catalogs, and every answered, failed or skipped peer a ``progress``
+    event. A ``complete`` event with the status of every peer closes the
+    stream. A heartbeat comment is sent after ``heartbeat_interval`` seconds
+    without events, so that proxies keep the connection open. The peer
+    queries are cancelled if the client disconnects. The encoding time is
+    recorded in ``stats``.
+    """
+    offloader = offloader or Offloader()
+    encode = dumps if stats is None else stats.encode
+    started_at = time.monotonic()
+    peers = []
+    answered = 0
+    async with aclosing(peer_results):
+        next_result: asyncio.Future[PeerResult] | None = None
+        try:
+            while True:
+                if next_result is None:
+                    next_result = asyncio.ensure_future(anext(peer_results))
+                done, _ = await asyncio.wait({next_result}, timeout=heartbeat_interval)
+                if not done:
+                    yield SSE_HEARTBEAT
+                    continue
+                try:
+                    peer_result = next_result.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_result = None
+                peers.append(peer_status(peer_result))
+                if peer_result.status == PeerStatus.OK:
+                    answered += 1
+                result = await framed_result(peer_result, rdf_type, engine, offloader)
+                if result is not None:
+                    yield sse_event(
+                        "result", {"peer": peer_result.url, "result": result}, encode
+                    )
+                yield sse_event(
+                    "progress",
+                    {
+                        "answered": answered,
+                        "done": len(peers),
+                        "total": total,
+                        **peers[-1],
+                    },
+                    encode,
+                )
+        finally:
+            # The generator can only be closed once it is not running
+            if next_result is not None:
+                next_result.cancel()
+                await asyncio.gather(next_result, return_exceptions=True)
+    yield sse_event(
+        "complete",
+        {
+            "peers": peers,
+            "elapsed_ms": round((time.monotonic() - started_at) * 1000, 1),
+        },
+        encode,
+    )
@@ -0,0 +1,46 @@
+import json
+from unittest.mock import patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from ..encoding import ResponseStats, dumps
+
+VALUE = {"@id": "http://example.com/1", "title": "Café\n", "size": 1.5, "n": [1]}
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "stdlib"])
+def encoder(request):
+    if request.param:
+        pytest.importorskip("orjson")
+        yield
+    else:
+        with patch("app.rest_api.encoding.orjson", None):
+            yield
+
+
+@pytest.mark.usefixtures("encoder")
+class TestDumps:
+    def test_compact(self):
+        assert dumps(VALUE) == json.dumps(
+            VALUE, separators=(",", ":"), ensure_ascii=False
+        ).encode("utf-8")
+
+    def test_pretty(self):
+        assert dumps(VALUE, pretty=True) == json.dumps(VALUE, indent=4).encode()
+
+    def test_large_integer(self):
+        assert json.loads(dumps({"n": 2**70})) == {"n": 2**70}
+
+
+def test_response_stats():
+    def observed(name):
+        return REGISTRY.get_sample_value(name, {"endpoint": "test"}) or 0
+
+    stats = ResponseStats("test")
+    size = observed("ds_search_response_bytes_sum")
+
+    body = b"".join(stats.count(iter([stats.encode(VALUE), b"\n"])))
+
+    assert observed("ds_search_response_bytes_sum") == size + len(body)
+    assert observed("ds_search_response_encode_seconds_count") >= 1
@@ -0,0 +1,162 @@
+import json
+
+import pytest
+from rdflib import Graph, URIRef
+from rdflib.namespace import DCAT
+
+from ..encoding import ResponseStats
+from ..response import (
+    JSONLDResponse,
+    StreamingJSONLDResponse,
+    etag,
+    etag_matches,
+    expand_type,
+    iter_framed_nodes,
+)
+
+CATALOGS = """
+@prefix dcat: <http://www.w3.org/ns/dcat#> .
+@prefix dcterms: <http://purl.org/dc/terms/> .
+@prefix foaf: <http://xmlns.com/foaf/0.1/> .
+
+<http://example.com/catalog/2> a dcat:Catalog ;
+    dcterms:title "Catalog 2"@en ;
+    dcat:dataset <http://example.com/dataset/1> ,
+        [ a dcat:Dataset ; dcterms:title "Anonymous dataset" ] .
+
+<http://example.com/catalog/1> a dcat:Catalog ;
+    dcterms:title "Catalog 1"@en ;
+    dcterms:publisher [ a foaf:Agent ; foaf:name "John Doe" ] ;
+    dcat:dataset <http://example.com/dataset/1> .
+
+<http://example.com/dataset/1> a dcat:Dataset ;
+    dcterms:title "Dataset 1" ;
+    dcterms:issued "2024-01-01"^^<http://www.w3.org/2001/XMLSchema#date> .
+"""
+
+
+def without_blank_node_ids(value):
+    if isinstance(value, dict):
+        return {
+            key: without_blank_node_ids(item)
+            for key, item in value.items()
+            if not (key == "@id" and item.startswith("_:"))
+        }
+    if isinstance(value, list):
+        return [without_blank_node_ids(item) for item in value]
+    return value
+
+
+def streamed(graph, metadata=None, pretty=False):
+    chunks = StreamingJSONLDResponse.iter_json_ld(
+        graph, "dcat:Catalog", metadata or {}, pretty=pretty
+    )
+    return b"".join(chunks).decode()
+
+
+def layout(document, pretty):
+    if pretty:
+        return json.dumps(document, indent=4)
+    return json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+
+
+def test_etag():
+    tag = etag(b"{}")
+
+    assert tag == etag(b"{}")
+    assert tag != etag(b"[]")
+    assert etag_matches(tag, tag)
+    assert etag_matches(f'"other", W/{tag}', tag)
+    assert etag_matches("*", tag)
+    assert not etag_matches('"other"', tag)
+    assert not etag_matches(None, tag)
+
+
+class TestStreamingJSONLDResponse:
+    @pytest.fixture
+    def graph(self):
+        graph = Graph()
+        graph.parse(data=CATALOGS, format="turtle")
+        return graph
+
+    def test_expand_type(self):
+        assert expand_type("dcat:Catalog") == DCAT.Catalog
+        assert expand_type("Filters") == URIRef("http://data-space.org/Filters")
+        assert expand_type("http://example.com/Type") == URIRef(
+            "http://example.com/Type"
+        )
+
+    def test_same_document_as_jsonld_response(self, graph):
+        metadata = {"completeness": {"complete": True, "peers": []}}
+
+        expected = json.loads(JSONLDResponse(graph, metadata=metadata).body)
+        document = json.loads(streamed(graph, metadata))
+
+        assert [node["@id"] for node in document["@graph"]] == [
+            "http://example.com/catalog/1",
+            "http://example.com/catalog/2",
+        ]
+        assert without_blank_node_ids(document) == without_blank_node_ids(expected)
+
+    @pytest.mark.parametrize("pretty", [False, True])
+    def test_layout(self, graph, pretty):
+        document = streamed(graph, {"completeness": {"complete": True}}, pretty)
+        assert document == layout(json.loads(document), pretty)
+
+    @pytest.mark.parametrize("pretty", [False, True])
+    def test_empty_graph(self, pretty):
+        document = streamed(Graph(), pretty=pretty)
+        assert json.loads(document)["@graph"] == []
+        assert document == layout(json.loads(document), pretty)
+
+    @pytest.mark.asyncio
+    async def test_stats(self, graph):
+        stats = ResponseStats("test")
+        response = StreamingJSONLDResponse(graph, stats=stats)
+
+        chunks = [chunk async for chunk in response.body_iterator]
+
+        assert stats.size == sum(len(chunk) for chunk in chunks)
+        assert stats.encode_seconds > 0
+
+    def test_blank_node_labels_are_unique(self):
+        graph = Graph()
+        graph.parse(
+            data="""
+            @prefix dcat: <http://www.w3.org/ns/dcat#> .
+            @prefix dcterms: <http://purl.org/dc/terms/> .
+            @prefix foaf: <http://xmlns.com/foaf/0.1/> .
+
+            <http://example.com/catalog/1> a dcat:Catalog ;
+                dcterms:publisher _:agent1 ; dcterms:creator _:agent1 .
+            <http://example.com/catalog/2> a dcat:Catalog ;
+                dcterms:publisher _:agent2 ; dcterms:creator _:agent2 .
+            _:agent1 a foaf:Agent .
+            _:agent2 a foaf:Agent .
+            """,
+            format="turtle",
+        )
+
+        nodes = list(iter_framed_nodes(graph))
+
+        labels = [node["dcterms:publisher"]["@id"] for node in nodes]
+        assert labels[0] != labels[1]
+        assert all(node["dcterms:creator"]["@id"] in labels for node in nodes)
+
+    def test_nested_catalogs_are_referenced(self):
+        graph = Graph()
+        graph.parse(
+            data="""
+            @prefix dcat: <http://www.w3.org/ns/dcat#> .
+
+            <http://example.com/catalog/1> a dcat:Catalog ;
+                dcat:catalog <http://example.com/catalog/2> .
+            <http://example.com/catalog/2> a dcat:Catalog .
+            """,
+            format="turtle",
+        )
+
+        nodes = list(iter_framed_nodes(graph))
+
+        assert len(nodes) == 2
+        assert nodes[0]["dcat:catalog"] == {"@id": "http://example.com/catalog/2"}
@@ -0,0 +1,13 @@
+from ..examples import catalog_filters_example
+from ..response import CONTEXT
+from ..serializers import CatalogFilters
+
+
+class TestCatalogFilters:
+    def test_fingerprint_same_in_default_context(self):
+        example = CatalogFilters.model_validate(catalog_filters_example)
+        default = CatalogFilters.model_validate(
+            {**catalog_filters_example, "@context": CONTEXT}
+        )
+
+        assert example.fingerprint() == default.fingerprint()
@@ -3,6 +3,9 @@ from typing import Annotated
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, NoDecode, SettingsConfigDict
 
+from app.core.offload import OffloadExecutor
+from app.rest_api.response import FramingEngine
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -20,8 +23,53 @@ class Settings(BaseSettings):
 
     catalog_service_url: str = "http://localhost:8000"
     request_timeout: float = 5.0
+    max_response_size: int = 32 * 1024 * 1024
+    max_concurrent_requests: int = 10
+    deadline_margin: float = 0.05
+    sse_heartbeat_interval: float = 15.0
+    framing_engine: FramingEngine = FramingEngine.FAST
+    passthrough_merge: bool = True
+    offload_executor: OffloadExecutor = OffloadExecutor.THREAD
+    offload_workers: int = 4
+    local_search_cache_ttl: float = 30.0
+    local_search_cache_max_bytes: int = 16 * 1024 * 1024
+    distributed_search_cache_ttl: float = 5.0
+    distributed_search_cache_stale: float = 30.0
+    distributed_search_cache_degraded_ttl: float = 1.0
+    distributed_search_cache_max_bytes: int = 16 * 1024 * 1024
+    peer_cache_ttl: float = 300.0
+    peer_cache_max_bytes: int = 16 * 1024 * 1024
+
+    adaptive_timeouts: bool = True
+    adaptive_timeout_min: float = 0.2
+    adaptive_timeout_max: float = 10.0
+    adaptive_timeout_multiplier: float = 2.0
+    adaptive_timeout_min_samples: int = 20
+    latency_window_size: int = 200
+
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+    breaker_probe_interval: float = 5.0
+
+    hedging_enabled: bool = False
+    hedge_delay: float = 0.5
+    hedge_percentile: float = 0.95
+    hedge_budget_ratio: float = 0.1
+
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_connect_timeout: float = 2.0
+    http_read_timeout: float = 5.0
+
+    settings_reload_interval: float = 0.0
 
     discovery_type: str = "kube"
+    dns_cache_ttl: float = 5.0
+    peer_refresh_interval: float = 5.0
+    kube_api_url: str = "https://kubernetes.default.svc"
+    kube_label_selector: str = "app.kubernetes.io/name=ds-search"
+    kube_watch_timeout: float = 300.0
     dummy_search_service_urls: Annotated[list[str], NoDecode] = []
 
     @field_validator("dummy_search_service_urls", mode="before")
@@ -0,0 +1,203 @@
+import asyncio
+import os
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from pydantic import ValidationError
+
+from app.core.discovery import DummyDiscoveryService, KubeDiscoveryService
+from app.rest_api.response import FramingEngine
+from app.settings import Settings
+
+from ..container import ServiceContainer, build_discovery_service
+
+
+class TestBuildDiscoveryService:
+    def test_dummy(self):
+        settings = Settings(
+            discovery_type="dummy",
+            dummy_search_service_urls=["http://peer1.com"],
+        )
+        service = build_discovery_service(settings)
+        assert isinstance(service, DummyDiscoveryService)
+
+    def test_kube(self):
+        settings = Settings(discovery_type="kube")
+        service = build_discovery_service(settings)
+        assert isinstance(service, KubeDiscoveryService)
+
+    def test_unsupported(self):
+        settings = Settings(discovery_type="unknown")
+        with pytest.raises(ValueError):
+            build_discovery_service(settings)
+
+
+class TestSettings:
+    def test_unknown_offload_executor(self):
+        with pytest.raises(ValidationError):
+            Settings.model_validate({"offload_executor": "threads"})
+
+
+class TestServiceContainer:
+    @pytest.fixture
+    def settings_file(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        for name in ("DS_SEARCH__CATALOG_SERVICE_URL", "DS_SEARCH__DISCOVERY_TYPE"):
+            monkeypatch.delenv(name, raising=False)
+        path = tmp_path / ".env"
+        path.write_text(
+            "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog1\n"
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+        )
+        return path
+
+    @pytest_asyncio.fixture
+    async def container(self, settings_file):
+        container = ServiceContainer(Settings())
+        await container.start()
+        yield container
+        await container.aclose()
+
+    @pytest.mark.asyncio
+    async def test_common(self, container):
+        assert container.settings.catalog_service_url == "http://catalog1"
+        assert container.usecases._http_client is container.http_client
+        assert container.usecases._peer_table is container.peer_table
+
+    @pytest.mark.asyncio
+    async def test_reload(self, container, settings_file):
+        http_client = container.http_client
+        usecases = container.usecases
+        settings_file.write_text(
+            "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog2\n"
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+        )
+
+        container.reload()
+
+        assert container.settings.catalog_service_url == "http://catalog2"
+        assert container.peer_table._discovery_service is container.discovery_service
+        assert container.usecases is not usecases
+        assert container.usecases._catalog_service_url == "http://catalog2"
+        assert container.http_client is http_client
+
+    @pytest.mark.parametrize(
+        "discovery_settings",
+        [
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n",
+            "DS_SEARCH__DISCOVERY_TYPE=kube-watch\n"
+            "DS_SEARCH__KUBE_API_URL=http://127.0.0.1:9\n",
+        ],
+        ids=["dummy", "kube-watch"],
+    )
+    @pytest.mark.asyncio
+    async def test_reload_unchanged(self, settings_file, discovery_settings):
+        settings_file.write_text(discovery_settings)
+        container = ServiceContainer(Settings())
+        await container.start()
+        try:
+            usecases = container.usecases
+            discovery_service = container.discovery_service
+            with patch(
+                "app.container.discovery.create_kube_api_client"
+            ) as create_client:
+                container.reload()
+                container.reload()
+
+            create_client.assert_not_called()
+            assert container.usecases is usecases
+            assert container.discovery_service is discovery_service
+        finally:
+            await container.aclose()
+
+    @pytest.mark.asyncio
+    async def test_departed_peer_forgotten(self, container, settings_file):
+        container.peer_table.update(["http://peer1.com"])
+        settings_file.write_text(
+            "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog2\n"
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+        )
+        container.reload()
+
+        # The usecases built on reload forget the peer
+        with patch.object(container.usecases, "forget") as forget:
+            container.peer_table.update([])
+
+        forget.assert_called_once_with("http://peer1.com")
+
+    @pytest.mark.asyncio
+    async def test_reload_keeps_discovery(self, container, settings_file):
+        usecases = container.usecases
+        discovery_service = container.discovery_service
+        settings_file.write_text(
+            "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog1\n"
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+            "DS_SEARCH__HEDGING_ENABLED=true\n"
+        )
+
+        container.reload()
+
+        assert container.settings.hedging_enabled
+        assert container.usecases is not usecases
+        assert container.discovery_service is discovery_service
+
+    @pytest.mark.asyncio
+    async def test_reload_discovery(self, container, settings_file):
+        discovery_service = container.discovery_service
+        settings_file.write_text(
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+            "DS_SEARCH__DUMMY_SEARCH_SERVICE_URLS=http://peer1.com\n"
+        )
+
+        container.reload()
+
+        assert container.discovery_service is not discovery_service
+        assert container.peer_table._discovery_service is container.discovery_service
+
+    @pytest.mark.asyncio
+    async def test_reload_invalid(self, container, settings_file):
+        usecases = container.usecases
+        settings_file.write_text("DS_SEARCH__DISCOVERY_TYPE=unknown\n")
+
+        container.reload()
+
+        assert container.settings.catalog_service_url == "http://catalog1"
+        assert container.usecases is usecases
+
+    @pytest.mark.asyncio
+    async def test_reload_invalid_framing_engine(self, container, settings_file):
+        usecases = container.usecases
+        settings_file.write_text(
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\nDS_SEARCH__FRAMING_ENGINE=pyId\n"
+        )
+
+        container.reload()
+
+        assert container.settings.framing_engine == FramingEngine.FAST
+        assert container.usecases is usecases
+
+    @pytest.mark.asyncio
+    async def test_reload_on_file_change(self, settings_file):
+        settings_file.write_text(
+            "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog1\n"
+            "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+            "DS_SEARCH__SETTINGS_RELOAD_INTERVAL=0.01\n"
+        )
+        container = ServiceContainer(Settings())
+        await container.start()
+        try:
+            await asyncio.sleep(0.05)
+            settings_file.write_text(
+                "DS_SEARCH__CATALOG_SERVICE_URL=http://catalog2\n"
+                "DS_SEARCH__DISCOVERY_TYPE=dummy\n"
+                "DS_SEARCH__SETTINGS_RELOAD_INTERVAL=0.01\n"
+            )
+            os.utime(settings_file, (0, 0))
+            for _ in range(100):
+                if container.settings.catalog_service_url == "http://catalog2":
+                    break
+                await asyncio.sleep(0.01)
+            assert container.settings.catalog_service_url == "http://catalog2"
+        finally:
+            await container.aclose()
@@ -0,0 +1,57 @@
+"""
+Benchmark of the framing of search results as JSON-LD.
+
+Compares the pyld engine with the fast engine on graphs parsed from
+generated DCAT payloads, for the whole document and node by node.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_framing --catalogs 10 --datasets 50
+"""
+from typing import Any, Callable
+
+import argparse
+import json
+import statistics
+import time
+
+from rdflib import Graph
+
+from app.core.ingest import parse_json_ld
+from app.rest_api.response import FramingEngine, frame_graph, iter_framed_nodes
+
+from .bench_ingest import payload
+
+
+def measure(frame: Callable[[], Any], repeat: int) -> str:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        frame()
+        timings.append(time.perf_counter() - started_at)
+    return f"{statistics.median(timings) * 1000:9.1f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--catalogs", type=int, default=10)
+    parser.add_argument("--datasets", type=int, default=50)
+    parser.add_argument("--distributions", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    graph: Graph = parse_json_ld(
+        json.loads(payload(args.catalogs, args.datasets, args.distributions))
+    )
+    print(f"Graph: {len(graph)} triples")
+    print(f"{'':8} {'document':>12} {'by node':>12}")
+    for engine in FramingEngine:
+        document = measure(lambda: frame_graph(graph, engine=engine), args.repeat)
+        by_node = measure(
+            lambda: list(iter_framed_nodes(graph, engine=engine)), args.repeat
+        )
+        print(f"{engine.value:8} {document} {by_node}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark of the ingestion of catalog responses into RDF graphs.
+
+Compares the former path, which decoded the response, encoded it again and
+let ``Graph.parse`` decode it once more, with the decoded-document and the
+streaming paths of ``app.core.ingest`` on generated DCAT payloads.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_ingest --catalogs 10 --datasets 50
+"""
+from typing import Any, AsyncIterator, Callable
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+
+from rdflib import Graph
+
+from app.core.ingest import parse_json_ld, parse_json_ld_stream
+from app.rest_api.response import CONTEXT
+
+CHUNK_SIZE = 16 * 1024
+
+
+def distribution(catalog: int, dataset: int, index: int) -> dict[str, Any]:
+    return {
+        "@id": f"http://example.com/{catalog}/dataset/{dataset}/distribution/{index}",
+        "@type": "dcat:Distribution",
+        "dcterms:title": f"Distribution {index} of dataset {dataset}",
+        "dcat:accessURL": {"@id": f"http://example.com/{catalog}/{dataset}/{index}"},
+        "dcat:mediaType": {
+            "@id": "http://www.iana.org/assignments/media-types/text/csv"
+        },
+        "dcat:byteSize": {"@value": 1024 * (index + 1), "@type": "xsd:integer"},
+    }
+
+
+def dataset(catalog: int, index: int, distributions: int) -> dict[str, Any]:
+    return {
+        "@id": f"http://example.com/{catalog}/dataset/{index}",
+        "@type": "dcat:Dataset",
+        "dcterms:identifier": f"dataset-{catalog}-{index}",
+        "dcterms:title": [
+            {"@value": f"Dataset {index}", "@language": "en"},
+            {"@value": f"Datensatz {index}", "@language": "de"},
+        ],
+        "dcterms:description": {
+            "@value": f"Measurements of catalog {catalog}, series {index}. " * 4,
+            "@language": "en",
+        },
+        "dcat:keyword": ["energy", "measurements", f"series-{index % 10}"],
+        "dcterms:issued": {"@value": "2024-01-01", "@type": "xsd:date"},
+        "dcterms:modified": {"@value": "2024-06-01T12:00:00Z", "@type": "xsd:dateTime"},
+        "dcterms:publisher": {
+            "@type": "foaf:Agent",
+            "foaf:name": f"Publisher {catalog}",
+        },
+        "dcat:theme": {"@id": "http://publications.europa.eu/resource/dataset/ENER"},
+        "dcat:distribution": [
+            distribution(catalog, index, i) for i in range(distributions)
+        ],
+    }
+
+
+def payload(catalogs: int, datasets: int, distributions: int) -> bytes:
+    """JSON-LD document as returned by a catalog service"""
+    graph = [
+        {
+            "@id": f"http://example.com/{catalog}/catalog",
+            "@type": "dcat:Catalog",
+            "dcterms:title": {"@value": f"Catalog {catalog}", "@language": "en"},
+            "dcat:dataset": [
+                dataset(catalog, index, distributions) for index in range(datasets)
+            ],
+        }
+        for catalog in range(catalogs)
+    ]
+    return json.dumps({"@context": CONTEXT, "@graph": graph}, indent=4).encode()
+
+
+def round_trip(data: bytes) -> Graph:
+    # The former path: response.json() and back to text for Graph.parse
+    graph = Graph()
+    graph.parse(data=json.dumps(json.loads(data)), format="json-ld")
+    return graph
+
+
+def decoded(data: bytes) -> Graph:
+    return parse_json_ld(json.loads(data))
+
+
+def streamed(data: bytes) -> Graph:
+    async def chunks() -> AsyncIterator[bytes]:
+        for i in range(0, len(data), CHUNK_SIZE):
+            yield data[i : i + CHUNK_SIZE]
+
+    return asyncio.run(parse_json_ld_stream(chunks()))
+
+
+def measure(ingest: Callable[[bytes], Graph], data: bytes, repeat: int) -> str:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        graph = ingest(data)
+        timings.append(time.perf_counter() - started_at)
+    tracemalloc.start()
+    ingest(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (
+        f"{statistics.median(timings) * 1000:9.1f} ms "
+        f"{peak / 2**20:9.1f} MiB {len(graph):9} triples"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--catalogs", type=int, default=10)
+    parser.add_argument("--datasets", type=int, default=50)
+    parser.add_argument("--distributions", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = payload(args.catalogs, args.datasets, args.distributions)
+    print(f"Payload: {len(data) / 2**20:.1f} MiB")
+    print(f"{'':12} {'median':>12} {'peak':>13} {'':>17}")
+    for name, ingest in [
+        ("round-trip", round_trip),
+        ("decoded", decoded),
+        ("streamed", streamed),
+    ]:
+        print(f"{name:12} {measure(ingest, data, args.repeat)}")
+
+
+if __name__ == "__main__":
+    main()